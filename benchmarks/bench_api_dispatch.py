@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Tintri, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+ Overhead per call of the @api wrapper of generated methods, for get_vm, get_vms and update_vm.
+ The HTTP layer is replaced by a function returning None and the server version is set up front,
+ so only the dispatch of the wrapper, the URL arguments and the update request are measured.
+
+ Command usage: python bench_api_dispatch.py [calls]
+"""
+
+import sys
+import time
+from standin import import_tintri
+
+import_tintri()
+from tintri.common import Version
+from tintri.v310 import Tintri
+
+def client():
+    """Returns a client of a VMstore which sends no requests"""
+    tintri = Tintri('vmstore.example.com', 'admin', 'password')
+    version = Version()
+    version.productName = 'Tintri VMstore'
+    version.supportedVersionSet = ['v310.11', 'v310.21', 'v310.31', 'v310.41', 'v310.51', 'v310.61', 'v310.71']
+    tintri._TintriBase__version = version
+    send = lambda *args, **kwargs: None
+    tintri._get_one = tintri._get_all = tintri._update = send
+    return tintri
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    tintri = client()
+    methods = [
+        ('get_vm', lambda: tintri.get_vm('vm-1')),
+        ('get_vms', lambda: tintri.get_vms(filters={'limit': 10})),
+        ('update_vm', lambda: tintri.update_vm(None, 'vm-1', request=None, isLive=True)),
+    ]
+    for name, call in methods:
+        start = time.time()
+        for _ in xrange(calls):
+            call()
+        print '%-10s %6.2f us per call' % (name, (time.time() - start) / calls * 1e6)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Tintri, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+ Snapshot throughput of BulkSnapshotter against a stand-in VMstore whose create_snapshot requests take
+ 100 ms plus 2 ms per snapshot spec, next to create_snapshot called one VM at a time. One VM of the bulk
+ runs does not exist, so its batch is split until it is isolated.
+
+ Command usage: python bench_bulk_snapshot.py [vms]
+"""
+
+import sys
+import time
+from standin import import_tintri, StandIn
+
+import_tintri()
+from tintri.v310 import SnapshotSpec, Tintri
+from tintri.v310.bulk import BulkSnapshotter
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    server = StandIn(snapshot_latency=0.1, snapshot_spec_latency=0.002)
+    try:
+        tintri = Tintri(server.host, 'admin', 'password', pool_maxsize=16)
+        tintri.login()
+        vm_ids = ['vm-%d' % i for i in xrange(count)]
+        vm_ids[count / 2] = 'bad-vm' # rejected by the server
+        serial = min(count, 50)
+        start = time.time()
+        for vm_id in vm_ids[:serial]:
+            tintri.create_snapshot([SnapshotSpec(source_vm_id=vm_id)])
+        print '%-40s %5d VMs  %7.0f VMs/s' % ('create_snapshot, one VM per request', serial, serial / (time.time() - start))
+        runs = [('8 threads, 1 VM per request', dict(batch_size=1, concurrency=8, rate=None), vm_ids[:min(count, 500)]),
+                ('8 threads, 50 VMs per request', dict(batch_size=50, concurrency=8, rate=None), vm_ids),
+                ('8 threads, 50 VMs per request, 20/s', dict(batch_size=50, concurrency=8, rate=20), vm_ids)]
+        for name, kwargs, ids in runs:
+            report = BulkSnapshotter(tintri, **kwargs).snapshot(ids)
+            print '%-40s %5d VMs  %7.0f VMs/s  %d failed  %d requests  %.2f s' % (name, len(report.results), len(report.results) / report.elapsed,
+                                                                               report.failed, report.requests, report.elapsed)
+        tintri.close()
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Tintri, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+ Time of TintriFleet.call on 16 stand-in VMstores answering each request in 50 ms, with 1 to 16 worker
+ threads, and time to stream the VMs of all servers with TintriFleet.iter_items.
+
+ Command usage: python bench_fleet_scaling.py [servers]
+"""
+
+import sys
+import time
+from standin import import_tintri, StandIn
+
+import_tintri()
+from tintri.v310.fleet import TintriFleet
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    servers = [StandIn(vms=200, latency=0.05) for _ in xrange(count)]
+    hosts = [server.host for server in servers]
+    try:
+        for workers in [1, 2, 4, 8, 16]:
+            fleet = TintriFleet(hosts, 'admin', 'password', workers=workers)
+            fleet.login()
+            start = time.time()
+            results = fleet.call('get_datastore', 'default')
+            elapsed = time.time() - start
+            start = time.time()
+            items = sum(1 for item in fleet.iter_items('get_vms', filters={'limit': 50}))
+            print 'workers %2d  call %5.2f s  iter_items %5.2f s for %d VMs  errors %d' % (workers, elapsed, time.time() - start, items,
+                                                                                         sum(1 for result in results if result.error))
+            fleet.close()
+    finally:
+        for server in servers:
+            server.stop()
+
+if __name__ == '__main__':
+    main()
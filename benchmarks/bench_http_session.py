@@ -0,0 +1,65 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Tintri, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+ Requests per second of sequential get_vm calls against a local HTTPS stand-in, with the pooled keep-alive
+ session of TintriBase and with a new connection and TLS handshake per request (keep_alive=False, the
+ behavior of the SDK before connections were pooled).
+
+ Command usage: python bench_http_session.py [calls]
+"""
+
+import sys
+import time
+import warnings
+from standin import StandIn, import_tintri
+
+import_tintri()
+from tintri.v310 import Tintri
+
+def requests_per_second(host, calls, keep_alive):
+    tintri = Tintri(host, 'admin', 'password', keep_alive=keep_alive)
+    tintri.login()
+    tintri.get_vm('vm-1')
+    start = time.time()
+    for i in xrange(calls):
+        tintri.get_vm('vm-%d' % i)
+    elapsed = time.time() - start
+    tintri.close()
+    return calls / elapsed
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    warnings.filterwarnings('ignore')
+    standin = StandIn()
+    try:
+        print '%d sequential get_vm calls' % calls
+        print '  new connection per request  %7.1f requests/s' % requests_per_second(standin.host, calls, False)
+        print '  pooled keep-alive session   %7.1f requests/s' % requests_per_second(standin.host, calls, True)
+    finally:
+        standin.stop()
+
+if __name__ == '__main__':
+    main()
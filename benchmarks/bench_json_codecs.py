@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Tintri, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+ Decode and encode times of the JSON codecs installed, on pages of 1,000 VMs, 1,000 snapshots and
+ a VM stat of 2,000 samples shaped like VMstore responses. json is the default codec of the client,
+ the others are used when asked for with the json_codec argument.
+
+ Command usage: python bench_json_codecs.py [repeats]
+"""
+
+import json
+import sys
+import time
+from standin import import_tintri, vm
+
+import_tintri()
+from tintri.v310 import Snapshot, VirtualMachineStat, Vm
+from tintri.utils import JSON_CODECS, get_decoder, get_json_codec
+
+PAGE_TYPE_ID = 'com.tintri.api.rest.v310.dto.Page'
+
+def snapshot(i):
+    """Returns a synthetic snapshot"""
+    return {'typeId': 'com.tintri.api.rest.v310.dto.domain.Snapshot', 'uuid': {'uuid': 'snap-%d' % i}, 'vmUuid': {'uuid': 'vm-%d' % (i % 50)},
+            'description': 'daily snapshot %d' % i, 'createTime': 1470000000000 + i, 'expirationTime': 1480000000000 + i,
+            'consistency': 'CRASH_CONSISTENT', 'sizeChangedMB': i * 0.37, 'sizeChangedPhysicalMB': i * 0.21, 'type': 'SCHEDULED', 'vmName': 'vm%d' % (i % 50)}
+
+def sample(i):
+    """Returns a synthetic stat sample"""
+    fields = dict(('%sMetric%d' % (kind, j), i * 1.1 + j) for kind in ['latency', 'iops', 'throughput'] for j in range(12))
+    fields['timeEnd'] = '2016-08-01T00:%02d:00.000-07:00' % (i % 60)
+    return fields
+
+def page(items):
+    return {'typeId': PAGE_TYPE_ID, 'total': len(items), 'items': items}
+
+def payloads():
+    stat = {'typeId': 'com.tintri.api.rest.v310.dto.domain.beans.vm.VirtualMachineStat', 'sortedStats': [sample(i) for i in range(2000)]}
+    return [('vm', json.dumps(page([vm(i) for i in range(1000)])), Vm),
+            ('snapshot', json.dumps(page([snapshot(i) for i in range(1000)])), Snapshot),
+            ('stats', json.dumps(page([stat])), VirtualMachineStat)]
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    reference = get_json_codec('json')
+    for name in JSON_CODECS:
+        try:
+            codec = get_json_codec(name)
+        except ImportError:
+            print '%-10s not installed' % name
+            continue
+        for kind, text, cls in payloads():
+            objects = [get_decoder(cls)(item) for item in json.loads(text)['items']]
+            # every codec must produce what the json module produces
+            assert codec.loads(text) == json.loads(text)
+            assert json.loads(codec.dumps(objects)) == json.loads(reference.dumps(objects))
+            start = time.time()
+            for _ in xrange(repeats):
+                codec.loads(text)
+            decoded = time.time()
+            for _ in xrange(repeats):
+                codec.dumps(objects)
+            encoded = time.time()
+            print '%-10s %-8s %5d KB  decode %6.1f ms  encode %6.1f ms' % (name, kind, len(text) / 1024,
+                (decoded - start) / repeats * 1000, (encoded - decoded) / repeats * 1000)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Tintri, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+ Decoding time of a synthetic page of 1,000 VMs with map_to_object, with the attribute guard of TintriObject
+ inactive (the default) and active, and the cost of one attribute set with the per-class field set of
+ TintriObject next to the stack-inspecting guard it replaced.
+
+ Command usage: python bench_setattr.py
+"""
+
+import inspect
+import timeit
+from standin import import_tintri, vm
+
+import_tintri()
+from tintri.v310 import Vm
+from tintri.utils import map_to_object
+
+def synthetic_page(count=1000):
+    """VMs with about 60 fields, metrics in their latest stat and extra top-level fields"""
+    page = []
+    for i in xrange(count):
+        item = vm(i)
+        item['stat']['sortedStats'][0].update(('metric%d' % k, float(k)) for k in xrange(40))
+        item.update(('field%d' % k, k) for k in xrange(20))
+        page.append(item)
+    return page
+
+class GuardedVm(Vm):
+    _ignores_setattr = False
+
+class StackGuardedVm(Vm):
+    """Vm with the attribute guard of the SDK before the per-class field set"""
+    _ignores_setattr = False
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name) or not hasattr(self, '_ignores_setattr') or self._ignores_setattr:
+            object.__setattr__(self, name, value)
+        else:
+            caller = inspect.stack()[1]
+            if caller[3] == '__init__': # not constructor
+                object.__setattr__(self, name, value)
+            else:
+                raise TypeError('Setting attribute %r on object of type %s is not allowed' % (name, self.__class__.__name__))
+
+def main():
+    page = synthetic_page()
+    runs = 5
+    for name, cls in [('guard inactive', Vm), ('guard active', GuardedVm)]:
+        elapsed = timeit.timeit(lambda: [map_to_object(item, cls) for item in page], number=runs) / runs
+        print 'decode 1000-VM page, %-15s %7.1f ms' % (name, elapsed * 1e3)
+
+    calls = 100000
+    for name, cls in [('per-class field set', GuardedVm), ('stack-inspecting guard', StackGuardedVm)]:
+        entity = map_to_object(page[0], cls)
+        elapsed = timeit.timeit(lambda: setattr(entity, 'isLive', True), number=calls) / calls
+        print 'setattr of a decoded field, %-22s %7.2f us' % (name, elapsed * 1e6)
+        elapsed = timeit.timeit(lambda: _set_unknown_field(entity), number=calls / 100) / (calls / 100)
+        print 'rejected setattr,           %-22s %7.2f us' % (name, elapsed * 1e6)
+
+def _set_unknown_field(entity):
+    try:
+        entity.notAField = 1
+    except TypeError:
+        pass
+
+if __name__ == '__main__':
+    main()
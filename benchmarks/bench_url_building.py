@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Tintri, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+ Cost per call of building the URL of a request with TintriBase._process_request, for the URL shapes of
+ get_vm (id appended) and get_vms (collection), next to the cost of the inspect.stack() call that
+ _process_request made on every request before the URL shape was passed explicitly.
+
+ Command usage: python bench_url_building.py [calls]
+"""
+
+import inspect
+import sys
+import timeit
+from standin import import_tintri
+
+import_tintri()
+from tintri.v310 import Tintri, Vm
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    tintri = Tintri('vmstore.example.com')
+    shapes = [
+        ('get_vm', lambda: tintri._process_request('GET', ['vm-1'], {}, None, Vm, None, None, True)),
+        ('get_vms', lambda: tintri._process_request('GET', [], {'limit': 100}, None, Vm, None, None, False)),
+    ]
+    for name, build in shapes:
+        print '%-8s %6.2f us per URL  %s' % (name, timeit.timeit(build, number=calls) / calls * 1e6, build()[1])
+    # the removed check, called from a stack as deep as the one of a request sent by an API function
+    def removed_check():
+        return inspect.stack()[1][3]
+    def api_function(): return send_http_request()
+    def send_http_request(): return process_request()
+    def process_request(): return removed_check()
+    stack_calls = max(1, calls / 100)
+    print 'inspect.stack() %6.2f us per call (removed from every request)' % (timeit.timeit(api_function, number=stack_calls) / stack_calls * 1e6)
+
+if __name__ == '__main__':
+    main()
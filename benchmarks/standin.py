@@ -0,0 +1,195 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2017 Tintri, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Local HTTPS stand-in of the REST API of a VMstore, used by the benchmarks. It serves synthetic VMs, datastores
+and snapshots with a configurable latency, on HTTP/1.1 keep-alive connections and a self-signed certificate
+created with the openssl command.
+"""
+
+import imp
+import json
+import os
+import re
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urlparse
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+def import_tintri():
+    """Imports the SDK, from the source tree of this repository if it is not installed"""
+    try:
+        import tintri
+    except ImportError:
+        src = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+        tintri = imp.load_module('tintri', None, src, ('', '', imp.PKG_DIRECTORY))
+    return tintri
+
+def vm(i):
+    """Returns a synthetic VM"""
+    return {'typeId': 'com.tintri.api.rest.v310.dto.domain.VirtualMachine',
+            'uuid': {'uuid': 'vm-%d' % i}, 'vmware': {'name': 'vm%d' % i, 'storageContainers': ['default']},
+            'lastUpdatedTime': 1470000000000 + i, 'isLive': True,
+            'stat': {'sortedStats': [{'latencyTotalMs': float(i % 97), 'operationsTotalIops': 2.0 * i, 'timeEnd': '2016-08-01T00:%02d:00.000-07:00' % (i % 60)}]},
+            'replication': {'configurationsOutgoing': []}}
+
+def _certificate(directory):
+    key, cert = os.path.join(directory, 'key.pem'), os.path.join(directory, 'cert.pem')
+    with open(os.devnull, 'w') as null:
+        subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert,
+                               '-days', '1', '-subj', '/CN=localhost'], stdout=null, stderr=null)
+    return key, cert
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        pass # clients closing their connections
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = 65536 # buffer each response and send it at once
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, code, body, headers={}):
+        data = body if isinstance(body, str) else json.dumps(body)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def do_GET(self): self.handle_request('GET')
+    def do_POST(self): self.handle_request('POST')
+    def do_PUT(self): self.handle_request('PUT')
+    def do_DELETE(self): self.handle_request('DELETE')
+
+    def handle_request(self, method):
+        standin = self.server.standin
+        url = urlparse.urlparse(self.path)
+        query = dict(urlparse.parse_qsl(url.query))
+        path = url.path
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else ''
+        with standin.lock:
+            standin.requests += 1
+
+        if path == '/api/info':
+            return self.send(200, {'typeId': 'com.tintri.api.rest.v.dto.domain.RestApi', 'productName': 'Tintri VMstore', 'preferredVersion': 'v310.51',
+                                   'supportedVersionSet': ['v310.11', 'v310.21', 'v310.31', 'v310.41', 'v310.51']})
+        if path.endswith('/session/login'):
+            with standin.lock:
+                standin.logins += 1
+                session = standin.logins
+            return self.send(200, '"%s"' % json.loads(body).get('username', ''), {'Set-Cookie': 'JSESSIONID=s%d; Path=/' % session})
+        if path.endswith('/session/logout'):
+            return self.send(204, '')
+        if not re.search(r'JSESSIONID=s\d+', self.headers.get('cookie', '')):
+            return self.send(401, {'code': 'ERR-API-0104', 'message': 'Invalid session', 'causeDetails': ''})
+
+        if standin.latency:
+            time.sleep(standin.latency)
+        match = re.match(r'/api/v310/vm/([^/]+)$', path)
+        if match and method == 'GET':
+            return self.send(200, vm(int(match.group(1).split('-')[-1])))
+        if path == '/api/v310/vm' and method == 'GET':
+            offset, limit = int(query.get('offset', 0)), int(query.get('limit', 100))
+            page = {'typeId': 'com.tintri.api.rest.v310.dto.Page', 'total': standin.vms, 'filteredTotal': standin.vms, 'offset': offset,
+                    'limit': limit, 'items': [vm(i) for i in xrange(offset, min(offset + limit, standin.vms))]}
+            if offset + limit < standin.vms:
+                page['next'] = 'offset=%d&limit=%d' % (offset + limit, limit)
+            return self.send(200, page)
+        match = re.match(r'/api/v310/datastore/([^/]+)$', path)
+        if match and method == 'GET':
+            return self.send(200, {'typeId': 'com.tintri.api.rest.v310.dto.domain.Datastore', 'uuid': {'uuid': match.group(1)}, 'isReplicationEnabled': False})
+        if path == '/api/v310/snapshot' and method == 'POST':
+            specs = json.loads(body)
+            time.sleep(standin.snapshot_latency + standin.snapshot_spec_latency * len(specs))
+            if any(spec.get('sourceVmTintriUUID', '').startswith('bad') for spec in specs):
+                return self.send(400, {'code': 'ERR-API-0400', 'message': 'Invalid VM', 'causeDetails': ''})
+            with standin.lock:
+                standin.snapshots += len(specs)
+            return self.send(200, ['snap-%s' % spec.get('sourceVmTintriUUID') for spec in specs])
+        self.send(404, {'code': 'ERR-API-0404', 'message': 'Not found: %s %s' % (method, path), 'causeDetails': ''})
+
+class StandIn(object):
+    """
+    Local HTTPS stand-in of a VMstore
+
+    Args:
+        port (int): Port listened to, 0 for any free port
+        vms (int): Number of VMs served by get_vms
+        latency (float): Seconds each authenticated request takes
+        snapshot_latency (float): Seconds each create_snapshot request takes
+        snapshot_spec_latency (float): Seconds added to a create_snapshot request per snapshot spec
+    """
+    def __init__(self, port=0, vms=1000, latency=0, snapshot_latency=0.1, snapshot_spec_latency=0.002):
+        self.vms = vms
+        self.latency = latency
+        self.snapshot_latency = snapshot_latency
+        self.snapshot_spec_latency = snapshot_spec_latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.logins = 0
+        self.snapshots = 0
+        self.__directory = tempfile.mkdtemp(prefix='tintri-standin-')
+        key, cert = _certificate(self.__directory)
+        self.__server = _Server(('127.0.0.1', port), _Handler)
+        self.__server.standin = self
+        self.__server.socket = ssl.wrap_socket(self.__server.socket, keyfile=key, certfile=cert, server_side=True)
+        self.__thread = threading.Thread(target=self.__server.serve_forever)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    @property
+    def host(self):
+        """host:port of the stand-in"""
+        return '127.0.0.1:%d' % self.__server.server_address[1]
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        shutil.rmtree(self.__directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    standin = StandIn(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8443)
+    print 'Serving on https://%s, Ctrl-C to stop' % standin.host
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        standin.stop()
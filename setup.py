@@ -1,29 +1,48 @@
-#!/usr/bin/python
-import os
-
-from setuptools import setup, find_packages
-
-def read(fname):
-    return open(os.path.join(os.path.dirname(__file__), fname)).read()
-
-setup(
-    name='Tintri PySDK',
-    version='1.0',
-    include_package_data=True,
-    description='A Python SDK for Tintri management APIs.',
-    author='Tintri',
-    author_email='pysdk@tintri.com',
-    license='BSD',
-    keywords='tintri python sdk',
-    url='http://hub.tintricity.com/discussions/automation',
-    packages=find_packages(exclude=["test", "tintri.test", "tintri.test.*", "tintri.v310.internal"]),
-    long_description=read('README'),
-    classifiers=[
-        'Development Status :: 5 - Production/Stable',
-        'Topic :: Utilities',
-        'License :: OSI Approved :: BSD License'
-    ],
-    install_requires=[
-        'requests'
-    ]
-)
+#!/usr/bin/python
+import os
+import sys
+
+from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
+
+def read(fname):
+    return open(os.path.join(os.path.dirname(__file__), fname)).read()
+
+# Modules using Python 3 only syntax, left out of Python 2 builds
+PY3_ONLY_MODULES = [('tintri.v310', 'aio')]
+
+class BuildPy(build_py):
+    """Leaves the Python 3 only modules out of Python 2 builds, which would fail to byte-compile them"""
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info[0] < 3:
+            modules = [module for module in modules if (module[0], module[1]) not in PY3_ONLY_MODULES]
+        return modules
+
+setup(
+    name='Tintri PySDK',
+    version='1.0',
+    include_package_data=True,
+    description='A Python SDK for Tintri management APIs.',
+    author='Tintri',
+    author_email='pysdk@tintri.com',
+    license='BSD',
+    keywords='tintri python sdk',
+    url='http://hub.tintricity.com/discussions/automation',
+    packages=find_packages(exclude=["test", "tintri.test", "tintri.test.*", "tintri.v310.internal"]),
+    long_description=read('README'),
+    classifiers=[
+        'Development Status :: 5 - Production/Stable',
+        'Topic :: Utilities',
+        'License :: OSI Approved :: BSD License'
+    ],
+    install_requires=[
+        'requests'
+    ],
+    extras_require={
+        'aio': ['aiohttp']
+    },
+    cmdclass={
+        'build_py': BuildPy
+    }
+)
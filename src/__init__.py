@@ -36,7 +36,7 @@ __copyright__ = 'Copyright 2016 Tintri Inc'
 __license__ = 'BSD'
 __version__ = '1.0'
 
-__all__ = ['TintriError', 'TintriServerError', 'TintriAuthenticationError', 'TintriAuthorizationError', 'TintriObject', 'TintriEntity', 'Version']
+__all__ = ['TintriError', 'TintriServerError', 'TintriAuthenticationError', 'TintriAuthorizationError', 'TintriObject', 'TintriEntity', 'Version', 'CapabilityCache', 'ResponseCache', 'TintriRecord']
 
-from common import TintriError, TintriServerError, TintriAuthenticationError, TintriAuthorizationError, TintriObject, TintriEntity, Version, TINTRI_LOG_LEVEL_DATA
-from utils import dump_object
+from common import TintriError, TintriServerError, TintriAuthenticationError, TintriAuthorizationError, TintriObject, TintriEntity, Version, CapabilityCache, ResponseCache, TINTRI_LOG_LEVEL_DATA
+from utils import dump_object, TintriRecord
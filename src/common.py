@@ -38,16 +38,43 @@ __version__ = '1.0'
 
 import logging
 import requests
+import requests.adapters
 import json
 import types
 import urllib
 import inspect
+import threading
+import weakref
+import Queue
+import collections
+import os
+import sys
+import time
+try:
+    import fcntl
+except ImportError: # not on Windows, files are then written without locking
+    fcntl = None
 
 TINTRI_LOG_LEVEL_DATA = 5
 DEFAULT_LOGGER_NAME = 'tintri'
 DEFAULT_API_VERSION = '310'
-
-from .utils import map_to_object, object_to_json, TintriJSONEncoder
+DEFAULT_POOL_CONNECTIONS = 10 # number of host connection pools to cache
+DEFAULT_POOL_MAXSIZE = 10 # maximum number of connections kept per host
+STREAM_CHUNK_SIZE = 65536 # bytes read from the socket at a time when streaming a page
+DEFAULT_CAPABILITY_TTL = 3600 # seconds server information is cached
+SESSION_REFRESH_MARGIN = 30 # seconds before the session timeout an idle session is renewed
+DEFAULT_RESPONSE_CACHE_SIZE = 1000 # responses kept by a response cache
+# Entity class name or resource -> seconds GET responses are cached by default, for resources changing rarely
+DEFAULT_RESPONSE_CACHE_TTLS = { 'Datastore': 60, 'ApplianceInfo': 300, 'ApplianceDns': 300, 'License': 300, 'role': 300 }
+
+# How API responses are returned
+RESPONSE_MODE_OBJECTS = 'objects' # TintriObject instances
+RESPONSE_MODE_DICT = 'dict' # parsed JSON as is
+RESPONSE_MODE_RECORDS = 'records' # read-only TintriRecord views of the parsed JSON
+RESPONSE_MODE_LAZY = 'lazy' # TintriObject instances whose nested objects are built on first access
+RESPONSE_MODES = [RESPONSE_MODE_OBJECTS, RESPONSE_MODE_DICT, RESPONSE_MODE_RECORDS, RESPONSE_MODE_LAZY]
+
+from .utils import map_to_object, get_decoder, to_record, object_to_json, get_json_codec, StreamingPageParser
 
 class TintriError(Exception):
     """
@@ -150,10 +177,52 @@ class TintriInternalError(TintriServerError):
     def __init__(self, code, message, details):
         TintriServerError.__init__(self, 500, code=code, message=message, details=details)
 
+class _PagePrefetcher(object):
+    """Fetches the pages following a page on a background thread, holding at most depth fetched pages"""
+    def __init__(self, owner, page, depth):
+        # weak reference so the thread winds down if the iterated page is dropped half way
+        self.__owner = weakref.ref(owner)
+        self.__queue = Queue.Queue(maxsize=depth)
+        self.__stopped = threading.Event()
+        self.__page = page
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __run(self):
+        page, self.__page = self.__page, None
+        try:
+            while not self.__stopped.is_set() and self.__owner() is not None:
+                page = page._fetch_next_page()
+                self.__put((page, None))
+                if page is None or len(page) == 0:
+                    return
+        except Exception as e:
+            self.__put((None, e))
+
+    def __put(self, item):
+        # give up once the consumer stopped iterating, otherwise a full queue would block forever
+        while not self.__stopped.is_set() and self.__owner() is not None:
+            try:
+                self.__queue.put(item, timeout=0.5)
+                return
+            except Queue.Full:
+                pass
+
+    def next_page(self):
+        """Return the next fetched page, None if there are no more pages"""
+        page, error = self.__queue.get()
+        if error is not None:
+            raise error
+        return page
+
+    def stop(self):
+        self.__stopped.set()
+
 class TintriPage(object):
-    def __init__(self, paginated=False, auto_page=False, items=None, context={}):
+    def __init__(self, paginated=False, auto_page=False, items=None, context={}, prefetch=0):
         if paginated:
-            json_context = json.loads(context['response_data'])
+            json_context = context.get('page_data', {}) # page fields other than items, already parsed
             self.__total = json_context['total'] if 'total' in json_context else None
             self.__limit = json_context['limit'] if 'limit' in json_context else None
             self.__offset = json_context['offset'] if 'offset' in json_context else None
@@ -170,6 +239,8 @@ class TintriPage(object):
 
         self.__is_paginated = paginated
         self.__auto_page = auto_page
+        self.__prefetch = prefetch
+        self.__prefetcher = None
         self.__items = items
         self.__num_items = len(self.__items)
 
@@ -180,6 +251,7 @@ class TintriPage(object):
         self.__path_params = context['path_params']
         self.__response_class = context['response_class']
         self.__func = context['func']
+        self.__response_mode = context.get('response_mode')
         self.__current = 0
         self.__cur_page = self
 
@@ -260,15 +332,15 @@ class TintriPage(object):
                 if self.__cur_page.__next is None:
                     # raise StopIteration on iterating the last item
                     # reset current page
-                    self.__cur_page = self
+                    self.__reset_cur_page()
                     raise StopIteration()
                 else:
                     if self.__auto_page:
-                        # retrieve next page
-                        self.__cur_page = self.__cur_page.get_next_page()
+                        # retrieve next page, consumed pages are not kept on the page chain
+                        self.__cur_page = self.__get_next_auto_page()
                         # 49878
-                        if len(self.__cur_page) == 0:
-                            self.__cur_page = self
+                        if self.__cur_page is None or len(self.__cur_page) == 0:
+                            self.__reset_cur_page()
                             raise StopIteration()
                     else:
                         raise StopIteration()
@@ -283,12 +355,39 @@ class TintriPage(object):
                 # raise StopIteration on iterating the last item
                 raise StopIteration()
 
+    def __get_next_auto_page(self):
+        if self.__prefetch > 0:
+            if self.__prefetcher is None:
+                self.__prefetcher = _PagePrefetcher(self, self.__cur_page, self.__prefetch)
+            return self.__prefetcher.next_page()
+        return self.__cur_page._fetch_next_page()
+
+    def __reset_cur_page(self):
+        self.__cur_page = self
+        if self.__prefetcher is not None:
+            self.__prefetcher.stop()
+            self.__prefetcher = None
+
     def __getitem__(self, idx):
         """Return an item within a page if index is valid"""
         if idx >= self.__num_items:
             raise IndexError()
         return self.__items[idx]
 
+    def __fetch_page(self, link):
+        q_p_string = link.split("&")
+        q_p = {}
+        for item in q_p_string:
+            temp = item.split("=")
+            q_p[temp[0]] = temp[1]
+        return self.__func(path_params=self.__path_params, query_params=q_p, request_class=self.__request_class, response_class=self.__response_class, response_mode=self.__response_mode)
+
+    def _fetch_next_page(self):
+        """Fetch next page without caching it on this page, None if there is no next page"""
+        if self.__next:
+            return self.__fetch_page(self.__next)
+        return None
+
     def get_next_page(self):
         """Return next page if it exists"""
         if self.__next:
@@ -296,12 +395,7 @@ class TintriPage(object):
                 self.__next_page.__current = 0
                 return self.__next_page
             else:
-                q_p_string = self.__next.split("&")
-                q_p = {}
-                for item in q_p_string:
-                    temp = item.split("=")
-                    q_p[temp[0]] = temp[1]
-                self.__next_page = self.__func(path_params=self.__path_params, query_params=q_p, request_class=self.__request_class, response_class=self.__response_class)
+                self.__next_page = self.__fetch_page(self.__next)
                 return self.__next_page
         raise StopIteration()
 
@@ -312,28 +406,176 @@ class TintriPage(object):
                 self.__prev_page.__current = 0
                 return self.__prev_page
             else:
-                q_p_string = self.__prev.split("&")
-                q_p = {}
-                for item in q_p_string:
-                    temp = item.split("=")
-                    q_p[temp[0]] = temp[1]
-                self.__prev_page = self.__func(path_params=self.__path_params, query_params=q_p, request_class=self.__request_class, response_class=self.__response_class)
+                self.__prev_page = self.__fetch_page(self.__prev)
                 return self.__prev_page
         raise StopIteration()
 
+class TintriPageStream(object):
+    """
+    Page whose items are parsed from the HTTP response while they are iterated, returned by get
+    functions of paginated resources called with stream=True. Items are decoded one at a time and
+    are not kept, so a page can be iterated only once. With auto_page set, iteration continues
+    with the next pages, each streamed in turn.
+
+    Page fields following the items in the response are known once the items are iterated. Reading
+    such a field earlier parses the rest of the page and keeps the remaining items until iterated.
+    """
+    def __init__(self, response, decode, auto_page=False, context={}):
+        self.__response = response
+        self.__parser = StreamingPageParser(response.iter_content(STREAM_CHUNK_SIZE))
+        self.__items = self.__parser.items()
+        self.__pending = collections.deque() # items parsed ahead to reach page fields
+        self.__decode = decode
+        self.__auto_page = auto_page
+        self.__request_class = context['request_class']
+        self.__path_params = context['path_params']
+        self.__response_class = context['response_class']
+        self.__func = context['func']
+        self.__response_mode = context.get('response_mode')
+        self.__cur_page = self
+
+    def __field(self, name):
+        if name not in self.__parser.metadata and not self.__parser.done:
+            self.__pending.extend(self.__items)
+        return self.__parser.metadata.get(name)
+
+    @property
+    def limit(self): return self.__field('limit')
+
+    @property
+    def offset(self): return self.__field('offset')
+
+    @property
+    def page_number(self):
+        """Current page number"""
+        return self.__field('page')
+
+    @property
+    def total(self):
+        """Total number of active objects across all pages"""
+        return self.__field('total')
+
+    @property
+    def absoluteTotal(self):
+        """Absolute number of requested objects without any qualifications including filtering, active, or deleted"""
+        return self.__field('absoluteTotal')
+
+    @property
+    def filteredTotal(self):
+        """Number of objects as specified by filter. If no filter was requested, it would be same as total"""
+        return self.__field('filteredTotal')
+
+    @property
+    def pageTotal(self):
+        """Total number of pages"""
+        return self.__field('pageTotal')
+
+    @property
+    def completedIn(self):
+        """Time in milliseconds indicating how long it took to serve the request"""
+        return self.__field('completedIn')
+
+    @property
+    def lastUpdatedTime(self):
+        """Time when the page was accessed"""
+        return self.__field('lastUpdatedTime')
+
+    @property
+    def offsetMatchFound(self):
+        """Indicates if requested item(s) is/are found"""
+        return self.__field('offsetMatchFound')
+
+    @property
+    def overflow(self):
+        """Flag giving notice the amount of data did not fit into the given specified or default offset"""
+        return self.__field('overflow')
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """Iterates items in page along with navigating to next page"""
+        while True:
+            page = self.__cur_page
+            if page.__pending:
+                return page.__decode(page.__pending.popleft())
+            for item in page.__items:
+                return page.__decode(item)
+            page.close()
+            link = page.__field('next')
+            if not self.__auto_page or link is None:
+                raise StopIteration()
+            next_page = page.__fetch_page(link)
+            if next_page is None:
+                raise StopIteration()
+            self.__cur_page = next_page
+
+    def __fetch_page(self, link):
+        q_p = dict(item.split('=', 1) for item in link.split('&'))
+        return self.__func(path_params=self.__path_params, query_params=q_p, request_class=self.__request_class, response_class=self.__response_class,
+                           response_mode=self.__response_mode, stream=True)
+
+    def close(self):
+        """Releases the HTTP connection of the current page"""
+        self.__cur_page.__response.close()
+        self.__response.close()
+
 class TintriObject(object):
     """Base class for Tintri serializable classes"""
+    # the raw JSON of the fields not built yet by lazy decoding is kept in a slot, out of the instance fields
+    __slots__ = ('__lazy', '__dict__', '__weakref__')
     typeId = None
     _property_map = {}
     _is_paginated = False
 
     def __init__(self):
+        TintriObject.__lazy.__set__(self, None)
         if hasattr(self.__class__, 'typeId'):
-            self.typeId = self.__class__.typeId
+            self.__dict__['typeId'] = self.__class__.typeId # class attribute, allowed by any attribute watch dog
 
     def _tostr(self): return '%s %s' % (self.__class__.__name__, object_to_json(self))
     def __str__(self): return self._tostr() # default str() using json format
 
+    # only called when normal lookup fails, builds a field left as raw JSON by lazy decoding
+    def __getattr__(self, name):
+        pending = self._pending_fields()
+        if pending is None or name not in pending:
+            raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+        value = get_decoder(self._property_map.get(name, TintriObject), lazy=True)(pending.pop(name))
+        self.__dict__[name] = value
+        if not pending:
+            TintriObject.__lazy.__set__(self, None)
+        return value
+
+    def _pending_fields(self):
+        """Returns field name -> raw JSON of the fields left to build by lazy decoding, None if there are none"""
+        try:
+            return TintriObject.__lazy.__get__(self, TintriObject)
+        except AttributeError: # not set by a constructor
+            return None
+
+    def _set_pending_fields(self, pending):
+        """Sets the fields left as raw JSON by lazy decoding, built by __getattr__ on first access"""
+        TintriObject.__lazy.__set__(self, pending or None)
+
+    def _materialize(self):
+        """Builds all fields left as raw JSON by lazy decoding"""
+        pending = self._pending_fields()
+        if pending:
+            TintriObject.__lazy.__set__(self, None)
+            for name, value in pending.iteritems():
+                if name not in self.__dict__:
+                    self.__dict__[name] = get_decoder(self._property_map.get(name, TintriObject), lazy=True)(value)
+
+    # pickled and copied with all fields built, the slot is not part of the state
+    def __getstate__(self):
+        self._materialize()
+        return self.__dict__
+
+    def __setstate__(self, state):
+        TintriObject.__lazy.__set__(self, None)
+        self.__dict__.update(state)
+
 class TintriEntity(TintriObject):
     """
     Base class for Tintri REST resources
@@ -353,22 +595,321 @@ class TintriEntity(TintriObject):
     #     if hasattr(self.__class__, 'typeId'):
     #         self.typeId = self.__class__.typeId
 
-    # watch dog for setting illegal attributes
+    @classmethod
+    def _settable_attributes(cls):
+        """
+        Attribute names allowed by the watch dog: class attributes, mapped properties and the fields a default
+        constructed instance has, which are the ones its constructors declare. Computed once per class and
+        stored on the class itself.
+        """
+        attrs = cls.__dict__.get('_settable_attrs')
+        if attrs is None:
+            names = set()
+            for klass in inspect.getmro(cls):
+                names.update(klass.__dict__.keys())
+                names.update(getattr(klass, '_property_map', {}).keys())
+            # stored first so that the fields the constructor sets are allowed as being set in a constructor
+            cls._settable_attrs = frozenset(names)
+            try:
+                names.update(vars(cls()))
+            except Exception:
+                pass # constructor needs arguments, other fields set in constructors are checked on each set
+            attrs = cls._settable_attrs = frozenset(names)
+        return attrs
+
+    # watch dog for setting illegal attributes, deserialization writes to __dict__ directly and is not guarded
     def __setattr__(self, name, value):
-        if hasattr(self, name) or not hasattr(self, '_ignores_setattr') or self._ignores_setattr:
-            object.__setattr__(self, name, value)
-        else:
-            caller = inspect.stack()[1]
-            if caller[3] == '__init__': # not constructor
-                object.__setattr__(self, name, value)
-            else:
-                raise TypeError('Setting attribute %r on object of type %s is not allowed' % (name, self.__class__.__name__))
+        fields = self.__dict__
+        if name in fields:
+            fields[name] = value # field already set, entities define no data descriptors
+            return
+        pending = self._pending_fields()
+        if pending and name in pending:
+            # an assigned value replaces the raw JSON still waiting to be built
+            del pending[name]
+            if not pending:
+                self._set_pending_fields(None)
+        elif not (self._ignores_setattr or name in self._settable_attributes() or sys._getframe(1).f_code.co_name == '__init__'):
+            raise TypeError('Setting attribute %r on object of type %s is not allowed' % (name, self.__class__.__name__))
+        object.__setattr__(self, name, value)
 
 class Version(TintriObject):
     """Version class of a Tintri server across all Tintri API versions """
     _url = 'https://%s/api/info'
     _requires_auth = False
 
+class CapabilityCache(object):
+    """
+    Cache of server information returned by /api/info, such as product name and supported API versions,
+    keyed by host and shared by all clients using it. Entries expire after ttl seconds. If path is given,
+    entries are also saved to that JSON file and read back by other processes. Saves merge the entries other
+    processes saved, under a lock of the file path + '.lock'.
+
+    Args:
+        ttl (int): Seconds an entry is valid
+        path (str): JSON file persisting the entries
+    """
+    def __init__(self, ttl=DEFAULT_CAPABILITY_TTL, path=None):
+        self.__ttl = ttl
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__entries = {} # host -> (expiry time, server information)
+        self.__file_mtime = None
+
+    @property # read only
+    def ttl(self): return self.__ttl
+
+    @property # read only
+    def path(self): return self.__path
+
+    def get(self, host):
+        """Returns cached server information of host as a JSON object, None if not cached or expired"""
+        with self.__lock:
+            entry = self.__entries.get(host)
+            if (entry is None or entry[0] < time.time()) and self.__path:
+                self.__load() # may have been saved by another process
+                entry = self.__entries.get(host)
+            if entry is None or entry[0] < time.time():
+                return None
+            return entry[1]
+
+    def put(self, host, info):
+        """Caches server information of host given as a JSON object"""
+        with self.__lock:
+            entry = (time.time() + self.__ttl, info)
+            if self.__path:
+                self.__save(lambda: self.__entries.__setitem__(host, entry))
+            else:
+                self.__entries[host] = entry
+
+    def invalidate(self, host=None):
+        """Removes host, or all hosts if None, from the cache"""
+        with self.__lock:
+            if host is None:
+                update = self.__entries.clear
+            else:
+                update = lambda: self.__entries.pop(host, None)
+            if self.__path:
+                self.__save(update)
+            else:
+                update()
+
+    def __load(self, force=False):
+        try:
+            mtime = os.path.getmtime(self.__path)
+            if mtime == self.__file_mtime and not force:
+                return
+            with open(self.__path) as f:
+                entries = json.load(f)
+            self.__file_mtime = mtime
+        except (IOError, OSError, ValueError):
+            return # no usable file, entries are fetched from servers
+        now = time.time()
+        for host, (expires, info) in entries.iteritems():
+            if expires >= now and expires > self.__entries.get(host, (0, None))[0]:
+                self.__entries[host] = (expires, info)
+
+    def __save(self, update):
+        """
+        Merges the entries saved by other processes, applies update to the entries and saves them. The file is
+        locked meanwhile so that concurrent saves of other processes are not lost.
+        """
+        try:
+            with _FileLock(self.__path + '.lock'):
+                self.__load(force=True)
+                update()
+                # write to a temporary file first so that readers never see a partial file
+                tmp_path = '%s.%d.tmp' % (self.__path, os.getpid())
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.__entries, f)
+                os.rename(tmp_path, self.__path)
+                self.__file_mtime = os.path.getmtime(self.__path)
+        except (IOError, OSError) as e:
+            update()
+            logging.getLogger(DEFAULT_LOGGER_NAME).warning('Failed to save capability cache to %s. Error:%s' % (self.__path, e))
+
+class _FileLock(object):
+    """Exclusive lock of a file between processes, held in a with statement. Does not lock without fcntl."""
+    def __init__(self, path):
+        self.__path = path
+        self.__file = None
+
+    def __enter__(self):
+        self.__file = open(self.__path, 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.__file, fcntl.LOCK_EX)
+            except:
+                self.__file.close()
+                raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.__file, fcntl.LOCK_UN)
+        finally:
+            self.__file.close()
+
+# Capability cache shared by clients created without one
+default_capability_cache = CapabilityCache()
+
+class _SingleFlight(object):
+    """Runs a function once for concurrent calls with the same key, the callers waiting for it share its outcome"""
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__calls = {} # key -> call in flight: [done event, result, exc_info]
+        self.__coalesced = 0
+
+    @property # read only
+    def coalesced(self):
+        """Number of calls that got the outcome of another call"""
+        return self.__coalesced
+
+    def do(self, key, func):
+        """
+        Returns the result of func, or of the call in flight with the same key. The result is shared as is,
+        func should return an immutable value. An exception of func is raised in every caller with its traceback.
+        """
+        with self.__lock:
+            call = self.__calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.__calls[key] = [threading.Event(), None, None]
+        if not leader:
+            call[0].wait()
+            with self.__lock: self.__coalesced += 1
+            if call[2] is not None:
+                raise call[2][0], call[2][1], call[2][2]
+            return call[1]
+        try:
+            call[1] = func()
+            return call[1]
+        except Exception:
+            call[2] = sys.exc_info()
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call[0].set()
+
+# Response served from a response cache in place of an HTTP response
+_CachedResponse = collections.namedtuple('_CachedResponse', ['status_code', 'text'])
+
+class ResponseCache(object):
+    """
+    Cache of the responses of GET requests, keyed by URL and user name so that users of different roles sharing a cache
+    never see each other's responses. How long a response is cached is set per
+    entity class, or per resource (first URL path segment after the API version, such as 'role') for requests
+    without entity class. Once expired, a response having an ETag or Last-Modified header is revalidated with
+    a conditional request and reused if the server answers 304 Not Modified. The least recently used responses
+    are evicted beyond max_entries. A create, update or delete sent by the client removes the cached responses
+    of the same resource.
+
+    Args:
+        ttls (dict): Entity class, class name or resource -> seconds its responses are cached
+        ttl (int): Seconds responses of other entity classes and resources are cached, 0 does not cache them
+        max_entries (int): Maximum number of responses cached
+    """
+    def __init__(self, ttls=DEFAULT_RESPONSE_CACHE_TTLS, ttl=0, max_entries=DEFAULT_RESPONSE_CACHE_SIZE):
+        self.__ttls = dict((key if isinstance(key, basestring) else key.__name__, value) for key, value in ttls.iteritems())
+        self.__ttl = ttl
+        self.__max_entries = max_entries
+        self.__lock = threading.Lock()
+        self.__entries = collections.OrderedDict() # (url, username) -> [expiry time, resource, text, etag, last modified], least recently used first
+        self.__hits = 0
+        self.__misses = 0
+        self.__revalidations = 0
+
+    @property # read only
+    def max_entries(self): return self.__max_entries
+
+    @property # read only
+    def hits(self):
+        """Number of requests answered from the cache without a request to the server"""
+        return self.__hits
+
+    @property # read only
+    def misses(self):
+        """Number of cacheable requests sent to the server, including conditional requests of expired responses"""
+        return self.__misses
+
+    @property # read only
+    def revalidations(self):
+        """Number of conditional requests answered 304 Not Modified, whose expired response was reused"""
+        return self.__revalidations
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get_ttl(self, cls, resource):
+        """Returns the seconds responses of an entity class and resource are cached, 0 if not cached"""
+        if cls is not None and cls.__name__ in self.__ttls:
+            return self.__ttls[cls.__name__]
+        return self.__ttls.get(resource, self.__ttl)
+
+    def lookup(self, url, username=None):
+        """
+        Looks up the cached response of url requested by username
+
+        Returns:
+            tuple: text of the response and None if fresh, otherwise None and the headers of a conditional request
+        """
+        key = (url, username)
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is None:
+                self.__misses += 1
+                return None, None
+            self.__entries[key] = entry # most recently used
+            if entry[0] >= time.time():
+                self.__hits += 1
+                return entry[2], None
+            self.__misses += 1
+            headers = {}
+            if entry[3]: headers['If-None-Match'] = entry[3]
+            if entry[4]: headers['If-Modified-Since'] = entry[4]
+            return None, headers
+
+    def revalidate(self, url, ttl, username=None):
+        """Extends the expiry of the response of url requested by username after a 304 answer, returns its text or None if no longer cached"""
+        with self.__lock:
+            entry = self.__entries.get((url, username))
+            if entry is None:
+                return None
+            entry[0] = time.time() + ttl
+            self.__revalidations += 1
+            return entry[2]
+
+    def put(self, url, resource, ttl, text, etag=None, last_modified=None, username=None):
+        """Caches the response of url requested by username fetched from the server"""
+        key = (url, username)
+        with self.__lock:
+            self.__entries.pop(key, None)
+            self.__entries[key] = [time.time() + ttl, resource, text, etag, last_modified]
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, resource=None):
+        """Removes the responses of resource, or all responses if None, from the cache"""
+        with self.__lock:
+            if resource is None:
+                self.__entries.clear()
+            else:
+                for key in [key for key, entry in self.__entries.iteritems() if entry[1] == resource]:
+                    del self.__entries[key]
+
+class _TimeoutHTTPAdapter(requests.adapters.HTTPAdapter):
+    """HTTP adapter applying a default timeout to requests sent without one"""
+    def __init__(self, timeout=None, **kwargs):
+        self.__timeout = timeout
+        super(_TimeoutHTTPAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.__timeout
+        return super(_TimeoutHTTPAdapter, self).send(request, **kwargs)
+
 # class ObjectListBase(object):
 #     """Abstract base class for object list retuned from a Tintri server"""
 #     def __iter__(self):
@@ -380,7 +921,9 @@ class TintriBase(object):
     """
     method_registry = {}
 
-    def __init__(self, host, username=None, password=None, api_version=DEFAULT_API_VERSION, logger_name=DEFAULT_LOGGER_NAME, auto_login=True, disable_cert_warning=True, custom_client_header=None, auto_page=True):
+    def __init__(self, host, username=None, password=None, api_version=DEFAULT_API_VERSION, logger_name=DEFAULT_LOGGER_NAME, auto_login=True, disable_cert_warning=True, custom_client_header=None, auto_page=True,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, keep_alive=True, prefetch=0, response_mode=RESPONSE_MODE_OBJECTS,
+                 json_codec='json', capability_cache=None, timeout=None, response_cache=None, coalesce_gets=False, session_timeout=None):
         # Stored variables across login sessions
         self.__host = host
         self.__username = username
@@ -397,15 +940,54 @@ class TintriBase(object):
             import requests.packages.urllib3
             requests.packages.urllib3.disable_warnings()
 
+        # HTTP connection pool shared by all requests to the server
+        self.__init_http_session(pool_connections, pool_maxsize, keep_alive, timeout)
+
         # Per-session initialization, also called after logging out
+        self.__login_lock = threading.RLock() # one thread at a time logs in
+        self.__session_timeout = session_timeout
         self.__init_per_session_vars()
         # flag to paginate items if not already done by API
         # for items that are paged, this flag is used to navigate to next page
         self.__auto_page = auto_page
+        # number of pages fetched in background ahead of the page being iterated when auto-paging
+        self.__prefetch = prefetch
+        if response_mode not in RESPONSE_MODES:
+            raise TintriError("Invalid response mode %s, should be one of %s" % (response_mode, RESPONSE_MODES))
+        self.__response_mode = response_mode
+        # codec used to decode responses and encode requests, a name or an object with loads() and dumps() methods
+        if isinstance(json_codec, basestring):
+            try:
+                json_codec = get_json_codec(json_codec)
+            except (ValueError, ImportError) as e:
+                raise TintriError(cause=e, message="Cannot use JSON codec %s: %s" % (json_codec, e))
+        self.__json_codec = json_codec
+        # server information shared with other clients of the same host
+        self.__capability_cache = default_capability_cache if capability_cache is None else capability_cache
+        self.__supported_versions = frozenset()
+        self.__warm_version()
+        # GET responses reused until they expire, None disables caching
+        self.__response_cache = response_cache
+        # concurrent identical GET requests share one request and result when set
+        self.__single_flight = _SingleFlight() if coalesce_gets else None
+        # state of the calling thread, such as its last HTTP response
+        self.__local = threading.local()
 
     def __init_per_session_vars(self):
         self.__version = None # device version
         self.__session_id = None
+        self.__session_username = None # user the session is logged in as
+        self.__session_used = 0 # time of the last response of the session
+
+    def __init_http_session(self, pool_connections, pool_maxsize, keep_alive, timeout):
+        self.__keep_alive = keep_alive
+        self.__timeout = timeout
+        self.__http_session = requests.Session()
+        adapter = _TimeoutHTTPAdapter(timeout=timeout, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.__http_session.mount('https://', adapter)
+        self.__http_session.mount('http://', adapter)
+        if not keep_alive:
+            self.__http_session.headers['Connection'] = 'close'
 
     def __init_logging(self):
         try: # To avoid "No handler found" warnings for Python version < 2.7
@@ -522,6 +1104,27 @@ class TintriBase(object):
         """
         return self.__session_id
 
+    @property # read only
+    def session_timeout(self):
+        """
+        Seconds of inactivity after which the server expires a session, default value=None (unknown).
+        When set with auto_login, an idle session is renewed before the next request instead of after a failed one.
+
+        Returns:
+            float: session_timeout
+        """
+        return self.__session_timeout
+
+    @property # read only
+    def keep_alive(self):
+        """
+        Specifies if HTTP connections to the server are kept open and reused across requests, default value=True
+
+        Returns:
+            bool: keep_alive
+        """
+        return self.__keep_alive
+
     @property # read only
     def version(self):
         """
@@ -551,24 +1154,161 @@ class TintriBase(object):
         """
         return self.__auto_page
 
+    @property # read only
+    def prefetch(self):
+        """
+        Number of pages fetched in the background ahead of the page being iterated when auto_page is set, default value=0 (no prefetching)
+
+        Returns:
+            int: prefetch
+        """
+        return self.__prefetch
+
+    @property # read only
+    def response_mode(self):
+        """
+        Form of API responses, can be overridden per call with the response_mode argument, default value='objects'
+
+        =========    ===================================================================================
+        Mode         API Return value
+        =========    ===================================================================================
+        objects      `TintriObject` instances such as `Vm` with all nested objects built
+        dict         Parsed JSON as is
+        records      Read-only `TintriRecord` views of the parsed JSON, nested objects wrapped on access
+        lazy         `TintriObject` instances whose nested objects are built on first access
+        =========    ===================================================================================
+
+        Returns:
+            str: response_mode
+        """
+        return self.__response_mode
+
+    @property # read only
+    def json_codec(self):
+        """
+        JSON codec decoding responses and encoding requests, by default the standard json module. A faster library is used
+        when asked for by name, or with 'auto' for the fastest installed of ujson and simplejson.
+        Streamed pages are always parsed with the json module.
+
+        Returns:
+            `JSONCodec`: json_codec
+        """
+        return self.__json_codec
+
+    @property # read only
+    def timeout(self):
+        """
+        Seconds to wait for the server to accept a connection or send data, default value=None (wait forever)
+
+        Returns:
+            float: timeout
+        """
+        return self.__timeout
+
+    @property # read only
+    def response_cache(self):
+        """
+        Cache of GET responses of rarely changing resources, default value=None (responses are not cached)
+
+        Returns:
+            `ResponseCache`: response_cache
+        """
+        return self.__response_cache
+
+    @property # read only
+    def coalesce_gets(self):
+        """
+        Specifies if concurrent identical GET requests sent by several threads share one HTTP request, default value=False.
+        Each thread decodes the shared response into its own objects. Streamed pages are not shared.
+
+        Returns:
+            bool: coalesce_gets
+        """
+        return self.__single_flight is not None
+
+    @property # read only
+    def coalesced_gets(self):
+        """
+        Number of GET requests answered with the response of an identical request in flight
+
+        Returns:
+            int: coalesced_gets
+        """
+        return self.__single_flight.coalesced if self.__single_flight is not None else 0
+
+    @property
+    def _httpresp(self):
+        """Last HTTP response received by the calling thread, for debugging"""
+        return getattr(self.__local, 'httpresp', None)
+
+    @_httpresp.setter
+    def _httpresp(self, httpresp):
+        self.__local.httpresp = httpresp
+
+    @property # read only
+    def client_header(self):
+        """
+        Value of the Tintri-Api-Client header sent at login
+
+        Returns:
+            str: client_header
+        """
+        return self.__get_client_header()
+
     def get_rest_methods(self):
         methods = [] + self.method_registry.keys()
         methods.sort()
         return methods
 
     def __get_version(self):
-        if not self.__version:
+        if not self.__version and not self.__warm_version():
             headers = {'content-type': 'application/json'}
             versionUrl = 'https://%s/api/info' % self.host
-            httpResp = requests.get(versionUrl, headers=headers, verify=False)
+            httpResp = self.__http_session.get(versionUrl, headers=headers, verify=False)
             if httpResp.status_code is not 200:
                 err = 'Failed to retrieve info page. HTTP status code: %d' % httpResp.status_code
                 self.__logger.error(err)
                 raise TintriServerError(httpResp.status_code, message=err)
-            self.__version = map_to_object(json.loads(httpResp.text), Version)
+            info = self.__json_codec.loads(httpResp.text)
+            self.__capability_cache.put(self.host, info)
+            self.__set_version(info)
             self.__logger.debug('%s preferredVersion:%s' % (self.__version.productName, self.__version.preferredVersion))
         return self.__version
 
+    def __warm_version(self):
+        """Sets version from the capability cache without contacting the server, False if not cached"""
+        info = self.__capability_cache.get(self.host)
+        if info is None:
+            return False
+        self.__set_version(info)
+        return True
+
+    def __set_version(self, info):
+        self.__version = map_to_object(info, Version)
+        self.__supported_versions = frozenset(getattr(self.__version, 'supportedVersionSet', None) or [])
+
+    def supports_version(self, version):
+        """Indicates if the Tintri server supports an API version
+
+           Args:
+               version (str): API version such as v310.51
+
+           Returns:
+               bool: True if version is in the supported version set of the server
+        """
+        if not self.__version: self.__get_version()
+        return version in self.__supported_versions
+
+    @property # read only
+    def capability_cache(self):
+        """
+        Cache of server information shared with other clients of the same host
+
+        Returns:
+            `CapabilityCache`: capability_cache
+        """
+        return self.__capability_cache
+
     def __get_client_header(self):
         from .__init__ import __version__
         default_header = 'Tintri-PythonSDK-%s' % __version__
@@ -587,6 +1327,10 @@ class TintriBase(object):
            Returns:
                str: credentials role name
         """
+        with self.__login_lock:
+            return self.__login(username, password)
+
+    def __login(self, username, password):
         self.__get_version()
         
         if (username is None and self.__username is None) or  (password is None and self.__password is None):
@@ -599,32 +1343,41 @@ class TintriBase(object):
         data = {"username": login_username, "password": login_password, "typeId": "com.tintri.api.rest.vcommon.dto.rbac.RestApiCredentials"}
         login_url = 'https://%s/api/v%s/session/login' % (self.__host, self.__api_version)
         
-        httpresp = requests.post(login_url, json.dumps(data), headers=headers, verify=False)
+        httpresp = self.__http_session.post(login_url, self.__json_codec.dumps(data), headers=headers, verify=False)
         
         if httpresp.status_code is not 200:
             err = 'Failed to authenticate to %s as user %s pwd %s. HTTP status code: %d' % (self.host, self.username, self.password, httpresp.status_code)
             self.__logger.error(err)
             try:
-                json_error = json.loads(httpresp.text)
+                json_error = self.__json_codec.loads(httpresp.text)
             except Exception as e:
                 raise TintriServerError(httpresp.status_code, None, cause=`e`, details=err)
             raise TintriAuthenticationError(json_error['code'], json_error['message'], json_error['causeDetails'])
 
         self.__session_id = httpresp.cookies['JSESSIONID']
+        self.__session_username = login_username
+        self.__session_used = time.time()
         self.__logger.debug('Logged in to %s as %s' % (self.__host, self.__username))
         return httpresp.json()
 
     def logout(self):
         """Logout from Tintri server"""
 
-        if self.__session_id:
-            url = 'https://%s/api/v%s/session/logout' % (self.host, self.__api_version)
-            try:
-                requests.get(url, verify=False)
-                self.__logger.info('Logged out as user %s' % self.__username)
-            except Exception as e:
-                self.__logger.error('Failed to logout. Error:%s' % e)
-            self.__init_per_session_vars()
+        with self.__login_lock:
+            if self.__session_id:
+                url = 'https://%s/api/v%s/session/logout' % (self.host, self.__api_version)
+                try:
+                    self.__http_session.get(url, headers={'cookie': 'JSESSIONID=%s' % self.__session_id}, verify=False)
+                    self.__logger.info('Logged out as user %s' % self.__username)
+                except Exception as e:
+                    self.__logger.error('Failed to logout. Error:%s' % e)
+                self.__http_session.cookies.clear()
+                self.__init_per_session_vars()
+
+    def close(self):
+        """Logout from Tintri server if logged in and release pooled HTTP connections"""
+        self.logout()
+        self.__http_session.close()
 
     def change_password(self, new_password):
         """Change the Tintri server password
@@ -641,18 +1394,19 @@ class TintriBase(object):
         data = {"username": self.__username, "password": self.__password, "typeId": "com.tintri.api.rest.vcommon.dto.rbac.RestApiCredentials", 'newPassword': new_password}
         login_url = 'https://%s/api/v%s/session/login' % (self.__host, self.__api_version)
         
-        httpresp = requests.post(login_url, json.dumps(data), headers=headers, verify=False)
+        httpresp = self.__http_session.post(login_url, self.__json_codec.dumps(data), headers=headers, verify=False)
         
         if httpresp.status_code is not 200:
             err = 'Failed to change password from %s to %s for user %s on host %s. HTTP status code: %d' % (self.password, new_password, self.username, self.host, httpresp.status_code)
             self.__logger.error(err)
             try:
-                json_error = json.loads(httpresp.text)
+                json_error = self.__json_codec.loads(httpresp.text)
             except Exception as e:
                 raise TintriServerError(httpresp.status_code, None, cause=`e`, details=err)
             raise TintriAuthenticationError(json_error['code'], json_error['message'], json_error['causeDetails'])
 
         self.__session_id = httpresp.cookies['JSESSIONID']
+        self.__session_username = self.__username
         self.__password = new_password
         self.__logger.debug('Logged in to %s as %s' % (self.__host, self.__username))
         return httpresp.json()        
@@ -665,6 +1419,17 @@ class TintriBase(object):
         """
         return self.__session_id is not None # convert to boolean
 
+    def _use_session(self, session_id, username=None):
+        """
+        Sends the next requests in session_id, a session logged in as username by another client of the same server
+        such as `AsyncTintri`, or without a session if None. The current session is not logged out.
+        """
+        with self.__login_lock:
+            self.__http_session.cookies.clear()
+            self.__session_id = session_id
+            self.__session_username = username if session_id else None
+            self.__session_used = time.time()
+
     def is_vmstore(self):
         """Indicates if the Tintri server is a VMstore
 
@@ -715,7 +1480,7 @@ class TintriBase(object):
         headers = {'content-type': 'application/json'}
     
         try:
-            r = requests.get(report_url, headers=headers, verify=False, stream=True)
+            r = self.__http_session.get(report_url, headers=headers, verify=False, stream=True)
             if r.status_code != 200:
                 message = "The HTTP response for get call on: %s is %s" % (report_url, r.status_code)
                 raise TintriServerError(r.status_code, message=message)
@@ -736,27 +1501,29 @@ class TintriBase(object):
             raise TintriError("An unexpected error occurred: " + e.__str__())
 
 
-    def _send_raw_http_request(self, method, url, data=None):
+    def _send_raw_http_request(self, method, url, data=None, stream=False, extra_headers=None):
         self.__logger.debug('%s %s' % (method, url))
         if method in ['POST', 'PUT', 'PATCH']:
             self.__logger.log(TINTRI_LOG_LEVEL_DATA, 'Data: %s' % data)
 
         headers = {'content-type': 'application/json'}
+        if extra_headers:
+            headers.update(extra_headers)
         if self.__session_id:
             headers['cookie'] = 'JSESSIONID=%s' % self.__session_id
 
         if method in ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']:
-            if method == 'GET': httpresp = requests.get(url, headers=headers, verify=False)
-            elif method == 'POST': httpresp = requests.post(url, data, headers=headers, verify=False)
-            elif method == 'PUT': httpresp = requests.put(url, data, headers=headers, verify=False)
-            elif method == 'PATCH': httpresp = requests.patch(url, data, headers=headers, verify=False)
-            elif method == 'DELETE': httpresp = requests.delete(url, headers=headers, verify=False)
-            self._httpresp = httpresp # self._httpresp is for debugging only, not thread-safe
+            if method == 'GET': httpresp = self.__http_session.get(url, headers=headers, verify=False, stream=stream)
+            elif method == 'POST': httpresp = self.__http_session.post(url, data, headers=headers, verify=False)
+            elif method == 'PUT': httpresp = self.__http_session.put(url, data, headers=headers, verify=False)
+            elif method == 'PATCH': httpresp = self.__http_session.patch(url, data, headers=headers, verify=False)
+            elif method == 'DELETE': httpresp = self.__http_session.delete(url, headers=headers, verify=False)
+            self._httpresp = httpresp # self._httpresp is for debugging only, kept per thread
             return httpresp
         else:
             raise TintriError(None, message='Invalid HTTP method: ' + method) # This should never happen
 
-    def _process_request(self, method, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, data=None):
+    def _process_request(self, method, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, data=None, append_id=False):
         '''
         Preprocess request
         
@@ -764,6 +1531,7 @@ class TintriBase(object):
         1. if resource_url is present, use it
         2. otherwise if request_class._url is not None, use it
         3. otherwise use request_class.__name__ with lowercase of first letter
+        4. if append_id is set and request_class is not a singleton, the resource ID is added as last path segment
         '''
         #self.__logger.debug('method:%s pparams:%s qparams:%s rurl:%s' % (method, `path_params`, `query_params`, resource_url))
         # Puts tintri host, API version and any URL path parameters, query params in URL
@@ -786,11 +1554,8 @@ class TintriBase(object):
             urltemplate = '/' + urltemplate
         urltemplate = r'https://%s/api/v%s' + urltemplate
         
-        stack = inspect.stack()
-        caller = stack[2][3]
-        if caller in ['_get_one', '_update', '_patch', '_delete']:
-            if request_class is not None and not request_class._is_singleton:
-                urltemplate += '/%s'
+        if append_id and request_class is not None and not request_class._is_singleton:
+            urltemplate += '/%s'
                 
         #self.logger.debug('urltemplate: %s, localargs: %s' % (urltemplate, localargs))
         if urltemplate.count("%s") != len(([self.host, self.api_version] + localargs)):
@@ -814,11 +1579,34 @@ class TintriBase(object):
 
         jsondata = data
         if not type(data) in types.StringTypes:
-            jsondata = json.dumps(data, cls=TintriJSONEncoder)
+            jsondata = self.__json_codec.dumps(data)
     
         return method, url, jsondata
 
+    def _call_with_response_mode(self, response_mode, func, args, kwargs):
+        """Calls func, the requests it sends from the calling thread without response mode using response_mode"""
+        previous = getattr(self.__local, 'response_mode', None)
+        self.__local.response_mode = response_mode
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.__local.response_mode = previous
+
+    def _get_response_decoder(self, entity_class, response_mode=None):
+        """Returns function converting a JSON value to the form given by response_mode, defaults to the client response_mode"""
+        response_mode = response_mode or self.__response_mode
+        if response_mode == RESPONSE_MODE_OBJECTS:
+            return get_decoder(entity_class)
+        elif response_mode == RESPONSE_MODE_LAZY:
+            return get_decoder(entity_class, lazy=True)
+        elif response_mode == RESPONSE_MODE_RECORDS:
+            return to_record
+        elif response_mode == RESPONSE_MODE_DICT:
+            return lambda m: m
+        raise TintriError("Invalid response mode %s, should be one of %s" % (response_mode, RESPONSE_MODES))
+
     def _json_object_to_object(self, json_object, entity_class, context={}):
+        decode = self._get_response_decoder(entity_class, context.get('response_mode'))
         if type(json_object) == types.DictionaryType:
             if hasattr(entity_class, '_is_paginated') and entity_class._is_paginated:
                 try:
@@ -827,13 +1615,11 @@ class TintriBase(object):
                     else:
                         raise AttributeError('Class %s does not have _process_page() method' % entity_class.__name__)
                 except ValueError:
-                    return map_to_object(json_object, entity_class)
+                    return decode(json_object)
             else:
-                return map_to_object(json_object, entity_class)
+                return decode(json_object)
         elif type(json_object) == types.ListType:
-            objects = []
-            for obj in json_object:
-                objects.append(map_to_object(obj, entity_class))
+            objects = [decode(obj) for obj in json_object]
 
             # if auto_page is set, return a page with the items
             if 'typeId' in json_object and json_object['typeId'] == 'com.tintri.api.rest.v310.dto.Page' and self.__auto_page:
@@ -843,26 +1629,34 @@ class TintriBase(object):
         else:
             return json_object # Return any other type as is, such as None, string, number, boolean
 
-    def _process_response(self, method, url, response, request_class, response_class, query_params, path_params):
+    def _process_response(self, method, url, response, request_class, response_class, query_params, path_params, response_mode=None, stream=False):
         if response.status_code == 204:
             return None
         elif response.status_code == 200:
-            return self._process_result(method, url, response, request_class, response_class, query_params, path_params)
+            if stream:
+                return self._process_stream(method, url, response, request_class, response_class, query_params, path_params, response_mode)
+            return self._process_result(method, url, response, request_class, response_class, query_params, path_params, response_mode)
         else:
             return self._process_error(method, url, response.status_code, response.text)
 
-    def _process_result(self, method, url, response, request_class, response_class, query_params, path_params):
+    def _process_result(self, method, url, response, request_class, response_class, query_params, path_params, response_mode=None):
         cls = response_class and response_class or request_class
         if cls in [types.StringType, types.UnicodeType]: # if we expect string type result, no need for further processing
             return response.text
         else:
             # prepare context to hold url and data along with method to navigate pages
-            context = { 'method': method, 'url': url, 'query_params': query_params, 'response_class': response_class, 'func': self._get_all, 'request_class': request_class, 'path_params': path_params, 'response_data': response.text }
-            return self._json_object_to_object(json.loads(response.text), cls, context=context) # first load JSON to a Python list or dict
+            context = { 'method': method, 'url': url, 'query_params': query_params, 'response_class': response_class, 'func': self._get_all, 'request_class': request_class, 'path_params': path_params, 'response_mode': response_mode }
+            return self._json_object_to_object(self.__json_codec.loads(response.text), cls, context=context) # first load JSON to a Python list or dict
+
+    def _process_stream(self, method, url, response, request_class, response_class, query_params, path_params, response_mode=None):
+        cls = response_class and response_class or request_class
+        context = { 'method': method, 'url': url, 'query_params': query_params, 'response_class': response_class, 'func': self._get_all, 'request_class': request_class,
+                    'path_params': path_params, 'response_mode': response_mode }
+        return TintriPageStream(response, self._get_response_decoder(cls, response_mode), self.__auto_page, context)
 
     def _process_error(self, method, url, status_code, response_data):
         try:
-            jsonError = json.loads(response_data)
+            jsonError = self.__json_codec.loads(response_data)
         except ValueError as e:
             self.__logger.warning("Failed to decode result. url:%s status:%s error:%s data:%s" % (url, status_code, e, response_data))
             raise TintriServerError(status_code, cause=e, message="Failed to decode result. url:%s status:%s error:%s data:%s" % (url, status_code, e, response_data))
@@ -888,43 +1682,114 @@ class TintriBase(object):
             self.__logger.info('Server error. url:%s status:%s Unknown error:%s' % (url, status_code, response_data))
             raise TintriServerError(status_code, code=None, message='Unknown error', details=response_data)
             
-    def _send_http_request(self, method, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, data=None):
+    def _send_http_request(self, method, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, data=None, append_id=False, response_mode=None, stream=False):
         """
         data is either json string or object. If object, will call object.toJson()
         if entity_class is specified, use it to deserialize JSON. Otherwise use cls
+        append_id is set by operations on a single resource (get one, update, patch, delete) whose ID ends the URL
+        response_mode overrides the client response_mode for this request
+        stream is set to parse a page of a paginated resource while iterating its items, see `TintriPageStream`
         """
         #print 'method:%s path_params:%s query_params:%s resource_url:%s request_class:%s response_class:%s returns_list:%s' % (method, `path_params`, query_params, resource_url, request_class and request_class.__name__ or None, response_class, returns_list)
-        _method, _url, _data = self._process_request(method, path_params, query_params, resource_url, request_class, response_class, data)
+        _method, _url, _data = self._process_request(method, path_params, query_params, resource_url, request_class, response_class, data, append_id)
         #print 'method:%s url:%s data:%s' % (_method, _url, _data)
-
+        response_mode = response_mode or getattr(self.__local, 'response_mode', None)
+
+        # only pages of paginated resources are streamed
+        stream = stream and bool(response_class and response_class._is_paginated)
+        return self.__send_and_process(_method, _url, _data, request_class, response_class, query_params, path_params, response_mode, stream)
+
+    def __send_and_process(self, _method, _url, _data, request_class, response_class, query_params, path_params, response_mode, stream):
+        resource = self.__resource_of(_url)
+        can_login = self.__auto_login and self.__username is not None and self.__password is not None
+        session_id = self.__session_id
+        if can_login and session_id and self.__session_timeout and time.time() - self.__session_used >= self.__session_timeout - SESSION_REFRESH_MARGIN:
+            # renew an idle session about to expire rather than fail on it
+            self.__renew_session(session_id)
+            session_id = self.__session_id
         try:
-            httpresp = self._send_raw_http_request(_method, _url, _data)
-            self.__logger.log(TINTRI_LOG_LEVEL_DATA, 'Response: %s' % httpresp.text)
-            return self._process_response(_method, _url, httpresp, request_class, response_class, query_params, path_params)
+            httpresp = self.__send_coalesced_http_request(_method, _url, _data, stream, response_class or request_class, resource)
+            if not stream: self.__logger.log(TINTRI_LOG_LEVEL_DATA, 'Response: %s' % httpresp.text)
+            result = self._process_response(_method, _url, httpresp, request_class, response_class, query_params, path_params, response_mode, stream)
         except TintriInvalidSessionError as e:
-            if self.__auto_login and self.__username is not None and self.__password is not None and e.code == "ERR-API-0104":
+            if can_login and e.code == "ERR-API-0104":
                 # On error due to invalid session, login and retry
-                self.login()
-                httpresp = self._send_raw_http_request(_method, _url, _data)
-                self.__logger.log(TINTRI_LOG_LEVEL_DATA, 'Response: %s' % httpresp.text)
-                return self._process_response(_method, _url, httpresp, request_class, response_class, query_params, path_params)
+                self.__renew_session(session_id)
+                httpresp = self.__send_coalesced_http_request(_method, _url, _data, stream, response_class or request_class, resource)
+                if not stream: self.__logger.log(TINTRI_LOG_LEVEL_DATA, 'Response: %s' % httpresp.text)
+                result = self._process_response(_method, _url, httpresp, request_class, response_class, query_params, path_params, response_mode, stream)
             else:
                 raise
+        finally:
+            # a change to a resource outdates its cached responses
+            if self.__response_cache is not None and _method != 'GET':
+                self.__response_cache.invalidate(resource)
+        self.__session_used = time.time()
+        return result
+
+    def __renew_session(self, session_id):
+        """
+        Logs in again, unless another thread already replaced session_id while this one waited for the login lock,
+        so that threads failing on the same expired session log in once
+        """
+        with self.__login_lock:
+            if self.__session_id == session_id:
+                self.__logger.debug('Renewing session to %s' % self.__host)
+                self.login()
 
-    def _get_one(self, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('GET', path_params, query_params, resource_url, request_class, response_class)
-
-    def _get_all(self, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('GET', path_params, query_params, resource_url, request_class, response_class)
-
-    def _create(self, obj, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('POST', path_params, query_params, resource_url, request_class, response_class, data=obj)
-
-    def _update(self, obj, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('PUT', path_params, query_params, resource_url, request_class, response_class, obj)
-
-    def _patch(self, obj, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('PATCH', path_params, query_params, resource_url, request_class, response_class, obj)
+    def __resource_of(self, url):
+        """Returns the first path segment after the API version of an API URL, such as 'datastore'"""
+        path = url.split('?', 1)[0].split('/api/', 1)[-1].split('/')
+        return path[1] if len(path) > 1 else path[0]
 
-    def _delete(self, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('DELETE', path_params, query_params, resource_url, request_class, response_class)
+    def __send_coalesced_http_request(self, method, url, data, stream, cls, resource):
+        """
+        Sends a request, identical GET requests in flight share the status and text of the response of the first one
+        and decode it each, so that every caller gets its own objects. Streamed pages are not shared.
+        """
+        if self.__single_flight is None or method != 'GET' or stream:
+            return self.__send_cached_http_request(method, url, data, stream, cls, resource)
+        def send():
+            httpresp = self.__send_cached_http_request(method, url, data, stream, cls, resource)
+            return _CachedResponse(httpresp.status_code, httpresp.text)
+        return self.__single_flight.do((url, self.__session_id), send)
+
+    def __send_cached_http_request(self, method, url, data, stream, cls, resource):
+        """Sends a request, GET requests of resources cached by the response cache are answered from it when possible"""
+        cache = self.__response_cache
+        ttl = cache.get_ttl(cls, resource) if cache is not None and method == 'GET' and not stream else 0
+        if not ttl:
+            return self._send_raw_http_request(method, url, data, stream)
+        username = self.__session_username
+        text, headers = cache.lookup(url, username)
+        if text is not None:
+            self.__logger.debug('%s %s (cached)' % (method, url))
+            return _CachedResponse(200, text)
+        httpresp = self._send_raw_http_request(method, url, data, stream, extra_headers=headers)
+        if httpresp.status_code == 304:
+            text = cache.revalidate(url, ttl, username)
+            if text is not None:
+                return _CachedResponse(200, text)
+            # evicted meanwhile, fetch again
+            httpresp = self._send_raw_http_request(method, url, data, stream)
+        if httpresp.status_code == 200:
+            cache.put(url, resource, ttl, httpresp.text, httpresp.headers.get('ETag'), httpresp.headers.get('Last-Modified'), username)
+        return httpresp
+
+    def _get_one(self, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('GET', path_params, query_params, resource_url, request_class, response_class, append_id=True, response_mode=response_mode)
+
+    def _get_all(self, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None, stream=False):
+        return self._send_http_request('GET', path_params, query_params, resource_url, request_class, response_class, response_mode=response_mode, stream=stream)
+
+    def _create(self, obj, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('POST', path_params, query_params, resource_url, request_class, response_class, data=obj, response_mode=response_mode)
+
+    def _update(self, obj, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('PUT', path_params, query_params, resource_url, request_class, response_class, obj, append_id=True, response_mode=response_mode)
+
+    def _patch(self, obj, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('PATCH', path_params, query_params, resource_url, request_class, response_class, obj, append_id=True, response_mode=response_mode)
+
+    def _delete(self, path_params=[], query_params={}, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('DELETE', path_params, query_params, resource_url, request_class, response_class, append_id=True, response_mode=response_mode)
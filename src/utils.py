@@ -38,6 +38,8 @@ __version__ = '1.0'
 
 import types
 import json
+import codecs
+import collections
 import inspect
 import logging
 import pydoc
@@ -49,48 +51,295 @@ DEFAULT_LOGGER_NAME = 'tintri'
 FIRST_CAP_RE = re.compile('(.)([A-Z][a-z]+)')
 ALL_CAP_RE = re.compile('([a-z0-9])([A-Z])')
 
+# Cache of compiled decoders keyed by class and lazy flag
+_decoders = {}
+
+def get_decoder(cls, lazy=False):
+    """
+    Returns a function which decodes a JSON value into instances of cls. Dictionaries become cls
+    instances whose mapped properties are decoded with the class given in cls._property_map, lists
+    are decoded item by item and any other value is returned as is. The decoder is compiled once
+    per class and cached.
+
+    Args:
+        cls (class): Class of the decoded objects
+        lazy (bool): Keep nested objects and lists of `TintriObject` instances as raw JSON until first accessed
+
+    Returns:
+        function: Decoder taking a JSON value
+    """
+    decoder = _decoders.get((cls, lazy))
+    if decoder is None:
+        decoder = _decoders[(cls, lazy)] = _compile_decoder(cls, lazy)
+    return decoder
+
+def _compile_decoder(cls, lazy):
+    from .common import TintriObject
+    property_map = getattr(cls, '_property_map', {})
+    # only TintriObject knows how to build pending fields on access
+    lazy = lazy and issubclass(cls, TintriObject)
+    # child decoders are resolved on first use as mapped classes may refer to each other
+    children = {}
+
+    def child_decoder(name):
+        decoder = children.get(name)
+        if decoder is None:
+            decoder = children[name] = get_decoder(property_map.get(name, TintriObject))
+        return decoder
+
+    def decode(m):
+        if type(m) is types.DictionaryType:
+            o = cls()
+            # set fields through __dict__ so that no attribute watch dog runs while deserializing
+            fields = o.__dict__
+            for k, v in m.iteritems():
+                if type(v) is types.DictionaryType or type(v) is types.ListType:
+                    fields[k] = child_decoder(k)(v)
+                else:
+                    fields[k] = v
+            return o
+        elif type(m) is types.ListType:
+            return [decode(obj) for obj in m]
+        else:
+            return m
+
+    def decode_lazy(m):
+        if type(m) is types.DictionaryType:
+            o = cls()
+            fields = o.__dict__
+            pending = {}
+            for k, v in m.iteritems():
+                if type(v) is types.DictionaryType or type(v) is types.ListType:
+                    pending[k] = v # built by TintriObject.__getattr__ on first access
+                else:
+                    fields[k] = v
+            if pending:
+                o._set_pending_fields(pending)
+            return o
+        elif type(m) is types.ListType:
+            return [decode_lazy(obj) for obj in m]
+        else:
+            return m
+
+    if lazy:
+        return decode_lazy
+    return decode
+
 def map_to_object(m, cls):
-    def __getobjecttype(cls, varname):
-        from .__init__ import TintriObject
-        if '_property_map' in dir(cls):
-            if varname in cls._property_map.keys():
-                return cls._property_map[varname]
-        return TintriObject
-
-    if type(m) == types.DictionaryType:
-        o = cls()
-        
-        ignoresetattr = None
-        if hasattr(o, '_ignoresetattr'):
-            ignoresetattr = o._ignoresetattr
-            o._ignoresetattr = True
-
-        for k in m.keys():
-            cls2 = __getobjecttype(cls, k)
-            setattr(o, k, map_to_object(m[k], cls2))
-
-        if ignoresetattr:
-            o._ignoresetattr = ignoresetattr
-            
-        return o
-    elif type(m) == types.ListType:
-        objects = []
-        for obj in m:
-            objects.append(map_to_object(obj, cls))
-        return objects
+    return get_decoder(cls)(m)
+
+class TintriRecord(object):
+    """
+    Read-only attribute view of a JSON object. Nested objects are wrapped when accessed,
+    so building a record costs nothing until its fields are read.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data):
+        object.__setattr__(self, '_data', data)
+
+    def __getattr__(self, name):
+        try:
+            return to_record(self._data[name])
+        except KeyError:
+            raise AttributeError("'%s' has no attribute %r" % (self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'%s' is read-only" % self.__class__.__name__)
+
+    def __getitem__(self, name):
+        return to_record(self._data[name])
+
+    def __contains__(self, name):
+        return name in self._data
+
+    def _asdict(self):
+        """Returns the underlying JSON object"""
+        return self._data
+
+    def __str__(self): return '%s %s' % (self.__class__.__name__, json.dumps(self._data))
+
+def to_record(m):
+    """Wraps a JSON object in a `TintriRecord`, lists are wrapped item by item and any other value is returned as is"""
+    if type(m) is types.DictionaryType:
+        return TintriRecord(m)
+    elif type(m) is types.ListType:
+        return [to_record(obj) for obj in m]
     else:
         return m
 
+class StreamingPageParser(object):
+    """
+    Incremental parser of a JSON page object read from a stream of byte chunks. The items array is
+    parsed one item at a time, so at most one item and one chunk are held in memory. Other top level
+    fields are collected in metadata as they are parsed.
+
+    Args:
+        chunks (iterable): UTF-8 encoded byte chunks such as `requests.Response.iter_content()`
+        items_key (str): Name of the field holding the items array
+    """
+    _WHITESPACE = u' \t\n\r'
+
+    def __init__(self, chunks, items_key='items'):
+        self.metadata = {}
+        self.done = False # set once the whole page is parsed
+        self.__chunks = iter(chunks)
+        self.__items_key = items_key
+        self.__text = codecs.getincrementaldecoder('utf-8')()
+        self.__decoder = json.JSONDecoder()
+        self.__buffer = u''
+        self.__pos = 0
+        self.__eof = False
+
+    def items(self):
+        """Generator of the raw JSON items, metadata is complete once it is exhausted"""
+        self.__expect(u'{')
+        if self.__peek() == u'}':
+            self.__pos += 1
+        else:
+            while True:
+                key = self.__value()
+                self.__expect(u':')
+                if key == self.__items_key and self.__peek() == u'[':
+                    self.__pos += 1
+                    if self.__peek() == u']':
+                        self.__pos += 1
+                    else:
+                        while True:
+                            yield self.__value()
+                            if self.__next_char(u',]') == u']':
+                                break
+                else:
+                    self.metadata[key] = self.__value()
+                if self.__next_char(u',}') == u'}':
+                    break
+        self.done = True
+
+    def __read(self):
+        """Appends next chunk to buffer, False at end of stream"""
+        if self.__eof:
+            return False
+        # drop consumed text so that the buffer does not grow with the stream
+        self.__buffer = self.__buffer[self.__pos:]
+        self.__pos = 0
+        for chunk in self.__chunks:
+            text = self.__text.decode(chunk)
+            if text:
+                self.__buffer += text
+                return True
+        self.__eof = True
+        self.__buffer += self.__text.decode('', True)
+        return False
+
+    def __peek(self):
+        while True:
+            while self.__pos < len(self.__buffer) and self.__buffer[self.__pos] in self._WHITESPACE:
+                self.__pos += 1
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+            if not self.__read():
+                raise ValueError('Unexpected end of JSON page')
+
+    def __next_char(self, expected):
+        c = self.__peek()
+        if c not in expected:
+            raise ValueError('Expecting one of %r at position %d, found %r' % (expected, self.__pos, c))
+        self.__pos += 1
+        return c
+
+    def __expect(self, c):
+        self.__next_char(c)
+
+    def __value(self):
+        self.__peek()
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer, self.__pos)
+            except ValueError:
+                # value continues in next chunk
+                if self.__read():
+                    continue
+                raise
+            # a number at the end of the buffer may continue in next chunk
+            if end == len(self.__buffer) and self.__read():
+                continue
+            self.__pos = end
+            return value
+
 def get_plural_form(word):
     return word.endswith('s') or word.endswith('x') and '%ses' % word or '%ss' % word 
 
+def object_fields(obj):
+    """Returns the fields of obj, building first any fields left as raw JSON by lazy decoding"""
+    if hasattr(obj, '_materialize'):
+        obj._materialize()
+    return obj.__dict__
+
 class TintriJSONEncoder(json.JSONEncoder):
     def default(self, o):
         if o is None: return None
-        else: return o.__dict__
+        else: return object_fields(o)
 
 #class TintriJSONEncoder(json.JSONEncoder):
 
+class JSONCodec(object):
+    """
+    JSON codec using the standard json module, base class of codecs using faster JSON libraries.
+    Codecs whose library calls back into Python for every object keep the json module encoder,
+    which is faster on object graphs.
+    """
+    name = 'json'
+
+    def loads(self, text):
+        return json.loads(text)
+
+    def dumps(self, obj):
+        return json.dumps(obj, cls=TintriJSONEncoder)
+
+class SimpleJSONCodec(JSONCodec):
+    name = 'simplejson'
+
+    def __init__(self):
+        import simplejson
+        self._json = simplejson
+
+    def loads(self, text):
+        return self._json.loads(text)
+
+class UltraJSONCodec(JSONCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._json = ujson
+
+    def loads(self, text):
+        return self._json.loads(text)
+
+# JSON codecs by name, in order of preference when picked automatically.
+# orjson is not offered, it has no release for Python 2.
+JSON_CODECS = collections.OrderedDict((codec.name, codec) for codec in [UltraJSONCodec, SimpleJSONCodec, JSONCodec])
+
+def get_json_codec(name='json'):
+    """
+    Returns a JSON codec by name.
+
+    Args:
+        name (str): One of json, ujson or simplejson. With auto, the fastest installed library is used, falling back to the standard json module
+
+    Returns:
+        `JSONCodec`: Codec with loads() and dumps() methods
+    """
+    if name == 'auto':
+        for codec in JSON_CODECS.values():
+            try:
+                return codec()
+            except ImportError:
+                pass
+    if name not in JSON_CODECS:
+        raise ValueError('Invalid JSON codec %s, should be one of %s' % (name, ['auto'] + JSON_CODECS.keys()))
+    return JSON_CODECS[name]()
+
 def dump_object(obj, level=0, name='', logger=None):
     if logger is None:
         logger = logging.getLogger(DEFAULT_LOGGER_NAME)
@@ -119,6 +368,7 @@ def dump_object(obj, level=0, name='', logger=None):
                 dump_object(e, level=level + 4, logger=logger)
             logger.info(" " * level + "]")
     elif hasattr(obj, '__dict__'):
+        object_fields(obj)
         if len(obj.__dict__.keys()) == 0:
             logger.info(" " * level + "%s[%s]: {}", name, obj.__class__.__name__)
         else:
@@ -137,7 +387,7 @@ def object_to_json(obj):
     if obj == None:
         return None
     else:
-        return json.dumps(obj.__dict__, cls=TintriJSONEncoder) # Use __dict__ to avoid not JSON serializable error
+        return json.dumps(object_fields(obj), cls=TintriJSONEncoder) # Use __dict__ to avoid not JSON serializable error
 
 def getmethods(obj):
     return inspect.getmembers(obj, predicate=inspect.ismethod)
@@ -41,9 +41,11 @@ import logging
 import collections
 import json
 import time
-from functools import wraps
-from ..utils import object_to_json, map_to_object, dump_object, convert_to_camel_case
-from ..common import TintriBase, TintriPage, TintriEntity, TintriObject, TintriError
+import threading
+from functools import wraps, partial
+from multiprocessing.pool import ThreadPool
+from ..utils import object_to_json, object_fields, map_to_object, dump_object, convert_to_camel_case
+from ..common import TintriBase, TintriPage, TintriEntity, TintriObject, TintriError, RESPONSE_MODE_OBJECTS
 import inspect
 
 class Uuid(object): pass
@@ -844,6 +846,109 @@ def _get_request_object(attributes_d, attributes_l, obj_class):
             request.propertiesToBeUpdated.append(convert_to_camel_case(key, capitalize_first_letter=False))
     return request
 
+# Templates of API methods whose requests are generated by the api decorator, their bodies are only "pass"
+def _generated_function(self, filters=None, query_params={}): pass
+
+def _generated_function_with_doc(self, filters=None, query_params={}):
+    """
+    Sample documentation
+    """
+    pass
+
+# How the api decorator calls a REST API, resolved once per API method when decorated
+_ApiDispatch = collections.namedtuple('_ApiDispatch', ['is_generated', 'op_type', 'resource_class', 'request_class', 'response_class', 'filter_class', 'target', 'version'])
+# _ApiDispatch of every decorated API method by method name
+_dispatch_table = {}
+
+def _verify_api_call(dispatch, tintri_obj):
+    """Checks that the server of tintri_obj is the target of the API and supports its version"""
+    if dispatch.target == "tgc" and tintri_obj.is_vmstore():
+        raise TintriError("API applicable to TGC only")
+    if dispatch.target == "vmstore" and tintri_obj.is_tgc():
+        raise TintriError("API applicable to VMstore only")
+    if dispatch.version is not None and not tintri_obj.supports_version(dispatch.version):
+        raise TintriError("Unsupported API, please check API minimum version")
+
+def _is_property_updateable(key, value, data):
+    ret = False
+    if value is not None and key != 'id' and key != 'uuid' and key != 'typeId':
+        ret = True
+        if hasattr(type(data), '_id_fields') and key in type(data)._id_fields:
+            ret = False
+    return ret
+
+def _get_api_call_args(dispatch, tintri_obj, args, kwargs):
+    """
+    Splits the arguments of a call to a generated API method, args excluding self
+
+    Returns:
+        tuple: path_params, query_params, filters, data, response_mode, stream
+    """
+    data = None
+    query_params = {}
+    filters = None
+    path_params = []
+    response_mode = None
+    stream = False
+
+    if 'filters' in kwargs:
+        if dispatch.filter_class and not type(kwargs['filters']) is dict and not type(kwargs['filters']) is dispatch.filter_class:
+            raise Exception("Invalid filter spec, filter should be a map or of type %s" % str(dispatch.filter_class))
+        filters = kwargs['filters']
+        del kwargs['filters']
+
+    if 'query_params' in kwargs:
+        query_params = kwargs['query_params']
+        del kwargs['query_params']
+
+    if 'response_mode' in kwargs:
+        response_mode = kwargs['response_mode']
+        del kwargs['response_mode']
+
+    if 'stream' in kwargs:
+        stream = kwargs['stream']
+        del kwargs['stream']
+
+    if len(args) > 0:
+        path_params = list(args)
+    if dispatch.op_type == "create":
+        # first argument is data
+        data = path_params.pop(0)
+    elif dispatch.op_type == "update":
+        '''
+        first argument is considered as data
+        1. If data is not None, construct Request from data
+        2. If data is None, Request is not None, use Request as data
+        3. If data is None, and Request is None, construct Request from kwargs
+        '''
+        if len(path_params) == 0:
+            raise TypeError("Incorrect usage of API, please provide either updated object or Request object or set properties")
+        data = path_params.pop(0)
+        if data is None:
+            if 'request' in kwargs and kwargs['request']:
+                data = kwargs['request']
+            else:
+                if len(kwargs):
+                    data = _get_request_object(kwargs, [], dispatch.resource_class)
+                else:
+                    # obj, Request and kwargs are None
+                    raise TintriError("Incorrect usage of API, please provide either updated object or Request object or set properties")
+        else:
+            if 'request' in kwargs:
+                # construct Request from data
+                request = Request()
+                # prepare request
+                request.objectsWithNewValues = [data]
+                request.propertiesToBeUpdated = []
+                for key, value in object_fields(data).iteritems():
+                    # ignore None, ID and UUID keys; ignore name key for FileShare
+                    if _is_property_updateable(key, value, data):
+                        request.propertiesToBeUpdated.append(key)
+                data = request
+        if tintri_obj.logger.isEnabledFor(logging.INFO):
+            dump_object(data, logger=tintri_obj.logger)
+    return path_params, query_params, filters, data, response_mode, stream
+
 # Use this decorator for all apis. For usage, please see get_vm
 # Anytime resource is added/updated, keep the decorated apis consistent
 def api(func=None, filter_class=None, target="all", version="all"):
@@ -884,121 +989,51 @@ def api(func=None, filter_class=None, target="all", version="all"):
         else:
             raise TintriError("Unknown API operation: %s" % func.func_name)
 
-    def wrap(func):
-        def verify_filter(api_filter, filter_class):
-            if filter_class and not type(api_filter) is dict and not type(api_filter) is filter_class:
-                raise Exception("Invalid filter spec, filter should be a map or of type %s" % str(filter_class))   
-
-        def verify_target(api_target, tintri_obj):
-            if api_target.lower() == "tgc" and tintri_obj.is_vmstore():
-                raise TintriError("API applicable to TGC only")
-            if api_target.lower() == "vmstore" and tintri_obj.is_tgc():
-                raise TintriError("API applicable to VMstore only")
-        
-        def verify_version(api_version, tintri_obj):
-            if version.lower() != "all" and not version in tintri_obj.version.supportedVersionSet:
-                raise TintriError("Unsupported API, please check API minimum version")
-
-        def is_generated_function(func, tintri_obj):
-            if len(tintri_obj._generated_function.func_code.co_code) == len(tintri_obj._generated_function_with_doc.func_code.co_code):
-                if len(func.func_code.co_code) == len(tintri_obj._generated_function.func_code.co_code):
-                    return func.func_code.co_code == tintri_obj._generated_function.func_code.co_code or func.func_code.co_code == tintri_obj._generated_function_with_doc.func_code.co_code
-                return False
-            else:
-                if len(func.func_code.co_code) == len(tintri_obj._generated_function.func_code.co_code):
-                    return func.func_code.co_code == tintri_obj._generated_functiontion.func_code.co_code
-                elif len(func.func_code.co_code) == len(tintri_obj._generated_function_with_doc.func_code.co_code):
-                    return func.func_code.co_code == tintri_obj._generated_function_with_doc.func_code.co_code
-                return False
+    def is_generated_function(func):
+        code = func.func_code.co_code
+        return code == _generated_function.func_code.co_code or code == _generated_function_with_doc.func_code.co_code
 
-        def is_property_updateable(key, value, data):
-            ret = False
-            if value is not None and key != 'id' and key != 'uuid' and key != 'typeId':
-                ret = True
-                if hasattr(type(data), '_id_fields') and key in type(data)._id_fields:
-                    ret = False
-            return ret
+    def get_dispatch(func):
+        api_target = target.lower()
+        api_version = None if version.lower() == "all" else version
+        if not is_generated_function(func):
+            return _ApiDispatch(False, None, None, None, None, filter_class, api_target, api_version)
+        op_type, actual_func_name = get_op(func)
+        resource_class = get_resource_class_from_func_name(actual_func_name, func)
+        response_class = resource_class if resource_class._is_paginated else None
+        return _ApiDispatch(True, op_type, resource_class, resource_class, response_class, filter_class, api_target, api_version)
+
+    def wrap(func):
+        dispatch = _dispatch_table[func.func_name] = get_dispatch(func)
 
         @wraps(func)
         def wrapped(*args, **kwargs):
-            data = None
-            query_params = {}
-            filters = None
-            path_params = []
-            response_class = None
-
             tintri_obj = args[0]
             
             # verify target and version before proceeding
-            verify_target(target, tintri_obj)
-            verify_version(version, tintri_obj)
+            _verify_api_call(dispatch, tintri_obj)
 
-            if not is_generated_function(func, tintri_obj):
+            if not dispatch.is_generated:
+                if 'response_mode' in kwargs:
+                    # hand-written functions do not take response_mode, the requests they send get it from the client
+                    return tintri_obj._call_with_response_mode(kwargs.pop('response_mode'), func, args, kwargs)
                 return func(*args, **kwargs)
-            
-            if 'filters' in kwargs:
-                verify_filter(kwargs['filters'], filter_class)
-                filters = kwargs['filters']
-                del kwargs['filters']
-
-            if 'query_params' in kwargs:
-                query_params = kwargs['query_params']
-                del kwargs['query_params']
-                
-            op_type, actual_func_name = get_op(func)
-            resource_class = get_resource_class_from_func_name(actual_func_name, func)
-            request_class = resource_class
-            if resource_class._is_paginated:
-                response_class = resource_class
 
-            if len(args) > 1:
-                path_params = list(args[1:])
-            if op_type == "create":
-                # first argument is data
-                data = path_params.pop(0)
+            path_params, query_params, filters, data, response_mode, stream = _get_api_call_args(dispatch, tintri_obj, args[1:], kwargs)
+            op_type = dispatch.op_type
+            request_class = dispatch.request_class
+            response_class = dispatch.response_class
+
+            if op_type == "get_one":
+                return tintri_obj._get_one(path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class, response_mode=response_mode)
+            elif op_type == "get_all":
+                return tintri_obj._get_all(path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class, response_mode=response_mode, stream=stream)
+            elif op_type == "create":
+                return tintri_obj._create(data, path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class, response_mode=response_mode)
+            elif op_type == "delete":
+                return tintri_obj._delete(path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class, response_mode=response_mode)
             elif op_type == "update":
-                '''
-                first argument is considered as data
-                1. If data is not None, construct Request from data
-                2. If data is None, Request is not None, use Request as data
-                3. If data is None, and Request is None, construct Request from kwargs
-                '''
-                if len(path_params) == 0:
-                    raise TypeError("Incorrect usage of API, please provide either updated object or Request object or set properties")
-                data = path_params.pop(0)
-                if data is None:
-                    if 'request' in kwargs and kwargs['request']:
-                        data = kwargs['request']
-                    else:
-                        if len(kwargs):
-                            data = _get_request_object(kwargs, [], resource_class)
-                        else:
-                            # obj, Request and kwargs are None
-                            raise TintriError("Incorrect usage of API, please provide either updated object or Request object or set properties")
-                else:
-                    if 'request' in kwargs:
-                        # construct Request from data
-                        request = Request()
-                        # prepare request
-                        request.objectsWithNewValues = [data]
-                        request.propertiesToBeUpdated = []
-                        for key, value in data.__dict__.iteritems():
-                            # ignore None, ID and UUID keys; ignore name key for FileShare
-                            if is_property_updateable(key, value, data):
-                                request.propertiesToBeUpdated.append(key)
-                        data = request
-                dump_object(data, logger=tintri_obj.logger)
-
-            if op_type.lower() == "get_one":
-                return tintri_obj._get_one(path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class)
-            elif op_type.lower() == "get_all":
-                return tintri_obj._get_all(path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class)
-            elif op_type.lower() == "create":
-                return tintri_obj._create(data, path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class)
-            elif op_type.lower() == "delete":
-                return tintri_obj._delete(path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class)
-            elif op_type.lower() == "update":
-                return tintri_obj._update(data, path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class)
+                return tintri_obj._update(data, path_params=path_params, query_params=query_params, filters=filters, request_class=request_class, response_class=response_class, response_mode=response_mode)
             else:
                 raise TintriError("Unrecognized request op_type %s" % op_type)
         return wrapped
@@ -1105,6 +1140,24 @@ def api(func=None, filter_class=None, target="all", version="all"):
 
 class Tintri(TintriBase):
     """Tintri class which provides APIs to interact with Tintri Server."""
+    _task_waiter = None
+    _task_waiter_lock = threading.Lock()
+
+    @property # read only
+    def task_waiter(self):
+        """
+        Poller of the tasks waited for by this client, such as clones with wait set, created on first use
+
+        Returns:
+            `TaskWaiter`: task_waiter
+        """
+        if self._task_waiter is None:
+            with self._task_waiter_lock:
+                if self._task_waiter is None:
+                    from .tasks import TaskWaiter
+                    self._task_waiter = TaskWaiter(self)
+        return self._task_waiter
+
     # Utility methods
     def _get_param(self, params, kwargs):
         for param in params:
@@ -1115,26 +1168,26 @@ class Tintri(TintriBase):
     def _get_vm_id(self, **kwargs):
         return self._get_param(['vm', 'id'], **kwargs)
 
-    def _wait_for_task(self, taskuuid, refreshInterval=3):
-        def is_job_done(task):
-            return task.state in ['CANCELLED', 'FAILED', 'SUCCESS'];
-
-        task = self.get_task(taskuuid)
-        while not is_job_done(task):
-            #self.__logger.debug('Waiting for task %s to complete' % task.uuid.uuid)
-            time.sleep(refreshInterval)
-            task = self.get_task(task.uuid.uuid)
-        return task
+    def _wait_for_task(self, taskuuid, refreshInterval=3, timeout=None):
+        # tasks of all threads are polled together by the task waiter, this one at least every refreshInterval seconds,
+        # the waiter completes the task with the error of its polls if they keep failing
+        future = self.task_waiter.wait(taskuuid, max_interval=refreshInterval)
+        try:
+            return future.result(timeout)
+        finally:
+            if not future.done():
+                self.task_waiter.cancel(taskuuid) # timed out, stop polling the task
 
     def _process_page(self, json_object, entity_class, context={}):
         if 'typeId' in json_object and json_object['typeId'] == 'com.tintri.api.rest.v310.dto.Page':
             json_items = json_object.pop('items', None)
+            context['page_data'] = json_object
             items = []
             if json_items:
-                for item in json_items:
-                    items.append(self._json_object_to_object(item, entity_class, False))
+                decode = self._get_response_decoder(entity_class, context.get('response_mode'))
+                items = [decode(item) for item in json_items]
 
-            return TintriPage(paginated=entity_class._is_paginated, auto_page=self.auto_page, items=items, context=context)
+            return TintriPage(paginated=entity_class._is_paginated, auto_page=self.auto_page, items=items, context=context, prefetch=self.prefetch)
         else:
             raise ValueError('Not a page object')
 
@@ -1152,31 +1205,80 @@ class Tintri(TintriBase):
         ret.update(self._to_map(filters))
         return ret
 
-    def _generated_function(self, filters=None, query_params={}): pass
+    def _get_one(self, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('GET', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class, append_id=True, response_mode=response_mode)
 
-    def _generated_function_with_doc(self, filters=None, query_params={}):
-        """
-        Sample documentation
-        """
-        pass
+    def _get_all(self, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None, stream=False):
+        return self._send_http_request('GET', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class, response_mode=response_mode, stream=stream)
 
-    def _get_one(self, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('GET', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class)
+    def _create(self, obj, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('POST', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class, data=obj, response_mode=response_mode)
 
-    def _get_all(self, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('GET', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class)
+    def _update(self, obj, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('PUT', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class, obj, append_id=True, response_mode=response_mode)
 
-    def _create(self, obj, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('POST', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class, data=obj)
+    def _patch(self, obj, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('PATCH', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class, obj, append_id=True, response_mode=response_mode)
 
-    def _update(self, obj, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('PUT', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class, obj)
+    def _delete(self, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None, response_mode=None):
+        return self._send_http_request('DELETE', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class, append_id=True, response_mode=response_mode)
 
-    def _patch(self, obj, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('PATCH', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class, obj)
+    def fetch_all(self, func, *args, **kwargs):
+        """
+        Fetches all items of a paginated collection. The first page is read to learn total and limit,
+        then the remaining offset windows are fetched concurrently on a thread pool.
+
+        Args:
+            func (function or str): API returning a `Page` such as `Tintri.get_vms`, or its name
+            args: Positional arguments of func, e.g. the VM UUID for get_vm_historic_stats
+            filters (dict or `PageFilterSpec`): Filter Specification object
+            workers (int): Maximum number of pages fetched concurrently, default value=8
+            ordered (bool): True to yield items in server order, False to yield them as pages arrive, default value=True
 
-    def _delete(self, path_params=[], query_params={}, filters=None, resource_url=None, request_class=None, response_class=None, name=None):
-        return self._send_http_request('DELETE', path_params, self._to_query_params(query_params, filters), resource_url, request_class, response_class)
+        Returns:
+            generator: Items of all pages
+        """
+        filters = kwargs.pop('filters', None)
+        workers = kwargs.pop('workers', 8)
+        ordered = kwargs.pop('ordered', True)
+        if kwargs:
+            raise TypeError("Unexpected arguments: %s" % ', '.join(kwargs.keys()))
+
+        if isinstance(func, basestring):
+            func = getattr(self, func)
+        elif getattr(func, '__self__', None) is None:
+            func = partial(func, self)
+
+        base_filters = self._to_map(filters)
+        first = func(*args, filters=base_filters)
+        if not isinstance(first, TintriPage):
+            for item in first or []:
+                yield item
+            return
+
+        for i in xrange(len(first)):
+            yield first[i]
+
+        if first.total is None or not first.limit:
+            return
+        offsets = range((first.offset or 0) + first.limit, first.total, first.limit)
+        if not offsets:
+            return
+
+        def fetch_window(offset):
+            window_filters = dict(base_filters)
+            window_filters['offset'] = offset
+            window_filters['limit'] = first.limit
+            return func(*args, filters=window_filters)
+
+        pool = ThreadPool(min(workers, len(offsets)))
+        try:
+            pages = pool.imap(fetch_window, offsets) if ordered else pool.imap_unordered(fetch_window, offsets)
+            for page in pages:
+                for i in xrange(len(page)):
+                    yield page[i]
+        finally:
+            pool.terminate()
 
     @api(target="tgc")
     def create_historic_stats_report(self, datastore_id, report_filter):
@@ -1544,7 +1646,7 @@ class Tintri(TintriBase):
 
     # Virtual Machine
     @api(target="vmstore")
-    def clone_vm(self, clonespec, wait=False, refreshInterval=3):
+    def clone_vm(self, clonespec, wait=False, refreshInterval=3, timeout=None):
         """
         Clone a VM
 
@@ -1553,16 +1655,18 @@ class Tintri(TintriBase):
         Args:
             clonespec (`VirtualMachineCloneSpec`): Clone spec
             wait (bool): True if wait for clone VM task to complete, False otherwise
-            refreshInterval (int): interval to refresh task status
+            refreshInterval (int): Maximum interval in seconds between polls of the task by `task_waiter`
+            timeout (float): Seconds to wait for the task, None waits until it completes or polling it fails
         Returns:
             str: task ID
         """
         # Need to specify resource_url, because otherwise Task._url will be used
-        task = self._create(clonespec, resource_url=VirtualMachineCloneSpec._url, response_class=Task)
+        # the task is read when waiting for it, whatever the response mode of the client
+        task = self._create(clonespec, resource_url=VirtualMachineCloneSpec._url, response_class=Task, response_mode=RESPONSE_MODE_OBJECTS if wait else None)
         if not wait:
             return task
         else:
-            return self._wait_for_task(task.uuid.uuid, refreshInterval)
+            return self._wait_for_task(task.uuid.uuid, refreshInterval, timeout)
 
     @api(target="vmstore", version="v310.21")
     def sync_vm(self, syncspec):
@@ -1941,7 +2045,7 @@ class Tintri(TintriBase):
         """
         if request is None:
             request = Request()
-            replication_config = self.get_datastore_replication_info('default')
+            replication_config = self.get_datastore_replication_info('default', response_mode=RESPONSE_MODE_OBJECTS)
             replication_config.passphrase = passphrase or replication_config.passphrase
             replication_config.port = port or replication_config.port
             replication_config.pathsIncoming = paths_incoming or replication_config.pathsIncoming
@@ -0,0 +1,388 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+"""
+Asyncio client of the Tintri v310 API. Requires Python 3.6 or later and aiohttp.
+
+Generated API methods of `Tintri` are coroutines of `AsyncTintri` sending their requests with
+aiohttp. Hand-written API methods run the `Tintri` method in the default executor::
+
+    async with AsyncTintri('vmstore1', 'admin', 'password') as tintri:
+        async for vm in await tintri.get_vms(filters={'limit': 100}):
+            print(vm.vmware.name)
+"""
+
+import asyncio
+import functools
+
+import aiohttp
+
+from ..common import DEFAULT_API_VERSION, DEFAULT_LOGGER_NAME, DEFAULT_POOL_MAXSIZE, RESPONSE_MODE_OBJECTS, TintriError, TintriServerError, \
+    TintriAuthenticationError, TintriInvalidSessionError
+from . import Tintri, _dispatch_table, _verify_api_call, _get_api_call_args
+
+PAGE_TYPE_ID = 'com.tintri.api.rest.v310.dto.Page'
+
+# HTTP method and whether the resource ID ends the URL, by API operation
+_OPERATIONS = { 'get_one': ('GET', True), 'get_all': ('GET', False), 'create': ('POST', False), 'update': ('PUT', True), 'delete': ('DELETE', True) }
+
+class AsyncTintriPage(object):
+    """
+    Page of items returned by `AsyncTintri` for paginated resources. Items of the page are iterated
+    with ``for`` or indexed. With ``async for``, iteration continues with the next pages when auto_page
+    is set, up to prefetch next pages being fetched while the current one is iterated.
+    """
+    def __init__(self, items, page_data, fetch_page, auto_page=False, prefetch=0):
+        self.__items = items
+        self.__page_data = page_data
+        self.__fetch_page = fetch_page # coroutine function fetching the page of a next or prev link
+        self.__auto_page = auto_page
+        self.__prefetch = prefetch
+
+    @property
+    def limit(self): return self.__page_data.get('limit')
+
+    @property
+    def offset(self): return self.__page_data.get('offset')
+
+    @property
+    def page_number(self):
+        """Current page number"""
+        return self.__page_data.get('page')
+
+    @property
+    def total(self):
+        """Total number of active objects across all pages"""
+        return self.__page_data.get('total')
+
+    @property
+    def absoluteTotal(self):
+        """Absolute number of requested objects without any qualifications including filtering, active, or deleted"""
+        return self.__page_data.get('absoluteTotal')
+
+    @property
+    def filteredTotal(self):
+        """Number of objects as specified by filter. If no filter was requested, it would be same as total"""
+        return self.__page_data.get('filteredTotal')
+
+    @property
+    def pageTotal(self):
+        """Total number of pages"""
+        return self.__page_data.get('pageTotal')
+
+    @property
+    def completedIn(self):
+        """Time in milliseconds indicating how long it took to serve the request"""
+        return self.__page_data.get('completedIn')
+
+    @property
+    def lastUpdatedTime(self):
+        """Time when the page was accessed"""
+        return self.__page_data.get('lastUpdatedTime')
+
+    @property
+    def offsetMatchFound(self):
+        """Indicates if requested item(s) is/are found"""
+        return self.__page_data.get('offsetMatchFound')
+
+    @property
+    def overflow(self):
+        """Flag giving notice the amount of data did not fit into the given specified or default offset"""
+        return self.__page_data.get('overflow')
+
+    def __len__(self):
+        """Length of the page is number of items in page"""
+        return len(self.__items)
+
+    def __getitem__(self, idx):
+        """Return an item within a page if index is valid"""
+        return self.__items[idx]
+
+    def __iter__(self):
+        """Iterates items of this page only"""
+        return iter(self.__items)
+
+    async def __aiter__(self):
+        """Iterates items in page along with navigating to next pages"""
+        # with prefetch, a task fetches the next pages in order, at most prefetch pages ahead of the one iterated
+        prefetch = self.__prefetch if self.__auto_page else 0
+        pages = asyncio.Queue()
+        slots = asyncio.Semaphore(prefetch)
+        fetcher = asyncio.ensure_future(self.__fetch_next_pages(pages, slots)) if prefetch > 0 else None
+        page = self
+        try:
+            while True:
+                for item in page.__items:
+                    yield item
+                if not self.__auto_page:
+                    return
+                if fetcher is not None:
+                    page, error = await pages.get()
+                    slots.release()
+                    if error is not None:
+                        raise error
+                else:
+                    page = await page.get_next_page()
+                if page is None or len(page) == 0:
+                    return
+        finally:
+            if fetcher is not None:
+                fetcher.cancel()
+
+    async def __fetch_next_pages(self, pages, slots):
+        page = self
+        try:
+            while page is not None and len(page) > 0:
+                await slots.acquire()
+                page = await page.get_next_page()
+                pages.put_nowait((page, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            pages.put_nowait((None, e))
+
+    async def get_next_page(self):
+        """Return next page, None if it does not exist"""
+        if self.__page_data.get('next'):
+            return await self.__fetch_page(self.__page_data['next'])
+        return None
+
+    async def get_prev_page(self):
+        """Return previous page, None if it does not exist"""
+        if self.__page_data.get('prev'):
+            return await self.__fetch_page(self.__page_data['prev'])
+        return None
+
+class AsyncTintri(object):
+    """
+    Asyncio client providing the APIs of `Tintri` as coroutines. Arguments are the ones of `Tintri`,
+    pool_maxsize limits the number of concurrent connections to the server. Pages are not streamed.
+    """
+    def __init__(self, host, username=None, password=None, api_version=DEFAULT_API_VERSION, logger_name=DEFAULT_LOGGER_NAME, auto_login=True, custom_client_header=None,
+                 auto_page=True, pool_maxsize=DEFAULT_POOL_MAXSIZE, prefetch=0, response_mode=RESPONSE_MODE_OBJECTS, json_codec='json', capability_cache=None):
+        # the synchronous client builds URLs, decodes responses, maps errors and runs the hand-written APIs
+        self.__tintri = Tintri(host, username, password, api_version=api_version, logger_name=logger_name, auto_login=auto_login, custom_client_header=custom_client_header,
+                               auto_page=auto_page, prefetch=prefetch, response_mode=response_mode, json_codec=json_codec, capability_cache=capability_cache)
+        self.__api_version = api_version
+        self.__auto_login = auto_login
+        self.__pool_maxsize = pool_maxsize
+        self.__http_session = None # created on first request as it belongs to the running event loop
+        self.__login_lock = None
+        self.__version = None
+
+    @property # read only
+    def host(self): return self.__tintri.host
+
+    @property # read only
+    def tintri(self):
+        """
+        Synchronous client of the same server, running the hand-written APIs
+
+        Returns:
+            `Tintri`: tintri
+        """
+        return self.__tintri
+
+    @property # read only
+    def session_id(self):
+        """
+        Session ID, shared with the synchronous client so that hand-written APIs run in the same session
+
+        Returns:
+            str: Session ID
+        """
+        return self.__tintri.session_id
+
+    def get_rest_methods(self):
+        return self.__tintri.get_rest_methods()
+
+    def __get_http_session(self):
+        if self.__http_session is None:
+            connector = aiohttp.TCPConnector(limit=self.__pool_maxsize, ssl=False)
+            self.__http_session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+            self.__login_lock = asyncio.Lock()
+        return self.__http_session
+
+    async def get_version(self):
+        """
+        Information found in `RestApi` about API supported by server, read from the capability cache if present
+
+        Returns:
+            `RestApi`: `RestApi` object
+        """
+        if self.__version is None:
+            cache = self.__tintri.capability_cache
+            if cache.get(self.host) is None:
+                async with self.__get_http_session().get('https://%s/api/info' % self.host, headers={'content-type': 'application/json'}) as resp:
+                    text = await resp.text()
+                if resp.status != 200:
+                    raise TintriServerError(resp.status, message='Failed to retrieve info page. HTTP status code: %d' % resp.status)
+                cache.put(self.host, self.__tintri.json_codec.loads(text))
+            self.__version = self.__tintri.version # taken from the capability cache
+        return self.__version
+
+    async def login(self, username=None, password=None):
+        """Login to Tintri API server, username and password won't be cached
+
+           Args:
+               username (str): Login user name.
+               password (str): Login user name password.
+
+           Returns:
+               str: credentials role name
+        """
+        await self.get_version()
+
+        if (username is None and self.__tintri.username is None) or (password is None and self.__tintri.password is None):
+            raise TintriError("Username and password need to be provided either at object instantiation or at login")
+
+        data = {"username": username or self.__tintri.username, "password": password or self.__tintri.password, "typeId": "com.tintri.api.rest.vcommon.dto.rbac.RestApiCredentials"}
+        headers = {'content-type': 'application/json', 'Tintri-Api-Client': self.__tintri.client_header}
+        login_url = 'https://%s/api/v%s/session/login' % (self.host, self.__api_version)
+        async with self.__get_http_session().post(login_url, data=self.__tintri.json_codec.dumps(data), headers=headers) as resp:
+            text = await resp.text()
+        if resp.status != 200:
+            err = 'Failed to authenticate to %s as user %s. HTTP status code: %d' % (self.host, data['username'], resp.status)
+            self.__tintri.logger.error(err)
+            try:
+                json_error = self.__tintri.json_codec.loads(text)
+            except Exception as e:
+                raise TintriServerError(resp.status, None, cause=repr(e), details=err)
+            raise TintriAuthenticationError(json_error['code'], json_error['message'], json_error['causeDetails'])
+
+        self.__tintri._use_session(resp.cookies['JSESSIONID'].value, data['username'])
+        return self.__tintri.json_codec.loads(text)
+
+    async def logout(self):
+        """Logout from Tintri server"""
+        session_id = self.__tintri.session_id
+        if session_id:
+            url = 'https://%s/api/v%s/session/logout' % (self.host, self.__api_version)
+            try:
+                async with self.__get_http_session().get(url, headers={'cookie': 'JSESSIONID=%s' % session_id}) as resp:
+                    await resp.read()
+            except Exception as e:
+                self.__tintri.logger.error('Failed to logout. Error:%s' % e)
+            self.__tintri._use_session(None)
+
+    async def close(self):
+        """Logout from Tintri server if logged in and close the HTTP connections, including the ones of the synchronous client"""
+        await self.logout()
+        if self.__http_session is not None:
+            await self.__http_session.close()
+            self.__http_session = None
+        await asyncio.get_event_loop().run_in_executor(None, self.__tintri.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _call_api(self, dispatch, args, kwargs):
+        """Sends the request of a generated API method as described by its dispatch entry"""
+        await self.get_version()
+        _verify_api_call(dispatch, self.__tintri)
+        path_params, query_params, filters, data, response_mode, stream = _get_api_call_args(dispatch, self.__tintri, args, kwargs)
+        method, append_id = _OPERATIONS[dispatch.op_type]
+        return await self._send_http_request(method, path_params, self.__tintri._to_query_params(query_params, filters), dispatch.request_class, dispatch.response_class,
+                                             data, append_id, response_mode)
+
+    async def _send_http_request(self, method, path_params=[], query_params={}, request_class=None, response_class=None, data=None, append_id=False, response_mode=None):
+        _method, _url, _data = self.__tintri._process_request(method, path_params, query_params, None, request_class, response_class, data, append_id)
+        session_id = self.__tintri.session_id
+        try:
+            status, text = await self.__send(_method, _url, _data, session_id)
+            return self.__process_response(_method, _url, status, text, path_params, request_class, response_class, response_mode)
+        except TintriInvalidSessionError as e:
+            if self.__auto_login and self.__tintri.username is not None and self.__tintri.password is not None and e.code == "ERR-API-0104":
+                # On error due to invalid session, login once for all requests failing with the same session and retry
+                async with self.__login_lock:
+                    if self.__tintri.session_id == session_id:
+                        await self.login()
+                status, text = await self.__send(_method, _url, _data, self.__tintri.session_id)
+                return self.__process_response(_method, _url, status, text, path_params, request_class, response_class, response_mode)
+            raise
+
+    async def __send(self, method, url, data, session_id):
+        headers = {'content-type': 'application/json'}
+        if session_id:
+            headers['cookie'] = 'JSESSIONID=%s' % session_id
+        if method not in ['POST', 'PUT', 'PATCH']:
+            data = None
+        async with self.__get_http_session().request(method, url, data=data, headers=headers) as resp:
+            return resp.status, await resp.text()
+
+    def __process_response(self, method, url, status, text, path_params, request_class, response_class, response_mode):
+        if status == 204:
+            return None
+        elif status != 200:
+            return self.__tintri._process_error(method, url, status, text)
+
+        cls = response_class or request_class
+        json_object = self.__tintri.json_codec.loads(text)
+        if response_class is not None and type(json_object) is dict and json_object.get('typeId') == PAGE_TYPE_ID:
+            decode = self.__tintri._get_response_decoder(cls, response_mode)
+            items = [decode(item) for item in json_object.pop('items', None) or []]
+            fetch_page = functools.partial(self.__fetch_page, path_params, request_class, response_class, response_mode)
+            return AsyncTintriPage(items, json_object, fetch_page, self.__tintri.auto_page, self.__tintri.prefetch)
+        return self.__tintri._json_object_to_object(json_object, cls, {'response_mode': response_mode})
+
+    async def __fetch_page(self, path_params, request_class, response_class, response_mode, link):
+        query_params = dict(item.split('=', 1) for item in link.split('&'))
+        return await self._send_http_request('GET', path_params, query_params, request_class, response_class, response_mode=response_mode)
+
+def _generated_api_method(name, dispatch, func):
+    async def api_method(self, *args, **kwargs):
+        return await self._call_api(dispatch, args, kwargs)
+    api_method.__name__ = name
+    api_method.__doc__ = func.__doc__
+    return api_method
+
+def _executor_api_method(name, func):
+    async def api_method(self, *args, **kwargs):
+        return await asyncio.get_event_loop().run_in_executor(None, functools.partial(getattr(self.tintri, name), *args, **kwargs))
+    api_method.__name__ = name
+    api_method.__doc__ = func.__doc__
+    return api_method
+
+for _name, _func in Tintri.method_registry.items():
+    if _dispatch_table[_name].is_generated:
+        setattr(AsyncTintri, _name, _generated_api_method(_name, _dispatch_table[_name], _func))
+    else:
+        setattr(AsyncTintri, _name, _executor_api_method(_name, _func))
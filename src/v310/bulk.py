@@ -0,0 +1,571 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+import collections
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import Queue
+import requests
+from multiprocessing.pool import ThreadPool
+from ..common import TintriError, TintriServerError, RESPONSE_MODE_OBJECTS, RESPONSE_MODE_RECORDS
+from . import SnapshotSpec
+
+DEFAULT_BULK_CONCURRENCY = 8 # requests sent at a time
+DEFAULT_BULK_MAX_PENDING = 64 # operations started and not yet completed at a time
+DEFAULT_BULK_RETRIES = 3 # retries of a request failing with a transient error
+DEFAULT_BULK_RETRY_DELAY = 1 # seconds before the first retry, doubled on each retry
+DEFAULT_SNAPSHOT_BATCH_SIZE = 50 # snapshot specs per create_snapshot request
+DEFAULT_SNAPSHOT_RATE = 10 # create_snapshot requests per second
+DEFAULT_SWEEP_PAGE_SIZE = 1000 # snapshots per page read by a sweep
+
+# Values of the type field of a Snapshot
+SNAPSHOT_TYPES = ['SCHEDULED_SNAPSHOT', 'USER_GENERATED_SNAPSHOT', 'AUTO_GENERATED_CLONING_SNAPSHOT', 'VAAI_GENERATED_SNAPSHOT', 'ODX_GENERATED_SNAPSHOT',
+                  'CINDER_GENERATED_SNAPSHOT', 'SCHEDULED_HIGH_FREQUENCY_SNAPSHOT', 'HYPERV_SHARE_SNAPSHOT', 'SYNCREPL_RESYNC_SNAPSHOT']
+
+# Outcome of a clone: task is the completed clone task, error is the exception if the clone could not be submitted
+# or its task did not succeed, attempts is the number of clone requests sent, elapsed the seconds until completion
+CloneResult = collections.namedtuple('CloneResult', ['spec', 'task', 'error', 'attempts', 'elapsed'])
+
+# Outcome of the snapshot of a VM: snapshot_id is the UUID of the snapshot created, error is the exception if it
+# was not created, attempts is the number of create_snapshot requests sent for the VM
+SnapshotResult = collections.namedtuple('SnapshotResult', ['vm_id', 'snapshot_id', 'error', 'attempts'])
+
+# Outcome of a bulk snapshot: results are the `SnapshotResult` of every VM in order, requests the number of
+# create_snapshot requests sent, elapsed the wall time in seconds
+BulkSnapshotReport = collections.namedtuple('BulkSnapshotReport', ['results', 'succeeded', 'failed', 'requests', 'elapsed'])
+
+# Progress of a snapshot sweep: scanned is the number of snapshots evaluated, deleted and failed the number of
+# snapshots deleted and failing to be deleted, elapsed the seconds spent and rate the snapshots scanned per second
+SweepReport = collections.namedtuple('SweepReport', ['scanned', 'deleted', 'failed', 'elapsed', 'rate'])
+
+class TintriCloneTimeoutError(TintriError):
+    """Raised in `CloneResult` when a clone did not complete within the cloner timeout"""
+
+def is_transient_error(e):
+    """Returns True if a request failed with an error that may not happen again, such as a server overload"""
+    if isinstance(e, TintriServerError):
+        return e.status == 429 or e.status >= 500
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def call_with_retries(func, retries=DEFAULT_BULK_RETRIES, retry_delay=DEFAULT_BULK_RETRY_DELAY):
+    """
+    Calls func, calling it again after a growing delay with jitter while it fails with a transient error
+
+    Returns:
+        tuple: result of func or None, exception of the last call or None, number of calls
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return func(), None, attempt
+        except Exception as e:
+            if attempt > retries or not is_transient_error(e):
+                return None, e, attempt
+            time.sleep(retry_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+class BulkCloner(object):
+    """
+    Clones many VMs of a server. Clone requests are sent by a pool of concurrency threads and retried on transient
+    errors, the clone tasks are then waited for by the shared `TaskWaiter` of the server. Specs are read from their
+    iterable as clones complete, at most max_pending clones being in progress, so that batches of any size run in
+    bounded memory.
+
+    Args:
+        tintri (Tintri): Server cloning the VMs
+        concurrency (int): Clone requests sent at a time
+        max_pending (int): Clones submitted and not completed at a time
+        retries (int): Retries of a clone request failing with a transient error
+        retry_delay (float): Seconds before the first retry, doubled on each retry
+        timeout (float): Seconds a clone has to complete once submitted, reported with a `TintriCloneTimeoutError`
+            otherwise and its task no longer polled. None waits until its task completes or polling it fails
+    """
+    def __init__(self, tintri, concurrency=DEFAULT_BULK_CONCURRENCY, max_pending=DEFAULT_BULK_MAX_PENDING, retries=DEFAULT_BULK_RETRIES,
+                 retry_delay=DEFAULT_BULK_RETRY_DELAY, timeout=None):
+        self.__tintri = tintri
+        self.__concurrency = concurrency
+        self.__max_pending = max(max_pending, concurrency)
+        self.__retries = retries
+        self.__retry_delay = retry_delay
+        self.__timeout = timeout
+
+    @property # read only
+    def tintri(self): return self.__tintri
+
+    @property # read only
+    def timeout(self): return self.__timeout
+
+    def iter_clone(self, specs):
+        """
+        Clones VMs and yields the result of each clone as soon as it completes
+
+        Args:
+            specs (iterable): `VirtualMachineCloneSpec` objects, may be a generator
+
+        Returns:
+            generator: `CloneResult` of every spec, in order of completion
+        """
+        for index, result in self.__run(specs):
+            yield result
+
+    def clone(self, specs):
+        """
+        Clones VMs and waits for all clones to complete, see `iter_clone`
+
+        Returns:
+            list: `CloneResult` of every spec, in order of specs
+        """
+        return [result for index, result in sorted(self.__run(specs), key=lambda item: item[0])]
+
+    def __run(self, specs):
+        """Yields the index of each spec and its `CloneResult`, in order of completion"""
+        results = Queue.Queue()
+        pending = threading.Semaphore(self.__max_pending)
+        stopped = threading.Event()
+        waiter = self.__tintri.task_waiter
+        done = object() # marks the end of the specs
+        pool = ThreadPool(self.__concurrency)
+        started = {} # index -> [spec, start time, clone requests sent, task] of the clones submitted and not reported
+
+        def submit(index, spec):
+            start = time.time()
+            started[index] = clone = [spec, start, 0, None]
+            attempts = 0
+            try:
+                # the task is read whatever the response mode of the client
+                task, error, attempts = call_with_retries(lambda: self.__tintri.clone_vm(spec, response_mode=RESPONSE_MODE_OBJECTS),
+                                                          self.__retries, self.__retry_delay)
+                clone[2] = attempts
+                if error is not None:
+                    results.put((index, CloneResult(spec, None, error, attempts, time.time() - start)))
+                else:
+                    clone[3] = task
+                    waiter.wait(task, lambda future: complete(index, spec, future, attempts, start))
+            except Exception as e:
+                results.put((index, CloneResult(spec, None, e, attempts, time.time() - start)))
+
+        def complete(index, spec, future, attempts, start):
+            try:
+                results.put((index, self.__result(spec, future, attempts, start)))
+            except Exception as e:
+                results.put((index, CloneResult(spec, future.task, e, attempts, time.time() - start)))
+
+        def feed():
+            count = 0
+            try:
+                for spec in specs:
+                    pending.acquire()
+                    if stopped.is_set():
+                        break
+                    pool.apply_async(submit, (count, spec))
+                    count += 1
+            except Exception as e:
+                # reading the specs failed, reported as a result without spec
+                results.put((count, CloneResult(None, None, e, 0, 0)))
+                count += 1
+            results.put((done, count))
+
+        feeder = threading.Thread(target=feed, name='BulkCloner-%s' % self.__tintri.host)
+        feeder.daemon = True
+        feeder.start()
+        try:
+            total = None # number of specs, known once all are read
+            completed = 0
+            while total is None or completed < total:
+                wait = 1 # wait in steps so that the consuming thread can be interrupted
+                if self.__timeout is not None:
+                    # report clones running for longer than the timeout, their task is left running on the server
+                    # and no longer polled
+                    now = time.time()
+                    for index, (spec, start, attempts, task) in [item for item in started.items() if now - item[1][1] >= self.__timeout]:
+                        del started[index]
+                        if task is not None:
+                            waiter.cancel(task)
+                        completed += 1
+                        pending.release()
+                        yield index, CloneResult(spec, None, TintriCloneTimeoutError(message='Clone did not complete within %s seconds' % self.__timeout),
+                                                 attempts, now - start)
+                    if started:
+                        wait = max(min(clone[1] for clone in started.values()) + self.__timeout - now, 0.01)
+                try:
+                    index, result = results.get(timeout=wait)
+                except Queue.Empty:
+                    continue
+                if index is done:
+                    total = result
+                    continue
+                if started.pop(index, None) is None and result.spec is not None:
+                    continue # already reported as timed out
+                completed += 1
+                pending.release()
+                yield index, result
+        finally:
+            # consumer stopped early, let submitted clones finish without reading more specs
+            stopped.set()
+            pending.release()
+            pool.close()
+
+    def __result(self, spec, future, attempts, start):
+        error = future.exception()
+        task = future.task
+        if error is None and task.state != 'SUCCESS':
+            error = TintriError(message='Clone task %s ended in state %s' % (future.task_id, task.state),
+                                details=getattr(task, 'progressDescription', None))
+        return CloneResult(spec, task, error, attempts, time.time() - start)
+
+class TokenBucket(object):
+    """
+    Rate limiter letting rate calls per second through on average, and up to burst calls at once after a pause
+
+    Args:
+        rate (float): Calls per second
+        burst (int): Calls let through at once, default is one second of calls
+    """
+    def __init__(self, rate, burst=None):
+        self.__rate = float(rate)
+        self.__burst = burst if burst is not None else max(1, int(rate))
+        self.__tokens = float(self.__burst)
+        self.__updated = time.time()
+        self.__lock = threading.Lock()
+
+    @property # read only
+    def rate(self): return self.__rate
+
+    def acquire(self):
+        """Waits until a call is allowed"""
+        while True:
+            with self.__lock:
+                now = time.time()
+                self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.__rate)
+                self.__updated = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                wait = (1 - self.__tokens) / self.__rate
+            time.sleep(wait)
+
+class BulkSnapshotter(object):
+    """
+    Snapshots many VMs of a server. create_snapshot takes a list of `SnapshotSpec`, so VMs are snapshotted batch_size
+    at a time, batches being sent by a pool of concurrency threads at no more than rate requests per second. Batches
+    failing with a transient error are retried. A batch failing otherwise, for instance because one of its VMs no longer
+    exists, is split in halves sent again until the VMs failing it are found.
+
+    Args:
+        tintri (Tintri): Server taking the snapshots
+        batch_size (int): Snapshot specs per create_snapshot request
+        concurrency (int): create_snapshot requests sent at a time
+        rate (float): create_snapshot requests per second, None for no limit
+        retries (int): Retries of a request failing with a transient error
+        retry_delay (float): Seconds before the first retry, doubled on each retry
+        consistency (str): Snapshot consistency, CRASH_CONSISTENT or VM_CONSISTENT
+        retention_minutes (int): Minutes snapshots are kept, None for the server default
+        replica_retention_minutes (int): Minutes replicas of snapshots are kept, None for the server default
+    """
+    def __init__(self, tintri, batch_size=DEFAULT_SNAPSHOT_BATCH_SIZE, concurrency=DEFAULT_BULK_CONCURRENCY, rate=DEFAULT_SNAPSHOT_RATE,
+                 retries=DEFAULT_BULK_RETRIES, retry_delay=DEFAULT_BULK_RETRY_DELAY, consistency='CRASH_CONSISTENT', retention_minutes=None,
+                 replica_retention_minutes=None):
+        self.__tintri = tintri
+        self.__batch_size = batch_size
+        self.__concurrency = concurrency
+        self.__rate_limiter = TokenBucket(rate) if rate else None
+        self.__retries = retries
+        self.__retry_delay = retry_delay
+        self.__consistency = consistency
+        self.__retention_minutes = retention_minutes
+        self.__replica_retention_minutes = replica_retention_minutes
+        self.__requests = 0
+        self.__lock = threading.Lock()
+
+    @property # read only
+    def tintri(self): return self.__tintri
+
+    @property # read only
+    def requests(self):
+        """Number of create_snapshot requests sent"""
+        return self.__requests
+
+    def iter_snapshot(self, vm_ids, snapshot_name=None):
+        """
+        Snapshots VMs and yields the outcome of each VM as soon as its batch completes
+
+        Args:
+            vm_ids (iterable): UUIDs of the VMs
+            snapshot_name (str): Name of the snapshots, None for the server default
+
+        Returns:
+            generator: `SnapshotResult` of every VM, in order of completion
+        """
+        pool = ThreadPool(self.__concurrency)
+        try:
+            for results in pool.imap_unordered(lambda batch: self.__snapshot_batch(batch, snapshot_name), self.__batches(vm_ids)):
+                for result in results:
+                    yield result
+        finally:
+            pool.terminate()
+
+    def snapshot(self, vm_ids, snapshot_name=None):
+        """
+        Snapshots VMs and waits for all snapshots, see `iter_snapshot`
+
+        Returns:
+            `BulkSnapshotReport`: Outcome of every VM in order of vm_ids, with totals and wall time
+        """
+        start = time.time()
+        sent = self.__requests
+        vm_ids = list(vm_ids)
+        outcome = dict((result.vm_id, result) for result in self.iter_snapshot(vm_ids, snapshot_name))
+        results = [outcome[vm_id] for vm_id in vm_ids]
+        failed = sum(1 for result in results if result.error is not None)
+        return BulkSnapshotReport(results, len(results) - failed, failed, self.__requests - sent, time.time() - start)
+
+    def __batches(self, vm_ids):
+        batch = []
+        for vm_id in vm_ids:
+            batch.append(vm_id)
+            if len(batch) == self.__batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def __create_snapshots(self, vm_ids, snapshot_name):
+        """Sends one create_snapshot request for VMs, returns the snapshot UUIDs"""
+        specs = [SnapshotSpec(self.__retention_minutes, self.__consistency, self.__replica_retention_minutes, snapshot_name, vm_id) for vm_id in vm_ids]
+        if self.__rate_limiter is not None:
+            self.__rate_limiter.acquire()
+        with self.__lock:
+            self.__requests += 1
+        snapshot_ids = self.__tintri.create_snapshot(specs)
+        if not isinstance(snapshot_ids, list) or len(snapshot_ids) != len(vm_ids):
+            raise TintriError(message='Expected %d snapshot UUIDs, got %s' % (len(vm_ids), snapshot_ids))
+        return snapshot_ids
+
+    def __snapshot_batch(self, vm_ids, snapshot_name):
+        """Returns the `SnapshotResult` of every VM of a batch"""
+        snapshot_ids, error, attempts = call_with_retries(lambda: self.__create_snapshots(vm_ids, snapshot_name), self.__retries, self.__retry_delay)
+        if error is None:
+            return [SnapshotResult(vm_id, snapshot_id, None, attempts) for vm_id, snapshot_id in zip(vm_ids, snapshot_ids)]
+        if len(vm_ids) == 1 or is_transient_error(error):
+            return [SnapshotResult(vm_id, None, error, attempts) for vm_id in vm_ids]
+        # find the VMs failing the batch by halving it, the halves without them succeeding in one request
+        middle = len(vm_ids) // 2
+        results = self.__snapshot_batch(vm_ids[:middle], snapshot_name) + self.__snapshot_batch(vm_ids[middle:], snapshot_name)
+        return [result._replace(attempts=result.attempts + attempts) for result in results]
+
+def _create_time_key(snapshot):
+    """Sort key of a snapshot by createTime, snapshots without one sorting first"""
+    create_time = getattr(snapshot, 'createTime', None)
+    return (create_time is not None, create_time)
+
+class RetentionPolicy(object):
+    """
+    Snapshot retention rules of a `SnapshotSweeper`. A snapshot is deleted if its type is one of types, it is not
+    among the keep_last newest snapshots of its VM, and predicate, if given, returns True for it.
+
+    Args:
+        keep_last (int): Newest snapshots of each VM kept, by createTime, 0 keeps none
+        types (list): Snapshot types deleted, values of SNAPSHOT_TYPES such as SCHEDULED_SNAPSHOT and
+            USER_GENERATED_SNAPSHOT, None for all types
+        predicate (function): Takes a snapshot and returns True if it may be deleted
+    """
+    def __init__(self, keep_last=0, types=None, predicate=None):
+        if types is not None:
+            unknown = [snapshot_type for snapshot_type in types if snapshot_type not in SNAPSHOT_TYPES]
+            if isinstance(types, basestring) or unknown:
+                raise ValueError("Unknown snapshot types %s, expected a list of %s" % (types if isinstance(types, basestring) else ', '.join(unknown),
+                                                                                    ', '.join(SNAPSHOT_TYPES)))
+        self.keep_last = keep_last
+        self.types = types
+        self.predicate = predicate
+
+    def evaluate(self, snapshot, kept):
+        """
+        Returns True if a snapshot is to be deleted. The snapshots of a VM are evaluated newest first.
+
+        Args:
+            snapshot: Snapshot evaluated
+            kept (dict): VM UUID -> number of snapshots kept so far, updated
+        """
+        if self.types is not None and getattr(snapshot, 'type', None) not in self.types:
+            return False
+        vm_uuid = snapshot.vmUuid.uuid if getattr(snapshot, 'vmUuid', None) is not None else ''
+        if self.keep_last and kept.get(vm_uuid, 0) < self.keep_last:
+            kept[vm_uuid] = kept.get(vm_uuid, 0) + 1
+            return False
+        if self.predicate is not None and not self.predicate(snapshot):
+            return False
+        return True
+
+class SnapshotSweeper(object):
+    """
+    Deletes the snapshots of a server selected by filters and a `RetentionPolicy`. Snapshots are streamed page by
+    page with get_snapshots and evaluated as `TintriRecord` objects, the snapshots to delete of each page being
+    deleted by a pool of concurrency threads before the next page is read, so memory use does not depend on the
+    number of snapshots. Pages are read by offset, the offset of the next page skipping only the snapshots kept.
+    When the policy keeps the last snapshots of each VM, snapshots are requested newest first with sortedBy createTime
+    and sortOrder DESC, unless filters set sortedBy, and each page is evaluated newest first.
+
+    If checkpoint is given, the progress is saved to that JSON file after each page and a sweep started with the same
+    file resumes where the previous one stopped. The checkpoint file is removed once the sweep completes. Filters
+    should set toDate so that snapshots created during the sweep do not shift the pages. A sweep reading a page of
+    the same snapshots as the previous page, for instance because deleted snapshots are still listed, stops with a
+    `TintriError` instead of reading it again.
+
+    Args:
+        tintri (Tintri): Server of the snapshots
+        policy (`RetentionPolicy`): Snapshots deleted
+        filters (dict or `SnapshotFilterSpec`): Snapshots swept, such as fromDate, toDate, vmUuid and type
+        concurrency (int): delete_snapshot requests sent at a time
+        page_size (int): Snapshots per page
+        checkpoint (str): JSON file saving the progress of the sweep
+        retries (int): Retries of a request failing with a transient error
+        retry_delay (float): Seconds before the first retry, doubled on each retry
+    """
+    def __init__(self, tintri, policy, filters=None, concurrency=DEFAULT_BULK_CONCURRENCY, page_size=DEFAULT_SWEEP_PAGE_SIZE, checkpoint=None,
+                 retries=DEFAULT_BULK_RETRIES, retry_delay=DEFAULT_BULK_RETRY_DELAY):
+        self.__tintri = tintri
+        self.__policy = policy
+        self.__filters = dict(tintri._to_map(filters))
+        if policy.keep_last and 'sortedBy' not in self.__filters:
+            self.__filters.update(sortedBy='createTime', sortOrder='DESC')
+        self.__concurrency = concurrency
+        self.__page_size = page_size
+        self.__checkpoint = checkpoint
+        self.__retries = retries
+        self.__retry_delay = retry_delay
+
+    @property # read only
+    def tintri(self): return self.__tintri
+
+    @property # read only
+    def checkpoint(self): return self.__checkpoint
+
+    def sweep(self, progress=None):
+        """
+        Runs the sweep, or resumes it from the checkpoint file
+
+        Args:
+            progress (function): Called with a `SweepReport` after each page
+
+        Returns:
+            `SweepReport`: Totals of the sweep, including the ones of resumed sweeps
+
+        Raises:
+            `TintriError`: A page lists the same snapshots as the previous page
+        """
+        state = self.__load_checkpoint() or { 'offset': 0, 'scanned': 0, 'deleted': 0, 'failed': 0, 'elapsed': 0, 'kept': {} }
+        start = time.time() - state['elapsed']
+        pool = ThreadPool(self.__concurrency)
+        previous_ids = None # snapshot IDs of the previous page
+        try:
+            while True:
+                filters = dict(self.__filters, offset=state['offset'], limit=self.__page_size)
+                page = self.__tintri.get_snapshots(filters=filters, response_mode=RESPONSE_MODE_RECORDS, stream=True)
+                try:
+                    # with auto_page set iteration would continue with the next page, whose offset counts deleted snapshots
+                    snapshots = list(itertools.islice(page, self.__page_size))
+                finally:
+                    page.close()
+                if self.__policy.keep_last:
+                    # the newest snapshots of a VM are the ones kept
+                    snapshots.sort(key=_create_time_key, reverse=True)
+                scanned = len(snapshots)
+                page_ids = set(snapshot.uuid.uuid for snapshot in snapshots)
+                doomed = [snapshot.uuid.uuid for snapshot in snapshots if self.__policy.evaluate(snapshot, state['kept'])]
+                if page_ids and page_ids == previous_ids:
+                    raise TintriError(message='Sweep made no progress, the page at offset %d lists the same %d snapshots as the previous page'
+                                      % (state['offset'], scanned))
+                previous_ids = page_ids
+                deleted = sum(pool.map(self.__delete, doomed)) if doomed else 0
+                state['scanned'] += scanned
+                state['deleted'] += deleted
+                state['failed'] += len(doomed) - deleted
+                # deleted snapshots are no longer in the filtered snapshots, the next ones moved up by as many
+                state['offset'] += scanned - deleted
+                state['elapsed'] = time.time() - start
+                if scanned < self.__page_size:
+                    break
+                self.__save_checkpoint(state)
+                if progress is not None:
+                    progress(self.__report(state))
+        finally:
+            pool.terminate()
+        self.__remove_checkpoint()
+        report = self.__report(state)
+        if progress is not None:
+            progress(report)
+        return report
+
+    def __report(self, state):
+        elapsed = state['elapsed']
+        return SweepReport(state['scanned'], state['deleted'], state['failed'], elapsed, state['scanned'] / elapsed if elapsed else 0.0)
+
+    def __delete(self, snapshot_id):
+        """Deletes a snapshot, returns 1 if deleted or already gone, 0 otherwise"""
+        result, error, attempts = call_with_retries(lambda: self.__tintri.delete_snapshot(snapshot_id), self.__retries, self.__retry_delay)
+        if error is None or (isinstance(error, TintriServerError) and error.status == 404):
+            return 1
+        self.__tintri.logger.warning('Failed to delete snapshot %s. Error:%s' % (snapshot_id, error))
+        return 0
+
+    def __load_checkpoint(self):
+        if not self.__checkpoint or not os.path.exists(self.__checkpoint):
+            return None
+        with open(self.__checkpoint) as f:
+            state = json.load(f)
+        if state.get('filters') != self.__filters:
+            raise TintriError(message='Checkpoint %s was saved by a sweep with other filters: %s' % (self.__checkpoint, state.get('filters')))
+        return state
+
+    def __save_checkpoint(self, state):
+        if not self.__checkpoint:
+            return
+        # write to a temporary file first so that a sweep stopped while saving resumes from the previous checkpoint
+        tmp_path = '%s.%d.tmp' % (self.__checkpoint, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(state, filters=self.__filters), f)
+        os.rename(tmp_path, self.__checkpoint)
+
+    def __remove_checkpoint(self):
+        if self.__checkpoint and os.path.exists(self.__checkpoint):
+            os.remove(self.__checkpoint)
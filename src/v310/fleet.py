@@ -0,0 +1,268 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+import collections
+import threading
+import time
+import Queue
+from multiprocessing.pool import ThreadPool
+from ..common import TintriError
+from . import Tintri
+
+DEFAULT_FLEET_WORKERS = 8 # threads calling the servers of a fleet
+
+# Outcome of a call on one server of a fleet: result is None and error is the exception if the call failed,
+# elapsed is the number of seconds the call took
+FleetResult = collections.namedtuple('FleetResult', ['host', 'result', 'error', 'elapsed'])
+
+class TintriFleetTimeoutError(TintriError):
+    """Raised in `FleetResult` when a server did not complete a call within the fleet timeout"""
+
+class TintriFleet(object):
+    """
+    Group of Tintri servers on which the same API calls run in parallel, on a bounded pool of worker threads.
+    Calls do not raise on a server failure, the error of each server is reported in its `FleetResult`.
+
+    Args:
+        hosts (list): Host names, or `Tintri` objects for servers needing their own credentials or options
+        username (str): User name of the servers given by host name
+        password (str): Password of the servers given by host name
+        workers (int): Number of worker threads
+        timeout (float): Seconds a server has to complete a call or the iteration of its items, also the HTTP timeout of the servers given by host name. None waits forever
+        kwargs: Other `Tintri` arguments of the servers given by host name
+
+    Raises:
+        `TintriError`: A host is given more than once
+    """
+    def __init__(self, hosts, username=None, password=None, workers=DEFAULT_FLEET_WORKERS, timeout=None, **kwargs):
+        self.__clients = collections.OrderedDict()
+        for host in hosts:
+            name = host.host if isinstance(host, Tintri) else host
+            if name in self.__clients:
+                raise TintriError(message='Host %s is given more than once' % name)
+            if isinstance(host, Tintri):
+                self.__clients[name] = host
+            else:
+                self.__clients[name] = Tintri(host, username, password, timeout=timeout, **kwargs)
+        self.__workers = workers
+        self.__timeout = timeout
+        self.__pool = None
+        self.__lock = threading.Lock()
+
+    @property # read only
+    def hosts(self):
+        """List of host names of the fleet"""
+        return self.__clients.keys()
+
+    @property # read only
+    def workers(self): return self.__workers
+
+    @property # read only
+    def timeout(self): return self.__timeout
+
+    def __getitem__(self, host):
+        """Return the `Tintri` object of a host"""
+        return self.__clients[host]
+
+    def __len__(self):
+        return len(self.__clients)
+
+    def __get_pool(self):
+        with self.__lock:
+            if self.__pool is None:
+                self.__pool = ThreadPool(self.__workers)
+            return self.__pool
+
+    def __call_func(self, func, args, kwargs):
+        """Returns a function running func on the client of a host"""
+        if isinstance(func, basestring):
+            return lambda tintri: getattr(tintri, func)(*args, **kwargs)
+        return lambda tintri: func(tintri, *args, **kwargs)
+
+    def imap(self, func, *args, **kwargs):
+        """
+        Runs an API call on every server and yields a `FleetResult` per server as soon as it completes.
+        A server that has not completed the call within the fleet timeout is reported with a `TintriFleetTimeoutError`,
+        its call is left running in the background and its result discarded.
+
+        Args:
+            func (str or function): Name of the `Tintri` method to call, or function taking the `Tintri` object of a server as first argument
+            args: Arguments of the call
+            kwargs: Keyword arguments of the call
+
+        Returns:
+            generator: `FleetResult` of every server, in order of completion
+        """
+        call = self.__call_func(func, args, kwargs)
+        results = Queue.Queue()
+        started = {} # host -> time the call started on a worker
+
+        def run(host):
+            start = started[host] = time.time()
+            try:
+                results.put(FleetResult(host, call(self.__clients[host]), None, time.time() - start))
+            except Exception as e:
+                results.put(FleetResult(host, None, e, time.time() - start))
+
+        pool = self.__get_pool()
+        for host in self.__clients:
+            pool.apply_async(run, (host,))
+
+        pending = set(self.__clients)
+        while pending:
+            wait = None
+            if self.__timeout is not None:
+                # report servers whose call has been running for longer than the timeout
+                now = time.time()
+                for host in [h for h in pending if h in started and now - started[h] >= self.__timeout]:
+                    pending.discard(host)
+                    yield FleetResult(host, None, TintriFleetTimeoutError(message='%s did not complete within %s seconds' % (host, self.__timeout)), now - started[host])
+                if not pending:
+                    break
+                running = [started[h] for h in pending if h in started]
+                wait = min(running) + self.__timeout - now if running else self.__timeout
+            try:
+                result = results.get(timeout=max(wait, 0.01) if wait is not None else 86400)
+            except Queue.Empty:
+                continue
+            if result.host in pending:
+                pending.discard(result.host)
+                yield result
+
+    def call(self, func, *args, **kwargs):
+        """
+        Runs an API call on every server, see `imap`
+
+        Returns:
+            list: `FleetResult` of every server, in order of hosts
+        """
+        results = dict((result.host, result) for result in self.imap(func, *args, **kwargs))
+        return [results[host] for host in self.__clients]
+
+    def login(self):
+        """
+        Logs in to every server
+
+        Returns:
+            list: `FleetResult` of every server, in order of hosts
+        """
+        return self.call('login')
+
+    def iter_items(self, func, *args, **kwargs):
+        """
+        Runs an API call returning a page or list on every server and streams the items of all servers as they are received,
+        pages being iterated with auto-paging. Items of a server stay in order, items of different servers are interleaved.
+        A server that has not returned all its items within the fleet timeout is reported with a `TintriFleetTimeoutError`
+        after its items received so far, its iteration stops at its next item.
+
+        Args:
+            func (str or function): Name of the `Tintri` method to call, or function taking the `Tintri` object of a server as first argument
+            args: Arguments of the call
+            kwargs: Keyword arguments of the call, buffer sets the number of items kept in memory ahead of the consumer (default 1000)
+
+        Returns:
+            generator: `FleetResult` per item, with the item as result. A server failing during the call or while paging
+            yields a `FleetResult` with the error after its items received so far
+        """
+        buffer = kwargs.pop('buffer', 1000)
+        call = self.__call_func(func, args, kwargs)
+        items = Queue.Queue(buffer)
+        done = object() # result marking the end of the items of a server
+        stopped = threading.Event() # set when the consumer stopped iterating
+        started = {} # host -> time the call started on a worker
+        expired = set() # hosts reported as timed out, whose workers stop
+
+        def put(item):
+            # give up once the consumer stopped iterating, otherwise a full queue would block forever
+            while not stopped.is_set():
+                try:
+                    items.put(item, timeout=0.5)
+                    return
+                except Queue.Full:
+                    pass
+
+        def run(host):
+            start = started[host] = time.time()
+            try:
+                for item in call(self.__clients[host]) or []:
+                    if stopped.is_set() or host in expired:
+                        return
+                    put(FleetResult(host, item, None, time.time() - start))
+            except Exception as e:
+                put(FleetResult(host, None, e, time.time() - start))
+            finally:
+                put(FleetResult(host, done, None, time.time() - start))
+
+        pool = self.__get_pool()
+        for host in self.__clients:
+            pool.apply_async(run, (host,))
+
+        try:
+            pending = set(self.__clients)
+            while pending:
+                wait = None
+                if self.__timeout is not None:
+                    # report servers whose iteration has been running for longer than the timeout
+                    now = time.time()
+                    for host in [h for h in pending if h in started and now - started[h] >= self.__timeout]:
+                        pending.discard(host)
+                        expired.add(host)
+                        yield FleetResult(host, None, TintriFleetTimeoutError(message='%s did not return all items within %s seconds' % (host, self.__timeout)), now - started[host])
+                    if not pending:
+                        break
+                    running = [started[h] for h in pending if h in started]
+                    wait = min(running) + self.__timeout - now if running else self.__timeout
+                try:
+                    item = items.get(timeout=max(wait, 0.01) if wait is not None else 86400)
+                except Queue.Empty:
+                    continue
+                if item.result is done:
+                    pending.discard(item.host)
+                elif item.host in pending:
+                    yield item
+        finally:
+            # workers still running give up their items once they see the flag
+            stopped.set()
+
+    def close(self):
+        """Logs out from every server and stops the worker threads"""
+        self.call('close')
+        with self.__lock:
+            if self.__pool is not None:
+                self.__pool.terminate()
+                self.__pool = None
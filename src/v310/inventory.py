@@ -0,0 +1,274 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+import collections
+import threading
+import time
+
+DEFAULT_INVENTORY_PAGE_LIMIT = 1000 # entities per page requested on refresh
+
+# Index name -> field path of the VM indexed, list fields index the VM under every value
+DEFAULT_VM_INDEXES = { 'name': 'vmware.name', 'datastore': 'vmware.storageContainers', 'service_group': 'serviceGroup.groupId' }
+# Index name -> field path of the virtual disk indexed
+DEFAULT_VIRTUAL_DISK_INDEXES = { 'vm': 'vmUuid.uuid', 'datastore': 'datastoreUuid.uuid', 'name': 'name' }
+
+# Outcome of an inventory refresh: full is True if all entities were loaded, updated and deleted are the number
+# of entities added or changed and removed, elapsed is the number of seconds the refresh took
+InventoryRefresh = collections.namedtuple('InventoryRefresh', ['full', 'updated', 'deleted', 'elapsed'])
+
+def _get_field(entity, path):
+    """Returns the value of a dotted field path of an entity object, dict or record, None if a field is missing"""
+    for name in path.split('.'):
+        if entity is None:
+            return None
+        if isinstance(entity, dict):
+            entity = entity.get(name)
+        else:
+            entity = getattr(entity, name, None)
+    return entity
+
+class Inventory(object):
+    """
+    Local snapshot of the entities returned by a get function of a paginated resource, indexed by key and by
+    the fields given in indexes. The first refresh loads all entities, later refreshes only request the entities
+    changed and deleted since the lastUpdatedTime of the previous refresh, so their cost follows the churn rather
+    than the number of entities.
+
+    Entities are kept as returned by the get function, in the response mode of the inventory.
+
+    Args:
+        tintri (Tintri): Server to get the entities from
+        func (str): Name of the `Tintri` get function, such as 'get_vms'
+        indexes (dict): Index name -> dotted field path of the entities indexed by it
+        key (str): Dotted field path of the unique key of an entity
+        filters (dict): Filters of the entities kept in the inventory
+        live_filters (dict): Filters selecting live entities, None if the resource has no such filter
+        deleted_filters (dict): Filters selecting deleted entities, None if the resource has no such filter,
+            deleted entities are then removed by full refreshes only
+        full_refresh_interval (float): Seconds after which a refresh reloads all entities, None never does
+        limit (int): Number of entities per page requested
+        response_mode (str): Response mode of the entities, default is the response mode of the server
+    """
+    def __init__(self, tintri, func, indexes={}, key='uuid.uuid', filters=None, live_filters=None, deleted_filters=None,
+                 full_refresh_interval=None, limit=DEFAULT_INVENTORY_PAGE_LIMIT, response_mode=None):
+        self.__tintri = tintri
+        self.__func = func
+        self.__indexes = dict(indexes)
+        self.__key = key
+        self.__filters = dict(filters or {})
+        self.__live_filters = live_filters
+        self.__deleted_filters = deleted_filters
+        self.__full_refresh_interval = full_refresh_interval
+        self.__limit = limit
+        self.__response_mode = response_mode
+        self.__entities = {} # key -> entity
+        self.__index_maps = dict((name, {}) for name in self.__indexes) # index name -> value -> set of keys
+        self.__last_updated_time = None
+        self.__last_full_refresh = None
+        self.__lock = threading.Lock() # guards the entities and indexes
+        self.__refresh_lock = threading.Lock() # serializes refreshes
+
+    @property # read only
+    def tintri(self): return self.__tintri
+
+    @property # read only
+    def indexes(self):
+        """Names of the indexes"""
+        return self.__indexes.keys()
+
+    @property # read only
+    def last_updated_time(self):
+        """lastUpdatedTime of the server at the last refresh, None before the first refresh"""
+        return self.__last_updated_time
+
+    def __len__(self):
+        return len(self.__entities)
+
+    def __contains__(self, key):
+        return key in self.__entities
+
+    def __iter__(self):
+        with self.__lock:
+            return iter(self.__entities.values())
+
+    def keys(self):
+        """Returns the keys of the entities"""
+        with self.__lock:
+            return self.__entities.keys()
+
+    def get(self, key, default=None):
+        """Returns the entity of a key"""
+        return self.__entities.get(key, default)
+
+    def find(self, index, value):
+        """
+        Returns the entities whose indexed field has a value
+
+        Args:
+            index (str): Index name
+            value: Value of the indexed field
+
+        Returns:
+            list: Entities found
+        """
+        with self.__lock:
+            return [self.__entities[key] for key in self.__index_maps[index].get(value, ())]
+
+    def index_values(self, index):
+        """Returns the values of the indexed field of the entities"""
+        with self.__lock:
+            return self.__index_maps[index].keys()
+
+    def __index_keys(self, entity, path):
+        value = _get_field(entity, path)
+        if value is None:
+            return []
+        if isinstance(value, (list, tuple, set)):
+            return value
+        return [value]
+
+    def __add(self, key, entity):
+        old = self.__entities.get(key)
+        if old is not None:
+            self.__remove(key)
+        self.__entities[key] = entity
+        for name, path in self.__indexes.iteritems():
+            index_map = self.__index_maps[name]
+            for value in self.__index_keys(entity, path):
+                index_map.setdefault(value, set()).add(key)
+
+    def __remove(self, key):
+        entity = self.__entities.pop(key, None)
+        if entity is None:
+            return False
+        for name, path in self.__indexes.iteritems():
+            index_map = self.__index_maps[name]
+            for value in self.__index_keys(entity, path):
+                keys = index_map.get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index_map[value]
+        return True
+
+    def __get_all(self, filters):
+        """Returns the lastUpdatedTime of the server and the entities matching filters, across all pages"""
+        params = dict(self.__filters)
+        params.update(filters)
+        params.setdefault('limit', self.__limit)
+        page = getattr(self.__tintri, self.__func)(filters=params, response_mode=self.__response_mode)
+        if page is None:
+            return None, []
+        if isinstance(page, list):
+            return None, page
+        last_updated_time = page.lastUpdatedTime
+        entities = []
+        while page is not None:
+            entities.extend(page)
+            # with auto_page set, iterating the first page returns the items of all pages
+            page = None if self.__tintri.auto_page else page._fetch_next_page()
+        return last_updated_time, entities
+
+    def refresh(self, full=False):
+        """
+        Updates the inventory with the entities changed and deleted since the last refresh, or with all
+        entities on the first refresh, when full is set or after full_refresh_interval
+
+        Returns:
+            InventoryRefresh: Counts of entities updated and deleted
+        """
+        with self.__refresh_lock:
+            start = time.time()
+            if self.__last_updated_time is None or (self.__full_refresh_interval is not None and start - self.__last_full_refresh >= self.__full_refresh_interval):
+                full = True
+            if full:
+                last_updated_time, entities = self.__get_all(self.__live_filters or {})
+                with self.__lock:
+                    keys = set()
+                    for entity in entities:
+                        key = _get_field(entity, self.__key)
+                        self.__add(key, entity)
+                        keys.add(key)
+                    deleted = [key for key in self.__entities if key not in keys]
+                    for key in deleted:
+                        self.__remove(key)
+                self.__last_full_refresh = start
+                updated = len(entities)
+            else:
+                # the server time of the first request is the next watermark, changes made while the refresh
+                # runs are requested again on the next refresh
+                since = { 'since': self.__last_updated_time }
+                last_updated_time, entities = self.__get_all(dict(self.__live_filters or {}, **since))
+                removed = []
+                if self.__deleted_filters is not None:
+                    removed = self.__get_all(dict(self.__deleted_filters, **since))[1]
+                with self.__lock:
+                    deleted = [key for key in (_get_field(entity, self.__key) for entity in removed) if self.__remove(key)]
+                    for entity in entities:
+                        self.__add(_get_field(entity, self.__key), entity)
+                updated = len(entities)
+            if last_updated_time is not None:
+                self.__last_updated_time = last_updated_time
+            return InventoryRefresh(full, updated, len(deleted), time.time() - start)
+
+class VmInventory(Inventory):
+    """
+    `Inventory` of the VMs of a server, indexed by uuid and by name, datastore and service group
+
+    Args:
+        tintri (Tintri): Server to get the VMs from
+        indexes (dict): Index name -> dotted field path of the VMs indexed by it
+        kwargs: Other `Inventory` arguments
+    """
+    def __init__(self, tintri, indexes=DEFAULT_VM_INDEXES, **kwargs):
+        kwargs.setdefault('live_filters', { 'live': 'true' })
+        kwargs.setdefault('deleted_filters', { 'deleted': 'true' })
+        super(VmInventory, self).__init__(tintri, 'get_vms', indexes, **kwargs)
+
+class VirtualDiskInventory(Inventory):
+    """
+    `Inventory` of the virtual disks of a server, indexed by uuid and by VM, datastore and name.
+    Virtual disks have no deleted filter, deleted disks are removed on full refreshes, see full_refresh_interval
+
+    Args:
+        tintri (Tintri): Server to get the virtual disks from
+        indexes (dict): Index name -> dotted field path of the virtual disks indexed by it
+        kwargs: Other `Inventory` arguments
+    """
+    def __init__(self, tintri, indexes=DEFAULT_VIRTUAL_DISK_INDEXES, **kwargs):
+        super(VirtualDiskInventory, self).__init__(tintri, 'get_virtual_disks', indexes, **kwargs)
@@ -0,0 +1,303 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+
+import collections
+import heapq
+import random
+import threading
+import time
+import Queue
+from multiprocessing.pool import ThreadPool
+from ..common import TintriPage
+from .stats import parse_stat_time
+
+DEFAULT_POLL_INTERVAL = 20 # seconds between refreshes of the stats of an entity
+DEFAULT_POLL_WORKERS = 32 # stats requests sent at a time
+DEFAULT_POLL_JITTER = 0.1 # fraction of the interval randomly added or removed
+
+# Kind of entity -> name of the `Tintri` function returning its realtime stats
+REALTIME_STATS_KINDS = { 'vm': 'get_vm_realtime_stats', 'virtual_disk': 'get_virtual_disk_realtime_stats', 'datastore': 'get_datastore_realtime_stats' }
+
+# Refreshed stats of an entity: stat is its latest sample, error is the exception if the refresh failed,
+# time is the time of the refresh in seconds since the epoch
+StatsSample = collections.namedtuple('StatsSample', ['kind', 'entity_id', 'stat', 'error', 'time'])
+
+def _field(value, name):
+    return value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+
+def _latest_sample(stats):
+    """Returns the sample of realtime stats ending last and its end time in seconds since the epoch"""
+    latest, latest_time = None, None
+    if not isinstance(stats, (TintriPage, list)):
+        stats = _field(stats, 'items') # Page entity returned by the datastore and virtual disk stats functions
+    for item in stats or []:
+        for sample in _field(item, 'sortedStats') or []:
+            end = _field(sample, 'timeEnd')
+            end_time = parse_stat_time(end) if end is not None else None
+            if latest is None or (end_time is not None and (latest_time is None or end_time > latest_time)):
+                latest, latest_time = sample, end_time
+    return latest, latest_time
+
+class StatsSubscription(object):
+    """Subscription of a consumer to the realtime stats of an entity, returned by `StatsPoller.subscribe`"""
+    def __init__(self, poller, kind, entity_id, callback, queue):
+        self.__poller = poller
+        self.__kind = kind
+        self.__entity_id = entity_id
+        self.__callback = callback
+        self.__queue = queue
+
+    @property # read only
+    def kind(self): return self.__kind
+
+    @property # read only
+    def entity_id(self): return self.__entity_id
+
+    def cancel(self):
+        """Stops publishing the stats of the entity to this subscription"""
+        self.__poller.unsubscribe(self)
+
+    def _publish(self, sample):
+        """Publishes a sample, returns False if the queue of the subscription is full"""
+        if self.__callback is not None:
+            try:
+                self.__callback(sample)
+            except Exception:
+                pass # a failing callback must not stop the publishing to other subscriptions
+        if self.__queue is not None:
+            try:
+                self.__queue.put_nowait(sample)
+            except Queue.Full:
+                return False
+        return True
+
+class _PolledEntity(object):
+    """Subscriptions and last sample time of an entity being polled"""
+    def __init__(self, kind, entity_id):
+        self.kind = kind
+        self.entity_id = entity_id
+        self.args = entity_id if isinstance(entity_id, tuple) else (entity_id,)
+        self.subscriptions = []
+        self.last_time = None # end time of the last sample published
+
+class StatsPoller(object):
+    """
+    Polls the realtime stats of many VMs, virtual disks and datastores of a server and publishes them to
+    subscribers. The stats of an entity are requested once per interval however many subscribers it has, the
+    refreshes of all entities being scheduled by one thread from a heap of due times and run by a pool of worker
+    threads, so that at most workers requests are sent at a time.
+
+    The first refresh of an entity is at a random time within the interval so that entities subscribed together
+    are refreshed evenly over the interval, later refreshes follow each other by the interval with random jitter.
+    A sample is published when its end time differs from the previous one, a failed refresh publishes its error.
+
+    Sustaining N entities takes N / interval requests per second: 10000 VMs at a 20 second interval are 500
+    requests per second, which needs workers of at least 500 times the response time of the server, and a
+    pool_maxsize of the server of at least workers so that connections are reused.
+
+    Args:
+        tintri (Tintri): Server of the entities
+        interval (float): Seconds between refreshes of the stats of an entity
+        workers (int): Stats requests sent at a time
+        jitter (float): Fraction of the interval randomly added or removed
+        response_mode (str): Response mode of the stats, default is the response mode of the server
+    """
+    def __init__(self, tintri, interval=DEFAULT_POLL_INTERVAL, workers=DEFAULT_POLL_WORKERS, jitter=DEFAULT_POLL_JITTER, response_mode=None):
+        self.__tintri = tintri
+        self.__interval = interval
+        self.__workers = workers
+        self.__jitter = jitter
+        self.__response_mode = response_mode
+        self.__entities = {} # (kind, entity ID) -> entity being polled
+        self.__schedule = [] # heap of (due time, sequence number, entity)
+        self.__sequence = 0
+        self.__condition = threading.Condition()
+        self.__slots = threading.Semaphore(workers) # refreshes running or queued in the pool
+        self.__pool = None
+        self.__thread = None
+        self.__stopped = False
+        self.__counts_lock = threading.Lock() # guards the counts, incremented by the workers
+        self.__polls = 0
+        self.__errors = 0
+        self.__dropped = 0
+        self.__lag = 0
+
+    @property # read only
+    def tintri(self): return self.__tintri
+
+    @property # read only
+    def interval(self): return self.__interval
+
+    @property # read only
+    def polls(self):
+        """Number of stats requests sent"""
+        return self.__polls
+
+    @property # read only
+    def errors(self):
+        """Number of stats requests that failed"""
+        return self.__errors
+
+    @property # read only
+    def dropped(self):
+        """Number of samples not published to a subscription because its queue was full"""
+        return self.__dropped
+
+    @property # read only
+    def lag(self):
+        """Seconds between the due time of the last refresh and its start, growing when the workers cannot keep up"""
+        return self.__lag
+
+    def __len__(self):
+        """Number of entities polled"""
+        return len(self.__entities)
+
+    def subscribe(self, kind, entity_id, callback=None, queue=None):
+        """
+        Publishes the realtime stats of an entity to a callback or a queue, polling the entity if it is not already
+
+        Args:
+            kind (str): Kind of the entity, a key of REALTIME_STATS_KINDS
+            entity_id (str or tuple): UUID of the entity, (VM UUID, virtual disk ID) for a virtual disk
+            callback (function): Called with each `StatsSample` of the entity, from a worker thread
+            queue (Queue.Queue): Queue each `StatsSample` of the entity is put to, samples are dropped when it is full
+
+        Returns:
+            `StatsSubscription`: Subscription, cancelled to stop publishing
+        """
+        return self.subscribe_all(kind, [entity_id], callback, queue)[0]
+
+    def subscribe_all(self, kind, entity_ids, callback=None, queue=None):
+        """Subscribes to the realtime stats of entities, see subscribe, and returns their subscriptions"""
+        if kind not in REALTIME_STATS_KINDS:
+            raise ValueError("Unknown stats kind %s, expected one of %s" % (kind, ', '.join(sorted(REALTIME_STATS_KINDS))))
+        if callback is None and queue is None:
+            raise ValueError("A callback or a queue is required")
+        subscriptions = [StatsSubscription(self, kind, entity_id, callback, queue) for entity_id in entity_ids]
+        now = time.time()
+        with self.__condition:
+            if self.__stopped:
+                raise ValueError("Stats poller is stopped")
+            for subscription in subscriptions:
+                entity = self.__entities.get((kind, subscription.entity_id))
+                if entity is None:
+                    entity = self.__entities[(kind, subscription.entity_id)] = _PolledEntity(kind, subscription.entity_id)
+                    self.__push(now + random.uniform(0, self.__interval), entity)
+                entity.subscriptions = entity.subscriptions + [subscription]
+            if self.__thread is None:
+                self.__pool = ThreadPool(self.__workers)
+                self.__thread = threading.Thread(target=self.__run, name='StatsPoller-%s' % self.__tintri.host)
+                self.__thread.daemon = True
+                self.__thread.start()
+        return subscriptions
+
+    def unsubscribe(self, subscription):
+        """Cancels a subscription, the entity is no longer polled once it has no subscription"""
+        with self.__condition:
+            entity = self.__entities.get((subscription.kind, subscription.entity_id))
+            if entity is None or subscription not in entity.subscriptions:
+                return
+            entity.subscriptions = [other for other in entity.subscriptions if other is not subscription]
+            if not entity.subscriptions:
+                # its scheduled refresh is skipped
+                del self.__entities[(entity.kind, entity.entity_id)]
+
+    def stop(self):
+        """Stops polling, refreshes running complete and publish their samples"""
+        with self.__condition:
+            self.__stopped = True
+            self.__entities = {}
+            self.__schedule = []
+            self.__condition.notify()
+            thread, pool = self.__thread, self.__pool
+        if thread is not None:
+            thread.join()
+            pool.close()
+            pool.join()
+
+    def __push(self, due, entity):
+        """Schedules a refresh of an entity, called with the condition"""
+        self.__sequence += 1
+        heapq.heappush(self.__schedule, (due, self.__sequence, entity))
+        if self.__schedule[0][2] is entity:
+            self.__condition.notify()
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__stopped and (not self.__schedule or self.__schedule[0][0] > time.time()):
+                    self.__condition.wait(self.__schedule[0][0] - time.time() if self.__schedule else None)
+                if self.__stopped:
+                    return
+                due, _, entity = heapq.heappop(self.__schedule)
+                if self.__entities.get((entity.kind, entity.entity_id)) is not entity:
+                    continue # unsubscribed
+            # wait for a free worker rather than queueing refreshes the workers cannot keep up with
+            self.__slots.acquire()
+            self.__lag = max(0, time.time() - due)
+            self.__pool.apply_async(self.__refresh, (entity, due))
+
+    def __refresh(self, entity, due):
+        stat, end_time, error = None, None, None
+        try:
+            with self.__counts_lock:
+                self.__polls += 1
+            stats = getattr(self.__tintri, REALTIME_STATS_KINDS[entity.kind])(*entity.args, response_mode=self.__response_mode)
+            stat, end_time = _latest_sample(stats)
+        except Exception as e:
+            with self.__counts_lock:
+                self.__errors += 1
+            error = e
+        finally:
+            self.__slots.release()
+
+        now = time.time()
+        if error is not None or (stat is not None and (end_time is None or end_time != entity.last_time)):
+            entity.last_time = end_time
+            sample = StatsSample(entity.kind, entity.entity_id, stat, error, now)
+            dropped = sum(1 for subscription in entity.subscriptions if not subscription._publish(sample))
+            if dropped:
+                with self.__counts_lock:
+                    self.__dropped += dropped
+
+        # scheduled once published so that the samples of an entity are published in order
+        with self.__condition:
+            if self.__entities.get((entity.kind, entity.entity_id)) is entity:
+                # next refresh an interval after this one was due, or after now when the workers fell behind
+                self.__push(max(due + self.__interval, now) + self.__interval * random.uniform(-self.__jitter, self.__jitter), entity)
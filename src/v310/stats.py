@@ -0,0 +1,292 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+import array
+import bisect
+import calendar
+import math
+import operator
+import time
+from ..common import RESPONSE_MODE_DICT
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # columns are array.array and aggregations run in Python
+
+# Fields of stat samples that are not metrics
+_NON_METRIC_FIELDS = frozenset(['typeId', 'timeStart', 'timeEnd', 'uuid', 'replication', 'replicationIncoming', 'replicationOutgoing', 'migration'])
+_time_offsets = {} # UTC offset suffix of a timestamp -> seconds
+
+def _time_offset(suffix):
+    """Returns the seconds of the UTC offset ending a timestamp, such as -07:00"""
+    offset = _time_offsets.get(suffix)
+    if offset is None:
+        if suffix in ('', 'Z'):
+            offset = 0
+        else:
+            offset = (int(suffix[1:3]) * 3600 + int(suffix[4:6]) * 60) * (-1 if suffix[0] == '-' else 1)
+        _time_offsets[suffix] = offset
+    return offset
+
+def parse_stat_time(value):
+    """
+    Returns a stat timestamp, such as 2016-01-01T00:05:00.000-07:00, in seconds since the epoch.
+    Numbers are taken as milliseconds since the epoch.
+    """
+    if isinstance(value, (int, long, float)):
+        return value / 1000.0
+    seconds = calendar.timegm((int(value[0:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]), int(value[14:16]), int(value[17:19]), 0, 0, 0))
+    return seconds + int(value[20:23] or 0) / 1000.0 - _time_offset(value[23:])
+
+def format_stat_time(seconds):
+    """Returns seconds since the epoch as a stat timestamp in UTC, such as 2016-01-01T07:05:00.000-00:00"""
+    millis = int(round(seconds * 1000))
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(millis // 1000)) + '.%03d-00:00' % (millis % 1000)
+
+def _parse_stat_times(values):
+    """Returns the stat timestamps of values in seconds since the epoch, parsed by numpy when installed"""
+    if numpy is not None and values and all(isinstance(value, basestring) and len(value) >= 23 for value in values):
+        millis = numpy.array([value[:23] for value in values], dtype='datetime64[ms]').astype(numpy.int64)
+        return millis / 1000.0 - numpy.array([_time_offset(value[23:]) for value in values], dtype=numpy.float64)
+    return [parse_stat_time(value) for value in values]
+
+def _iter_samples(stats):
+    """Yields the stat samples of a page or list of stats, each being a dict with sortedStats or a sample"""
+    if isinstance(stats, dict) and 'items' in stats:
+        stats = stats['items'] or [] # Page entity returned by the datastore and virtual disk stats functions
+    for item in stats:
+        if isinstance(item, dict) and 'sortedStats' in item:
+            for sample in item['sortedStats'] or []:
+                yield sample
+        else:
+            yield item
+
+def _column(values):
+    if numpy is not None:
+        return numpy.asarray(values, dtype=numpy.float64)
+    return array.array('d', values)
+
+class StatsFrame(object):
+    """
+    Column-oriented stats: a time column, the end time of each sample in seconds since the epoch, and one float64
+    column per metric such as latencyTotalMs, missing values being NaN. Columns are numpy arrays when numpy is
+    installed and aggregations are then vectorized, otherwise columns are array.array('d').
+
+    Args:
+        times (sequence): End time of each sample in seconds since the epoch, in increasing order
+        columns (dict): Metric name -> sequence of values, one per sample
+    """
+    def __init__(self, times, columns):
+        self.__times = _column(times)
+        self.__columns = dict((metric, _column(values)) for metric, values in columns.iteritems())
+
+    @classmethod
+    def from_json(cls, stats, metrics=None):
+        """
+        Builds a frame from stats in dict response mode, such as the page returned by get_vm_historic_stats
+        called with response_mode='dict'
+
+        Args:
+            stats (iterable): Stats items with sortedStats lists, or stat samples, as dicts
+            metrics (list): Metrics kept, None for all numeric fields of the samples
+
+        Returns:
+            `StatsFrame`: Samples sorted by end time
+        """
+        samples = list(_iter_samples(stats))
+        if metrics is None:
+            names = set()
+            for sample in samples[:1] + samples[-1:]:
+                names.update(name for name, value in sample.iteritems() if name not in _NON_METRIC_FIELDS and isinstance(value, (int, long, float)) and not isinstance(value, bool))
+            metrics = sorted(names)
+        times = _parse_stat_times([sample['timeEnd'] for sample in samples])
+        # rows of metric values, read by one C call per sample when every sample has every metric
+        try:
+            getter = operator.itemgetter(*metrics) if len(metrics) > 1 else (lambda sample: (sample[metrics[0]],))
+            rows = [getter(sample) for sample in samples] if metrics else []
+        except KeyError:
+            rows = [tuple(sample.get(metric) for metric in metrics) for sample in samples]
+        if numpy is not None:
+            matrix = numpy.array(rows, dtype=numpy.float64).reshape(len(samples), len(metrics)) # None becomes NaN
+            times = numpy.asarray(times, dtype=numpy.float64)
+            if len(times) > 1 and (numpy.diff(times) < 0).any():
+                order = numpy.argsort(times, kind='mergesort')
+                times, matrix = times[order], matrix[order]
+            return cls(times, dict((metric, numpy.ascontiguousarray(matrix[:, j])) for j, metric in enumerate(metrics)))
+        order = sorted(xrange(len(samples)), key=times.__getitem__)
+        nan = float('nan')
+        columns = dict((metric, [nan if rows[i][j] is None else rows[i][j] for i in order]) for j, metric in enumerate(metrics))
+        return cls([times[i] for i in order], columns)
+
+    @classmethod
+    def concat(cls, frames):
+        """Returns a frame with the samples of frames, which must follow each other in time"""
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return cls([], {})
+        metrics = set()
+        for frame in frames:
+            metrics.update(frame.metrics)
+        nan = float('nan')
+        times = []
+        columns = dict((metric, []) for metric in metrics)
+        for frame in frames:
+            times.extend(frame.times)
+            for metric in metrics:
+                column = frame.get(metric)
+                columns[metric].extend(column if column is not None else [nan] * len(frame))
+        return cls(times, columns)
+
+    @property # read only
+    def times(self):
+        """End time of each sample in seconds since the epoch"""
+        return self.__times
+
+    @property # read only
+    def metrics(self):
+        """Names of the metric columns"""
+        return sorted(self.__columns.keys())
+
+    def __len__(self):
+        return len(self.__times)
+
+    def __getitem__(self, metric):
+        """Returns the column of a metric"""
+        return self.__columns[metric]
+
+    def __contains__(self, metric):
+        return metric in self.__columns
+
+    def get(self, metric, default=None):
+        return self.__columns.get(metric, default)
+
+    def between(self, start=None, end=None):
+        """Returns a frame of the samples whose end time is at or after start and before end"""
+        times = self.__times
+        i = 0 if start is None else (int(numpy.searchsorted(times, start, 'left')) if numpy is not None else bisect.bisect_left(times, start))
+        j = len(times) if end is None else (int(numpy.searchsorted(times, end, 'left')) if numpy is not None else bisect.bisect_left(times, end))
+        return StatsFrame(times[i:j], dict((metric, column[i:j]) for metric, column in self.__columns.iteritems()))
+
+    def __values(self, metric):
+        """Values of a metric without NaN, as a list when numpy is not installed"""
+        column = self.__columns[metric]
+        if numpy is not None:
+            return column[~numpy.isnan(column)]
+        return [value for value in column if not math.isnan(value)]
+
+    def mean(self, metric):
+        """Returns the mean of a metric, NaN if it has no value"""
+        values = self.__values(metric)
+        if not len(values):
+            return float('nan')
+        return float(numpy.mean(values)) if numpy is not None else math.fsum(values) / len(values)
+
+    def max(self, metric):
+        """Returns the maximum of a metric, NaN if it has no value"""
+        values = self.__values(metric)
+        if not len(values):
+            return float('nan')
+        return float(numpy.max(values)) if numpy is not None else max(values)
+
+    def min(self, metric):
+        """Returns the minimum of a metric, NaN if it has no value"""
+        values = self.__values(metric)
+        if not len(values):
+            return float('nan')
+        return float(numpy.min(values)) if numpy is not None else min(values)
+
+    def percentile(self, metric, q):
+        """
+        Returns percentiles of a metric, interpolated linearly between values
+
+        Args:
+            metric (str): Metric name
+            q (float or list): Percentile or percentiles, between 0 and 100
+
+        Returns:
+            float or list: Percentile of each q, NaN if the metric has no value
+        """
+        values = self.__values(metric)
+        qs = q if isinstance(q, (list, tuple)) else [q]
+        if not len(values):
+            result = [float('nan')] * len(qs)
+        elif numpy is not None:
+            result = [float(value) for value in numpy.percentile(values, qs)]
+        else:
+            values = sorted(values)
+            result = []
+            for p in qs:
+                rank = (len(values) - 1) * p / 100.0
+                low = int(math.floor(rank))
+                high = min(low + 1, len(values) - 1)
+                result.append(values[low] + (values[high] - values[low]) * (rank - low))
+        return result if isinstance(q, (list, tuple)) else result[0]
+
+    def rate(self, metric):
+        """
+        Returns the change per second of a metric between consecutive samples, such as the growth of space used
+
+        Returns:
+            sequence: len(self) - 1 rates, the rate of a sample being relative to the previous one
+        """
+        column = self.__columns[metric]
+        times = self.__times
+        if numpy is not None:
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                return numpy.diff(column) / numpy.diff(times)
+        nan = float('nan')
+        return _column([(column[i] - column[i - 1]) / (times[i] - times[i - 1]) if times[i] != times[i - 1] else nan for i in xrange(1, len(times))])
+
+def get_stats_frame(tintri, func, *args, **kwargs):
+    """
+    Calls a stats function of a server, such as 'get_vm_historic_stats', and returns its stats as a `StatsFrame`.
+    Stats are decoded as dicts and converted to columns without building stat objects.
+
+    Args:
+        tintri (Tintri): Server
+        func (str): Name of the stats function
+        args: Arguments of the function
+        kwargs: Keyword arguments of the function, metrics sets the metrics kept
+
+    Returns:
+        `StatsFrame`: Stats of all pages
+    """
+    metrics = kwargs.pop('metrics', None)
+    kwargs['response_mode'] = RESPONSE_MODE_DICT
+    return StatsFrame.from_json(getattr(tintri, func)(*args, **kwargs) or [], metrics)
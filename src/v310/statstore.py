@@ -0,0 +1,393 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+
+import array
+import bisect
+import collections
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+import urllib
+from .stats import StatsFrame, format_stat_time, get_stats_frame, parse_stat_time, numpy
+
+DEFAULT_STATS_SETTLE_TIME = 600 # seconds before now within which samples may still change and are not stored
+DEFAULT_STATS_MAX_SEGMENTS = 64 # segments of an entity above which they are merged into one
+DEFAULT_STATS_MAX_OPEN_COLUMNS = 512 # column files kept mapped at a time, each holding a file descriptor
+
+# Kind of entity -> name of the `Tintri` function returning its historic stats
+STATS_STORE_KINDS = { 'vm': 'get_vm_historic_stats', 'datastore': 'get_datastore_historic_stats' }
+
+_MANIFEST_FILE = 'manifest.json'
+_TIMES_FILE = '_times.f8'
+_COLUMN_SUFFIX = '.f8'
+
+def _to_seconds(value):
+    """Returns a time given in seconds since the epoch or as a stat timestamp, in seconds since the epoch"""
+    if isinstance(value, basestring):
+        return parse_stat_time(value)
+    return float(value)
+
+def _add_range(ranges, start, end):
+    """Returns sorted disjoint ranges with [start, end) added, overlapping and touching ranges being merged"""
+    merged = []
+    for range_start, range_end in ranges:
+        if range_end < start or range_start > end:
+            merged.append([range_start, range_end])
+        else:
+            start, end = min(start, range_start), max(end, range_end)
+    merged.append([start, end])
+    merged.sort()
+    return merged
+
+def _missing_ranges(ranges, start, end):
+    """Returns the parts of [start, end) that are not in sorted disjoint ranges"""
+    missing = []
+    for range_start, range_end in ranges:
+        if range_end <= start:
+            continue
+        if range_start >= end:
+            break
+        if range_start > start:
+            missing.append([start, range_start])
+        start = max(start, range_end)
+    if start < end:
+        missing.append([start, end])
+    return missing
+
+def _write_column(path, values):
+    with open(path, 'wb') as f:
+        if numpy is not None:
+            numpy.asarray(values, dtype=numpy.float64).tofile(f)
+        else:
+            array.array('d', values).tofile(f)
+
+def _map_column(path, count):
+    """Returns a column file of count float64 values, memory-mapped read-only when numpy is installed"""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if numpy is not None:
+        # a plain array over the mapping, slicing it is cheaper than slicing a numpy.memmap
+        return numpy.frombuffer(mapped, dtype=numpy.float64, count=count)
+    try:
+        column = array.array('d')
+        column.fromstring(mapped[:count * column.itemsize])
+    finally:
+        mapped.close()
+    return column
+
+class _EntityStats(object):
+    """Segments and held time ranges of the stats of an entity, as saved in its manifest"""
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock() # serializes changes
+        manifest = {}
+        if os.path.exists(os.path.join(path, _MANIFEST_FILE)):
+            with open(os.path.join(path, _MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        self.next_segment = manifest.get('next_segment', 0)
+        self.ranges = manifest.get('ranges', [])
+        # segments sorted by time and the end time of each, replaced as a whole so that queries need no lock
+        segments = manifest.get('segments', [])
+        self.segments = (segments, [segment['end'] for segment in segments])
+
+    def save(self):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        manifest = { 'next_segment': self.next_segment, 'ranges': self.ranges, 'segments': self.segments[0] }
+        # write to a temporary file first so that a store stopped while saving keeps the previous manifest
+        tmp_path = os.path.join(self.path, '%s.%d.tmp' % (_MANIFEST_FILE, os.getpid()))
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.rename(tmp_path, os.path.join(self.path, _MANIFEST_FILE))
+
+class StatsStore(object):
+    """
+    Local store of the historic stats of entities, such as `VirtualMachineStat`, `DatastoreStat` and
+    `VmstorePoolStat` samples, kept in a directory. The store knows the time ranges it holds for each entity, so
+    get_historic_stats only requests the missing parts of a range from the server, and answers queries of the
+    ranges it holds without requests.
+
+    The stats of an entity are a directory of segments, each holding the samples of a time range as one file of
+    float64 values per metric plus one of end times. Segments are never changed once written: new samples are
+    written to new segments and a manifest lists the segments and the ranges held. Column files are memory-mapped
+    and queries slice them in place, so a query of stored stats takes microseconds. When an entity has more than
+    max_segments segments they are merged into one.
+
+    Samples ending less than settle_time seconds ago may still change on the server, they are returned by
+    get_historic_stats but are not stored.
+
+    Args:
+        path (str): Directory of the store, created if it does not exist
+        tintri (Tintri): Server the missing stats are requested from, None for a store only read and added to
+        settle_time (float): Seconds before now within which samples are not stored
+        max_segments (int): Segments of an entity above which they are merged
+        max_open_columns (int): Column files kept mapped at a time
+    """
+    def __init__(self, path, tintri=None, settle_time=DEFAULT_STATS_SETTLE_TIME, max_segments=DEFAULT_STATS_MAX_SEGMENTS,
+                 max_open_columns=DEFAULT_STATS_MAX_OPEN_COLUMNS):
+        self.__path = path
+        self.__tintri = tintri
+        self.__settle_time = settle_time
+        self.__max_segments = max_segments
+        self.__max_open_columns = max_open_columns
+        self.__entities = {} # (kind, entity id) -> _EntityStats
+        self.__mapped = collections.OrderedDict() # segment directory -> metric -> mapped column, least recently used first
+        self.__open_columns = 0 # columns mapped
+        self.__lock = threading.Lock() # guards the entities and mapped columns
+        self.__fetches = 0
+
+    @property # read only
+    def path(self): return self.__path
+
+    @property # read only
+    def tintri(self): return self.__tintri
+
+    @property # read only
+    def fetches(self):
+        """Number of stats requests sent to the server"""
+        return self.__fetches
+
+    def ranges(self, kind, entity_id):
+        """
+        Returns the time ranges held for an entity
+
+        Args:
+            kind (str): Kind of the entity, such as 'vm', 'datastore' or 'vmstore_pool'
+            entity_id (str): UUID of the entity
+
+        Returns:
+            list: Sorted [start, end) ranges of end times in seconds since the epoch
+        """
+        return [list(held) for held in self.__entity(kind, entity_id).ranges]
+
+    def missing(self, kind, entity_id, since, until):
+        """Returns the parts of the time range from since to until that are not held for an entity"""
+        return _missing_ranges(self.__entity(kind, entity_id).ranges, _to_seconds(since), _to_seconds(until))
+
+    def add(self, kind, entity_id, frame, since, until):
+        """
+        Stores stats collected elsewhere, such as `VmstorePoolStat` samples, and marks their time range as held.
+        Samples of the parts of the range already held are ignored.
+
+        Args:
+            kind (str): Kind of the entity
+            entity_id (str): UUID of the entity
+            frame (`StatsFrame`): Samples of the entity
+            since (float or str): Start of the range of end times of the samples, seconds since the epoch or timestamp
+            until (float or str): End of the range, excluded
+        """
+        entity = self.__entity(kind, entity_id)
+        with entity.lock:
+            self.__append(entity, frame, _to_seconds(since), _to_seconds(until))
+
+    def query(self, kind, entity_id, since=None, until=None, metrics=None):
+        """
+        Returns the stored stats of an entity, without requesting the stats that are not held
+
+        Args:
+            kind (str): Kind of the entity
+            entity_id (str): UUID of the entity
+            since (float or str): Samples ending at or after since, seconds since the epoch or timestamp, None for all
+            until (float or str): Samples ending before until, None for all
+            metrics (list): Metrics returned, None for all
+
+        Returns:
+            `StatsFrame`: Samples sorted by end time
+        """
+        entity = self.__entity(kind, entity_id)
+        since = _to_seconds(since) if since is not None else None
+        until = _to_seconds(until) if until is not None else None
+        try:
+            return self.__query(entity, since, until, metrics)
+        except (IOError, OSError):
+            # segments merged while being read, read the merged segment
+            return self.__query(entity, since, until, metrics)
+
+    def get_historic_stats(self, kind, entity_id, since, until=None, metrics=None):
+        """
+        Returns the historic stats of an entity, requesting only the parts of the range that are not held
+
+        Args:
+            kind (str): Kind of the entity, a key of STATS_STORE_KINDS
+            entity_id (str): UUID of the entity
+            since (float or str): Samples ending at or after since, seconds since the epoch or timestamp
+            until (float or str): Samples ending before until, default value is now
+            metrics (list): Metrics returned, None for all
+
+        Returns:
+            `StatsFrame`: Samples sorted by end time
+        """
+        if kind not in STATS_STORE_KINDS:
+            raise ValueError("Unknown stats kind %s, expected one of %s" % (kind, ', '.join(sorted(STATS_STORE_KINDS))))
+        if self.__tintri is None:
+            raise ValueError("Stats store has no server to get stats from")
+        since = _to_seconds(since)
+        now = time.time()
+        until = _to_seconds(until) if until is not None else now
+        settled = max(since, min(until, now - self.__settle_time))
+        entity = self.__entity(kind, entity_id)
+        with entity.lock:
+            for start, end in _missing_ranges(entity.ranges, since, settled):
+                self.__append(entity, self.__fetch(kind, entity_id, start, end), start, end)
+        frame = self.query(kind, entity_id, since, settled, metrics)
+        if settled < until:
+            frame = StatsFrame.concat([frame, self.__fetch(kind, entity_id, settled, until, metrics)])
+        return frame
+
+    def get_vm_historic_stats(self, vm_id, since, until=None, metrics=None):
+        """Returns the historic stats of a VM, see get_historic_stats"""
+        return self.get_historic_stats('vm', vm_id, since, until, metrics)
+
+    def get_datastore_historic_stats(self, datastore_id, since, until=None, metrics=None):
+        """Returns the historic stats of a datastore, see get_historic_stats"""
+        return self.get_historic_stats('datastore', datastore_id, since, until, metrics)
+
+    def compact(self, kind, entity_id):
+        """Merges the segments of an entity into one"""
+        entity = self.__entity(kind, entity_id)
+        with entity.lock:
+            self.__compact(entity)
+
+    def close(self):
+        """Unmaps the column files"""
+        with self.__lock:
+            self.__mapped.clear()
+            self.__open_columns = 0
+
+    def __entity(self, kind, entity_id):
+        key = (kind, entity_id)
+        entity = self.__entities.get(key)
+        if entity is None:
+            with self.__lock:
+                entity = self.__entities.get(key)
+                if entity is None:
+                    entity = _EntityStats(os.path.join(self.__path, kind, urllib.quote(entity_id, safe='')))
+                    self.__entities[key] = entity
+        return entity
+
+    def __fetch(self, kind, entity_id, start, end, metrics=None):
+        filters = { 'since': format_stat_time(start), 'until': format_stat_time(end) }
+        self.__fetches += 1
+        return get_stats_frame(self.__tintri, STATS_STORE_KINDS[kind], entity_id, filters=filters, metrics=metrics).between(start, end)
+
+    def __append(self, entity, frame, since, until):
+        """Writes the samples of the parts of [since, until) not held to new segments, called with the entity lock"""
+        segments = list(entity.segments[0])
+        for start, end in _missing_ranges(entity.ranges, since, until):
+            part = frame.between(start, end)
+            if len(part):
+                segments.append(self.__write_segment(entity, part))
+        segments.sort(key=lambda segment: segment['start'])
+        entity.ranges = _add_range(entity.ranges, since, until)
+        entity.segments = (segments, [segment['end'] for segment in segments])
+        if len(segments) > self.__max_segments:
+            self.__compact(entity)
+        else:
+            entity.save()
+
+    def __write_segment(self, entity, frame):
+        name = '%08d' % entity.next_segment
+        entity.next_segment += 1
+        directory = os.path.join(entity.path, name)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        _write_column(os.path.join(directory, _TIMES_FILE), frame.times)
+        for metric in frame.metrics:
+            _write_column(os.path.join(directory, metric + _COLUMN_SUFFIX), frame[metric])
+        return { 'name': name, 'start': float(frame.times[0]), 'end': float(frame.times[-1]), 'count': len(frame), 'metrics': frame.metrics }
+
+    def __compact(self, entity):
+        """Merges the segments of an entity into one, called with the entity lock"""
+        old_segments = entity.segments[0]
+        if len(old_segments) < 2:
+            return
+        segment = self.__write_segment(entity, self.__query(entity, None, None, None))
+        entity.segments = ([segment], [segment['end']])
+        entity.save()
+        with self.__lock:
+            for old_segment in old_segments:
+                self.__open_columns -= len(self.__mapped.pop(os.path.join(entity.path, old_segment['name']), {}))
+        for old_segment in old_segments:
+            shutil.rmtree(os.path.join(entity.path, old_segment['name']), ignore_errors=True)
+
+    def __query(self, entity, since, until, metrics):
+        segments, ends = entity.segments
+        i = bisect.bisect_left(ends, since) if since is not None else 0
+        frames = []
+        while i < len(segments) and (until is None or segments[i]['start'] < until):
+            frames.append(self.__segment_frame(entity, segments[i], since, until, metrics))
+            i += 1
+        if len(frames) == 1:
+            return frames[0]
+        return StatsFrame.concat(frames)
+
+    def __segment_frame(self, entity, segment, since, until, metrics):
+        """Returns the samples of a segment ending at or after since and before until, slicing its columns in place"""
+        if metrics is None:
+            metrics = segment['metrics']
+        count = segment['count']
+        mapped = self.__map_columns(os.path.join(entity.path, segment['name']), segment, metrics)
+        times = mapped[None]
+        if numpy is not None:
+            i = 0 if since is None or since <= segment['start'] else int(numpy.searchsorted(times, since, 'left'))
+            j = count if until is None or until > segment['end'] else int(numpy.searchsorted(times, until, 'left'))
+        else:
+            i = 0 if since is None or since <= segment['start'] else bisect.bisect_left(times, since)
+            j = count if until is None or until > segment['end'] else bisect.bisect_left(times, until)
+        nan = float('nan')
+        return StatsFrame(times[i:j], dict((metric, mapped[metric][i:j] if metric in mapped else [nan] * (j - i)) for metric in metrics))
+
+    def __map_columns(self, directory, segment, metrics):
+        """Returns the mapped columns of a segment, the times being under None, mapping those of metrics not mapped yet"""
+        with self.__lock:
+            mapped = self.__mapped.pop(directory, None)
+            if mapped is None:
+                mapped = { None: _map_column(os.path.join(directory, _TIMES_FILE), segment['count']) }
+                self.__open_columns += 1
+            self.__mapped[directory] = mapped
+            for metric in metrics:
+                if metric not in mapped and metric in segment['metrics']:
+                    mapped[metric] = _map_column(os.path.join(directory, metric + _COLUMN_SUFFIX), segment['count'])
+                    self.__open_columns += 1
+            while self.__open_columns > self.__max_open_columns and len(self.__mapped) > 1:
+                self.__open_columns -= len(self.__mapped.popitem(last=False)[1])
+        return mapped
@@ -0,0 +1,316 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+import random
+import threading
+import time
+from ..common import TintriError, RESPONSE_MODE_OBJECTS
+from . import TaskFilterSpec
+from .bulk import is_transient_error
+
+TASK_DONE_STATES = ['CANCELLED', 'FAILED', 'SUCCESS'] # states of a completed task
+DEFAULT_TASK_MIN_INTERVAL = 0.5 # seconds between polls after tasks are added
+DEFAULT_TASK_MAX_INTERVAL = 3 # maximum seconds between polls
+DEFAULT_TASK_BACKOFF = 1.5 # factor of the poll interval after each poll completing no task
+DEFAULT_TASK_JITTER = 0.1 # fraction of the poll interval randomly added or removed
+DEFAULT_TASK_BATCH_SIZE = 100 # task IDs polled per get_tasks request
+DEFAULT_TASK_MAX_FAILURES = 5 # consecutive polls failing with a transient error after which the tasks polled fail
+
+class TintriTaskTimeoutError(TintriError):
+    """Raised by `TaskFuture.result` when a task did not complete within the given timeout"""
+
+class TintriTaskWaitCancelledError(TintriError):
+    """Raised by `TaskFuture.result` when waiting for the task was cancelled with `TaskWaiter.cancel`"""
+
+class TaskFuture(object):
+    """Completion of a task waited for by a `TaskWaiter`"""
+    def __init__(self, task_id):
+        self.__task_id = task_id
+        self.__task = None
+        self.__error = None
+        self.__done = threading.Event()
+        self.__callbacks = []
+        self.__lock = threading.Lock()
+
+    @property # read only
+    def task_id(self): return self.__task_id
+
+    @property # read only
+    def task(self):
+        """Last polled state of the task, None before the first poll"""
+        return self.__task
+
+    def done(self):
+        """Returns True if the task completed or polling it failed"""
+        return self.__done.is_set()
+
+    def result(self, timeout=None):
+        """
+        Waits for the task to complete
+
+        Args:
+            timeout (float): Seconds to wait, None waits forever
+
+        Returns:
+            `Task`: Completed task, whose state is one of CANCELLED, FAILED and SUCCESS
+
+        Raises:
+            TintriTaskTimeoutError: The task did not complete within timeout, it is still polled
+            TintriTaskWaitCancelledError: Waiting for the task was cancelled
+            TintriError: Polling the task failed
+        """
+        # wait in steps so that the waiting thread can be interrupted
+        deadline = time.time() + timeout if timeout is not None else None
+        while not self.__done.wait(1 if deadline is None else max(0, min(1, deadline - time.time()))):
+            if deadline is not None and time.time() >= deadline:
+                raise TintriTaskTimeoutError(message='Task %s did not complete within %s seconds' % (self.__task_id, timeout))
+        if self.__error is not None:
+            raise self.__error
+        return self.__task
+
+    def exception(self):
+        """Returns the error polling the task, None if there was none or the task is not done"""
+        return self.__error
+
+    def add_done_callback(self, func):
+        """Calls func with the future when the task completes, at once if it is already completed"""
+        with self.__lock:
+            if not self.__done.is_set():
+                self.__callbacks.append(func)
+                return
+        func(self)
+
+    def _update(self, task):
+        self.__task = task
+
+    def _set_done(self, task=None, error=None):
+        with self.__lock:
+            if task is not None:
+                self.__task = task
+            self.__error = error
+            self.__done.set()
+            callbacks, self.__callbacks = self.__callbacks, []
+        for func in callbacks:
+            try:
+                func(self)
+            except Exception:
+                pass # a failing callback must not stop the polling of other tasks
+
+class TaskWaiter(object):
+    """
+    Waits for many tasks of a server at once. Tasks are polled together by a background thread with get_tasks,
+    batch_size task IDs per request. The poll interval starts at min_interval when tasks are added and grows by
+    backoff after each poll completing no task, up to max_interval or the smallest max_interval of the tasks waited for,
+    with random jitter so that waiters of several clients do not poll in step.
+    A poll failing with a transient error, such as a server overload, is retried on the next poll. The tasks of a poll
+    failing with another error, or failing max_failures times in a row, complete with the error.
+
+    Args:
+        tintri (Tintri): Server running the tasks
+        min_interval (float): Seconds between polls after tasks are added
+        max_interval (float): Maximum seconds between polls
+        backoff (float): Factor of the poll interval after each poll completing no task
+        jitter (float): Fraction of the poll interval randomly added or removed
+        batch_size (int): Task IDs polled per get_tasks request
+        max_failures (int): Consecutive polls failing with a transient error after which the tasks polled fail
+    """
+    def __init__(self, tintri, min_interval=DEFAULT_TASK_MIN_INTERVAL, max_interval=DEFAULT_TASK_MAX_INTERVAL, backoff=DEFAULT_TASK_BACKOFF,
+                 jitter=DEFAULT_TASK_JITTER, batch_size=DEFAULT_TASK_BATCH_SIZE, max_failures=DEFAULT_TASK_MAX_FAILURES):
+        self.__tintri = tintri
+        self.__min_interval = min_interval
+        self.__max_interval = max_interval
+        self.__backoff = backoff
+        self.__jitter = jitter
+        self.__batch_size = batch_size
+        self.__max_failures = max_failures
+        self.__futures = {} # task ID -> future of a task being polled
+        self.__task_intervals = {} # task ID -> maximum poll interval asked for the task
+        self.__failures = 0 # consecutive polls failing with a transient error
+        self.__interval = min_interval
+        self.__next_poll = None # time of the next poll
+        self.__condition = threading.Condition()
+        self.__thread = None
+        self.__polls = 0
+
+    @property # read only
+    def polls(self):
+        """Number of requests sent to poll tasks"""
+        return self.__polls
+
+    def __len__(self):
+        """Number of tasks being waited for"""
+        return len(self.__futures)
+
+    def wait(self, task, callback=None, max_interval=None):
+        """
+        Starts waiting for a task
+
+        Args:
+            task (`Task` or str): Task or task ID
+            callback (function): Called with the `TaskFuture` when the task completes
+            max_interval (float): Maximum seconds between polls of the task, if lower than the one of the waiter
+
+        Returns:
+            `TaskFuture`: Completion of the task
+        """
+        task_id = task if isinstance(task, basestring) else task.uuid.uuid
+        with self.__condition:
+            future = self.__futures.get(task_id)
+            if future is None:
+                future = self.__futures[task_id] = TaskFuture(task_id)
+            if max_interval is not None:
+                self.__task_intervals[task_id] = min(max_interval, self.__task_intervals.get(task_id, max_interval))
+            # poll new tasks soon
+            self.__interval = self.__min_interval
+            next_poll = time.time() + self.__min_interval
+            if self.__next_poll is None or next_poll < self.__next_poll:
+                self.__next_poll = next_poll
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name='TaskWaiter-%s' % self.__tintri.host)
+                self.__thread.daemon = True
+                self.__thread.start()
+            self.__condition.notify()
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def wait_all(self, tasks, timeout=None):
+        """
+        Waits for tasks to complete
+
+        Args:
+            tasks (list): Tasks or task IDs
+            timeout (float): Seconds to wait for all tasks, None waits forever
+
+        Returns:
+            list: Completed `Task` objects, in order of tasks
+
+        Raises:
+            TintriTaskTimeoutError: A task did not complete within timeout, waiting for the tasks not completed is cancelled
+        """
+        futures = [self.wait(task) for task in tasks]
+        deadline = time.time() + timeout if timeout is not None else None
+        try:
+            return [future.result(None if deadline is None else max(0, deadline - time.time())) for future in futures]
+        except TintriTaskTimeoutError:
+            for future in futures:
+                self.cancel(future.task_id)
+            raise
+
+    def cancel(self, task):
+        """
+        Stops waiting for a task, which is no longer polled. Its future, shared by all waiters of the task, completes
+        with a `TintriTaskWaitCancelledError`. The task itself keeps running on the server.
+
+        Args:
+            task (`Task` or str): Task or task ID
+
+        Returns:
+            bool: True if the task was being waited for
+        """
+        task_id = task if isinstance(task, basestring) else task.uuid.uuid
+        return self.__complete(task_id, None, TintriTaskWaitCancelledError(message='Stopped waiting for task %s' % task_id))
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while self.__futures and time.time() < self.__next_poll:
+                    self.__condition.wait(self.__next_poll - time.time())
+                if not self.__futures:
+                    self.__thread = None
+                    self.__next_poll = None
+                    return
+                task_ids = list(self.__futures.keys())
+
+            completed = 0
+            for i in xrange(0, len(task_ids), self.__batch_size):
+                completed += self.__poll(task_ids[i:i + self.__batch_size])
+
+            with self.__condition:
+                if completed == 0:
+                    self.__interval = min([self.__interval * self.__backoff, self.__max_interval] + list(self.__task_intervals.values()))
+                self.__next_poll = time.time() + self.__interval * random.uniform(1 - self.__jitter, 1 + self.__jitter)
+
+    def __poll(self, task_ids):
+        """Polls tasks, completes the futures of the completed ones and returns their number"""
+        spec = TaskFilterSpec()
+        spec.id = ','.join(task_ids)
+        spec.limit = len(task_ids)
+        self.__polls += 1
+        try:
+            tasks = dict((task.uuid.uuid, task) for task in self.__tintri.get_tasks(filters=spec, response_mode=RESPONSE_MODE_OBJECTS))
+        except Exception as e:
+            self.__failures += 1
+            if is_transient_error(e) and self.__failures < self.__max_failures:
+                self.__tintri.logger.warning('Failed to poll %d tasks, retrying. Error:%s' % (len(task_ids), e))
+                return 0
+            self.__tintri.logger.error('Failed to poll %d tasks. Error:%s' % (len(task_ids), e))
+            for task_id in task_ids:
+                self.__complete(task_id, None, e)
+            return len(task_ids)
+        self.__failures = 0
+
+        completed = 0
+        for task_id in task_ids:
+            task = tasks.get(task_id)
+            error = None
+            if task is None:
+                # not returned by the server, get it alone to report its error if any
+                try:
+                    self.__polls += 1
+                    task = self.__tintri.get_task(task_id, response_mode=RESPONSE_MODE_OBJECTS)
+                except Exception as e:
+                    error = e
+            if error is None and task.state not in TASK_DONE_STATES:
+                future = self.__futures.get(task_id)
+                if future is not None: # None if cancelled meanwhile
+                    future._update(task)
+                continue
+            if self.__complete(task_id, task, error):
+                completed += 1
+        return completed
+
+    def __complete(self, task_id, task, error):
+        """Completes the future of a task, returns False if the task is not being waited for"""
+        with self.__condition:
+            future = self.__futures.pop(task_id, None)
+            self.__task_intervals.pop(task_id, None)
+        if future is None:
+            return False
+        future._set_done(task, error)
+        return True
@@ -0,0 +1,232 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+
+"""
+Tests of the asyncio client `tintri.v310.aio.AsyncTintri` against a local asyncio stand-in of the VMstore REST API.
+
+They need Python 3.6 or later, aiohttp and the openssl command, and import the Python 3 build of the package
+(the sources converted with 2to3, as in the py3 wheel)::
+
+    python3 -m unittest discover -s test
+"""
+
+import asyncio
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+try:
+    from aiohttp import web
+    from tintri import TintriError
+    from tintri.v310.aio import AsyncTintri
+except ImportError as e:
+    web = None
+    import_error = e
+
+API = '/api/v310'
+NUM_VMS = 45
+ERR_INVALID_SESSION = 'ERR-API-0104'
+
+def vm(i):
+    return {'typeId': 'com.tintri.api.rest.v310.dto.domain.VirtualMachine', 'uuid': {'uuid': 'vm-%d' % i}, 'vmware': {'name': 'vm%d' % i}, 'isLive': True}
+
+class StandIn(object):
+    """HTTPS server answering like a VMstore, run on the event loop of the test"""
+    def __init__(self, loop, directory):
+        self.loop = loop
+        self.logins = 0
+        self.page_requests = 0
+        self.sessions = set()
+        self.cookies = [] # session cookie of every API request
+        self.latency = 0.01
+        key, cert = os.path.join(directory, 'key.pem'), os.path.join(directory, 'cert.pem')
+        subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert, '-days', '1', '-subj', '/CN=localhost'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        import ssl
+        self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.ssl_context.load_cert_chain(cert, key)
+        app = web.Application()
+        app.router.add_route('*', '/{path:.*}', self.handle)
+        self.runner = web.AppRunner(app)
+
+    async def start(self):
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0, ssl_context=self.ssl_context)
+        await site.start()
+        self.host = '127.0.0.1:%d' % site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def expire_sessions(self):
+        self.sessions.clear()
+
+    def error(self, code, status):
+        return web.json_response({'typeId': 'com.tintri.api.rest.v310.dto.ErrorResponse', 'code': code, 'message': code, 'causeDetails': ''}, status=status)
+
+    async def handle(self, request):
+        path = request.path
+        if path == '/api/info':
+            return web.json_response({'typeId': 'com.tintri.api.rest.v310.dto.domain.beans.RestApi', 'productName': 'Tintri VMstore',
+                                      'preferredVersion': 'v310.51', 'supportedVersionSet': ['v310.11', 'v310.21', 'v310.31', 'v310.41', 'v310.51']})
+        if path == API + '/session/login':
+            await request.read()
+            self.logins += 1
+            session = 's%d' % self.logins
+            self.sessions.add(session)
+            response = web.json_response(['admin'])
+            response.set_cookie('JSESSIONID', session)
+            return response
+        if path == API + '/session/logout':
+            self.sessions.discard(request.cookies.get('JSESSIONID'))
+            return web.Response(status=204)
+        self.cookies.append(request.cookies.get('JSESSIONID'))
+        if request.cookies.get('JSESSIONID') not in self.sessions:
+            return self.error(ERR_INVALID_SESSION, 401)
+        await asyncio.sleep(self.latency)
+        if path == API + '/vm':
+            self.page_requests += 1
+            offset, limit = int(request.query.get('offset', 0)), int(request.query.get('limit', 10))
+            page = {'typeId': 'com.tintri.api.rest.v310.dto.Page', 'total': NUM_VMS, 'limit': limit, 'offset': offset, 'completedIn': 7,
+                    'offsetMatchFound': True, 'overflow': False, 'items': [vm(i) for i in range(offset, min(offset + limit, NUM_VMS))]}
+            if offset + limit < NUM_VMS:
+                page['next'] = 'offset=%d&limit=%d' % (offset + limit, limit)
+            return web.json_response(page)
+        if path.startswith(API + '/vm/vm-'):
+            i = int(path.rsplit('-', 1)[1])
+            return web.json_response(vm(i)) if i < NUM_VMS else self.error('ERR-API-0404', 404)
+        if path == API + '/appliance/default/timezones':
+            return web.json_response(['America/Los_Angeles', 'UTC'])
+        return self.error('ERR-API-0404', 404)
+
+@unittest.skipIf(web is None, 'needs aiohttp and the Python 3 build of the package: %s' % (web is None and import_error))
+class AsyncTintriTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = StandIn(self.loop, self.directory)
+        self.run_async(self.server.start())
+
+    def tearDown(self):
+        self.run_async(self.server.stop())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.directory)
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def client(self, **kwargs):
+        return AsyncTintri(self.server.host, 'admin', 'password', **kwargs)
+
+    def test_get_one(self):
+        async def run():
+            async with self.client() as tintri:
+                vm = await tintri.get_vm('vm-3')
+                self.assertEqual(vm.vmware.name, 'vm3')
+                vm = await tintri.get_vm('vm-4', response_mode='dict')
+                self.assertEqual(vm['vmware']['name'], 'vm4')
+        self.run_async(run())
+
+    def test_error(self):
+        async def run():
+            async with self.client() as tintri:
+                with self.assertRaises(TintriError) as raised:
+                    await tintri.get_vm('vm-999')
+                self.assertEqual(raised.exception.code, 'ERR-API-0404')
+        self.run_async(run())
+
+    def test_page(self):
+        async def run():
+            async with self.client() as tintri:
+                page = await tintri.get_vms(filters={'limit': 10})
+                self.assertEqual((page.total, page.limit, page.offset, len(page)), (NUM_VMS, 10, 0, 10))
+                self.assertEqual((page.completedIn, page.offsetMatchFound, page.overflow), (7, True, False))
+                self.assertEqual([vm.vmware.name for vm in page], ['vm%d' % i for i in range(10)])
+                self.assertEqual([vm.vmware.name async for vm in page], ['vm%d' % i for i in range(NUM_VMS)])
+                self.assertEqual(self.server.page_requests, 5)
+        self.run_async(run())
+
+    def test_prefetch(self):
+        async def run():
+            for prefetch in [1, 2, 3]:
+                async with self.client(prefetch=prefetch) as tintri:
+                    self.server.page_requests = 0
+                    page = await tintri.get_vms(filters={'limit': 5})
+                    items = page.__aiter__()
+                    await items.__anext__()
+                    await asyncio.sleep(self.server.latency * 20)
+                    # the first page and prefetch pages ahead of it, no more
+                    self.assertEqual(self.server.page_requests, 1 + prefetch)
+                    names = ['vm0'] + [vm.vmware.name async for vm in items]
+                    self.assertEqual(names, ['vm%d' % i for i in range(NUM_VMS)])
+                    self.assertEqual(self.server.page_requests, 9)
+        self.run_async(run())
+
+    def test_expired_session_logs_in_once(self):
+        async def run():
+            async with self.client() as tintri:
+                await tintri.get_vm('vm-1')
+                self.server.expire_sessions()
+                logins = self.server.logins
+                vms = await asyncio.gather(*[tintri.get_vm('vm-%d' % (i % NUM_VMS)) for i in range(100)])
+                self.assertEqual(len(vms), 100)
+                self.assertEqual(self.server.logins, logins + 1)
+        self.run_async(run())
+
+    def test_hand_written_method_shares_session(self):
+        async def run():
+            async with self.client() as tintri:
+                await tintri.get_vm('vm-1')
+                self.assertEqual(await tintri.get_appliance_timezones('default'), ['America/Los_Angeles', 'UTC'])
+                self.assertEqual(self.server.logins, 1)
+                self.assertEqual(tintri.tintri.session_id, tintri.session_id)
+                # a session the synchronous client logs in is used by the asyncio client too
+                self.server.expire_sessions()
+                await tintri.get_appliance_timezones('default')
+                await tintri.get_vm('vm-2')
+                self.assertEqual(self.server.logins, 2)
+                self.assertEqual(self.server.cookies[-1], 's2')
+        self.run_async(run())
+
+if __name__ == '__main__':
+    unittest.main()
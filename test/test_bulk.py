@@ -0,0 +1,157 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+"""
+Tests of `tintri.v310.bulk` against a stand-in of the clone and task functions of a server::
+
+    python -m unittest discover -s test
+"""
+
+import itertools
+import logging
+import threading
+import time
+import unittest
+
+from tintri.v310.bulk import BulkCloner, RetentionPolicy, SnapshotSweeper, TintriCloneTimeoutError
+from tintri.v310.tasks import TaskWaiter
+
+class Uuid(object):
+    def __init__(self, uuid):
+        self.uuid = uuid
+
+class Task(object):
+    def __init__(self, task_id, state):
+        self.uuid = Uuid(task_id)
+        self.state = state
+
+class StandIn(object):
+    """Starts a clone task per clone_vm call, answering get_tasks with the tasks in done as SUCCESS and the others as RUNNING"""
+    host = 'standin'
+    logger = logging.getLogger('standin')
+
+    def __init__(self):
+        self.done = set()
+        self.polled = [] # task IDs of every get_tasks request
+        self.lock = threading.Lock()
+        self.task_ids = itertools.count()
+        self.task_waiter = TaskWaiter(self, min_interval=0.01, max_interval=0.02, jitter=0)
+
+    def clone_vm(self, spec, response_mode=None):
+        with self.lock:
+            return Task('task-%d' % next(self.task_ids), 'RUNNING')
+
+    def get_tasks(self, filters=None, response_mode=None):
+        task_ids = filters.id.split(',')
+        with self.lock:
+            self.polled.append(task_ids)
+        return [Task(task_id, 'SUCCESS' if task_id in self.done else 'RUNNING') for task_id in task_ids]
+
+class Snapshot(object):
+    def __init__(self, snapshot_id, vm_uuid, create_time, snapshot_type='SCHEDULED_SNAPSHOT'):
+        self.uuid = Uuid(snapshot_id)
+        self.vmUuid = Uuid(vm_uuid)
+        self.createTime = create_time
+        self.type = snapshot_type
+
+class SnapshotPage(object):
+    def __init__(self, items):
+        self.items = items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def close(self):
+        pass
+
+class SnapshotStandIn(object):
+    """Answers get_snapshots with its snapshots in ascending createTime, ignoring sortOrder, and deletes them"""
+    host = 'standin'
+    logger = logging.getLogger('standin')
+
+    def __init__(self, snapshots):
+        self.snapshots = sorted(snapshots, key=lambda snapshot: snapshot.createTime)
+        self.filters = []
+
+    def _to_map(self, filters):
+        return filters or {}
+
+    def get_snapshots(self, filters=None, response_mode=None, stream=False):
+        self.filters.append(filters)
+        return SnapshotPage(self.snapshots[filters['offset']:filters['offset'] + filters['limit']])
+
+    def delete_snapshot(self, snapshot_id):
+        self.snapshots = [snapshot for snapshot in self.snapshots if snapshot.uuid.uuid != snapshot_id]
+
+class RetentionPolicyTest(unittest.TestCase):
+    def test_types(self):
+        self.assertEqual(RetentionPolicy(types=['SCHEDULED_SNAPSHOT', 'USER_GENERATED_SNAPSHOT']).types, ['SCHEDULED_SNAPSHOT', 'USER_GENERATED_SNAPSHOT'])
+        self.assertRaises(ValueError, RetentionPolicy, types=['SCHEDULED'])
+        self.assertRaises(ValueError, RetentionPolicy, types='SCHEDULED_SNAPSHOT')
+
+    def test_keep_last_keeps_newest(self):
+        snapshots = [Snapshot('%s-%d' % (vm, i), vm, 1000 * i + offset) for vm, offset in [('vm1', 0), ('vm2', 500)] for i in range(5)]
+        snapshots.append(Snapshot('vm1-user', 'vm1', 9000, 'USER_GENERATED_SNAPSHOT'))
+        tintri = SnapshotStandIn(snapshots)
+        report = SnapshotSweeper(tintri, RetentionPolicy(keep_last=2, types=['SCHEDULED_SNAPSHOT'])).sweep()
+        self.assertEqual((report.scanned, report.deleted, report.failed), (11, 6, 0))
+        self.assertEqual(sorted(snapshot.uuid.uuid for snapshot in tintri.snapshots), ['vm1-3', 'vm1-4', 'vm1-user', 'vm2-3', 'vm2-4'])
+        self.assertEqual((tintri.filters[0]['sortedBy'], tintri.filters[0]['sortOrder']), ('createTime', 'DESC'))
+
+class BulkClonerTest(unittest.TestCase):
+    def test_clone(self):
+        tintri = StandIn()
+        tintri.done.update(['task-%d' % i for i in range(10)])
+        results = BulkCloner(tintri, concurrency=4).clone(['spec%d' % i for i in range(10)])
+        self.assertEqual([result.spec for result in results], ['spec%d' % i for i in range(10)])
+        self.assertEqual([result.error for result in results], [None] * 10)
+
+    def test_timeout_stops_polling(self):
+        tintri = StandIn()
+        tintri.done.add('task-0')
+        results = BulkCloner(tintri, concurrency=1, timeout=0.2).clone(['spec0', 'spec1', 'spec2'])
+        self.assertEqual(results[0].error, None)
+        self.assertTrue(all(isinstance(result.error, TintriCloneTimeoutError) for result in results[1:]))
+        self.assertEqual(len(tintri.task_waiter), 0)
+        time.sleep(0.1)
+        polls = len(tintri.polled)
+        time.sleep(0.2)
+        self.assertEqual(len(tintri.polled), polls)
+
+if __name__ == '__main__':
+    unittest.main()
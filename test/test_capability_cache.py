@@ -0,0 +1,97 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+"""
+Tests of `tintri.common.CapabilityCache` persisted to a file::
+
+    python -m unittest discover -s test
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from tintri.common import CapabilityCache
+
+def info(host):
+    return {'productName': 'Tintri VMstore', 'preferredVersion': 'v310.51', 'host': host}
+
+def put_hosts(path, first, count):
+    cache = CapabilityCache(path=path)
+    for i in range(first, first + count):
+        cache.put('host%d' % i, info('host%d' % i))
+
+class CapabilityCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'capabilities.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared_file_keeps_hosts_of_every_cache(self):
+        first, second = CapabilityCache(path=self.path), CapabilityCache(path=self.path)
+        first.put('host1', info('host1'))
+        second.put('host2', info('host2'))
+        first.put('host3', info('host3'))
+        reader = CapabilityCache(path=self.path)
+        for host in ['host1', 'host2', 'host3']:
+            self.assertEqual(reader.get(host), info(host))
+
+    def test_invalidate_removes_host_from_file(self):
+        first, second = CapabilityCache(path=self.path), CapabilityCache(path=self.path)
+        first.put('host1', info('host1'))
+        second.put('host2', info('host2'))
+        second.invalidate('host1')
+        reader = CapabilityCache(path=self.path)
+        self.assertEqual(reader.get('host1'), None)
+        self.assertEqual(reader.get('host2'), info('host2'))
+
+    def test_concurrent_processes(self):
+        processes = [multiprocessing.Process(target=put_hosts, args=(self.path, i * 20, 20)) for i in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        reader = CapabilityCache(path=self.path)
+        self.assertEqual([host for host in ('host%d' % i for i in range(80)) if reader.get(host) is None], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+"""
+Tests of the entity classes of `tintri.common`::
+
+    python -m unittest discover -s test
+"""
+
+import copy
+import pickle
+import unittest
+
+from tintri.common import TintriEntity, TintriObject
+from tintri.utils import map_to_object, get_decoder, object_to_json
+
+class GuardedEntity(TintriEntity):
+    _ignores_setattr = False
+    _property_map = { 'child': TintriEntity }
+    kind = 'guarded'
+
+    def __init__(self):
+        super(GuardedEntity, self).__init__()
+        self.name = None
+        self.tags = []
+
+class GuardedEntityWithArgs(TintriEntity):
+    _ignores_setattr = False
+
+    def __init__(self, name, size=None):
+        super(GuardedEntityWithArgs, self).__init__()
+        self.name = name
+        if size is not None:
+            self.size = size
+
+class AttributeGuardTest(unittest.TestCase):
+    def test_allowed(self):
+        entity = GuardedEntity()
+        entity.name = 'vm1'
+        entity.tags = ['a']
+        entity.kind = 'other'
+        entity.child = TintriEntity()
+        self.assertEqual((entity.name, entity.tags, entity.kind), ('vm1', ['a'], 'other'))
+
+    def test_decoded_fields(self):
+        entity = map_to_object({'name': 'vm1', 'isLive': True}, GuardedEntity)
+        entity.isLive = False
+        self.assertEqual(entity.isLive, False)
+
+    def test_rejected(self):
+        entity = GuardedEntity()
+        with self.assertRaises(TypeError):
+            entity.notAField = 1
+        self.assertFalse(hasattr(entity, 'notAField'))
+
+    def test_constructor_with_arguments(self):
+        entity = GuardedEntityWithArgs('vm1', size=10)
+        entity.name = 'vm2'
+        entity.size = 20
+        self.assertEqual((entity.name, entity.size), ('vm2', 20))
+        with self.assertRaises(TypeError):
+            GuardedEntityWithArgs('vm3').size = 30
+
+class Disk(TintriEntity):
+    pass
+
+class Vm(TintriEntity):
+    _property_map = { 'disks': Disk, 'stat': TintriObject }
+
+def vm_json():
+    return {'typeId': 'vm', 'name': 'vm1', 'isLive': True, 'disks': [{'name': 'disk1'}, {'name': 'disk2'}], 'stat': {'iops': 10}}
+
+class LazyDecodingTest(unittest.TestCase):
+    def decode(self):
+        return get_decoder(Vm, lazy=True)(vm_json())
+
+    def test_vars_contains_only_fields(self):
+        vm = self.decode()
+        self.assertEqual(sorted(vars(vm)), ['isLive', 'name', 'typeId'])
+        self.assertEqual([disk.name for disk in vm.disks], ['disk1', 'disk2'])
+        self.assertEqual(sorted(vars(vm)), ['disks', 'isLive', 'name', 'typeId'])
+        self.assertEqual(vm.stat.iops, 10)
+        self.assertEqual(sorted(vm.__dict__), ['disks', 'isLive', 'name', 'stat', 'typeId'])
+
+    def test_missing_field(self):
+        vm = self.decode()
+        self.assertRaises(AttributeError, getattr, vm, 'notAField')
+        self.assertFalse(hasattr(vm, 'notAField'))
+
+    def test_assigned_field_replaces_raw_json(self):
+        vm = self.decode()
+        vm.stat = None
+        self.assertEqual(vm.stat, None)
+        self.assertEqual(sorted(vars(vm)), ['isLive', 'name', 'stat', 'typeId'])
+
+    def test_json(self):
+        vm = self.decode()
+        self.assertEqual(sorted(vars(vm)), ['isLive', 'name', 'typeId'])
+        self.assertEqual(len(object_to_json(vm)), len(object_to_json(map_to_object(vm_json(), Vm))))
+        self.assertEqual(sorted(vars(vm)), ['disks', 'isLive', 'name', 'stat', 'typeId'])
+
+    def test_pickle_and_copy(self):
+        for vm in [pickle.loads(pickle.dumps(self.decode())), pickle.loads(pickle.dumps(self.decode(), 2)), copy.deepcopy(self.decode())]:
+            self.assertEqual(sorted(vars(vm)), ['disks', 'isLive', 'name', 'stat', 'typeId'])
+            self.assertEqual((vm.disks[1].name, vm.stat.iops), ('disk2', 10))
+
+if __name__ == '__main__':
+    unittest.main()
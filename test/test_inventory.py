@@ -0,0 +1,112 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+"""
+Tests of `tintri.v310.inventory` against a stand-in of the get function of a server::
+
+    python -m unittest discover -s test
+"""
+
+import unittest
+
+from tintri.v310.inventory import VmInventory
+
+def vm(i, group=None):
+    entity = {'uuid': {'uuid': 'vm-%d' % i}, 'vmware': {'name': 'vm%d' % i, 'storageContainers': ['ds1']}}
+    if group is not None:
+        entity['serviceGroup'] = {'groupId': group, 'name': 'group %s' % group}
+    return entity
+
+class Page(object):
+    """Page of entities as returned with auto_page set, iterating it returns the items of all pages"""
+    def __init__(self, items, last_updated_time):
+        self.items = items
+        self.lastUpdatedTime = last_updated_time
+
+    def __iter__(self):
+        return iter(self.items)
+
+class StandIn(object):
+    """Answers get_vms with the live and deleted VMs set by the test, recording the filters of every call"""
+    auto_page = True
+
+    def __init__(self):
+        self.live = []
+        self.deleted = []
+        self.calls = []
+        self.time = 100
+
+    def get_vms(self, filters=None, response_mode=None):
+        self.calls.append(filters)
+        self.time += 1
+        return Page(self.deleted if filters.get('deleted') else self.live, self.time)
+
+class VmInventoryTest(unittest.TestCase):
+    def test_service_group_index(self):
+        tintri = StandIn()
+        tintri.live = [vm(1, 'sg-1'), vm(2, 'sg-1'), vm(3, 'sg-2'), vm(4)]
+        inventory = VmInventory(tintri)
+        inventory.refresh()
+        self.assertEqual(sorted(v['uuid']['uuid'] for v in inventory.find('service_group', 'sg-1')), ['vm-1', 'vm-2'])
+        self.assertEqual([v['uuid']['uuid'] for v in inventory.find('service_group', 'sg-2')], ['vm-3'])
+        self.assertEqual(sorted(inventory.index_values('service_group')), ['sg-1', 'sg-2'])
+        # a VM moved to another group is indexed under its new group only
+        tintri.live = [vm(1, 'sg-2')]
+        inventory.refresh()
+        self.assertEqual([v['uuid']['uuid'] for v in inventory.find('service_group', 'sg-1')], ['vm-2'])
+        self.assertEqual(sorted(v['uuid']['uuid'] for v in inventory.find('service_group', 'sg-2')), ['vm-1', 'vm-3'])
+
+    def test_filters_with_limit(self):
+        tintri = StandIn()
+        tintri.live = [vm(1), vm(2)]
+        inventory = VmInventory(tintri, live_filters={'live': 'true', 'limit': 50}, deleted_filters={'deleted': 'true', 'limit': 20}, limit=10)
+        self.assertTrue(inventory.refresh().full)
+        tintri.live = []
+        tintri.deleted = [vm(2)]
+        refresh = inventory.refresh()
+        self.assertEqual((refresh.full, refresh.deleted), (False, 1))
+        self.assertEqual(list(inventory.keys()), ['vm-1'])
+        self.assertEqual([call['limit'] for call in tintri.calls], [50, 50, 20])
+        self.assertEqual(tintri.calls[2], {'deleted': 'true', 'limit': 20, 'since': 101})
+        # the inventory limit applies when the filters set none
+        inventory = VmInventory(tintri, limit=10)
+        inventory.refresh()
+        self.assertEqual(tintri.calls[-1], {'live': 'true', 'limit': 10})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+"""
+Tests of `tintri.v310.poller.StatsPoller` against a stand-in of the realtime stats functions of a server::
+
+    python -m unittest discover -s test
+"""
+
+import threading
+import time
+import unittest
+
+from tintri.v310.poller import StatsPoller
+
+class StandIn(object):
+    """Answers get_vm_realtime_stats with a new sample on every call, failing for the VMs in failing"""
+    host = 'standin'
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def get_vm_realtime_stats(self, vm_uuid, response_mode=None):
+        with self.lock:
+            self.calls += 1
+            if vm_uuid in self.failing:
+                self.failures += 1
+                raise ValueError('stats of %s failed' % vm_uuid)
+            calls = self.calls
+        return [{'sortedStats': [{'timeEnd': '2016-10-18T10:00:%02d.000-07:00' % (calls % 60), 'operationsTotalIops': calls}]}]
+
+class StatsPollerTest(unittest.TestCase):
+    def test_counts_under_concurrent_refreshes(self):
+        tintri = StandIn(failing=['vm-%d' % i for i in range(0, 200, 4)])
+        poller = StatsPoller(tintri, interval=0.05, workers=16, jitter=0)
+        samples = []
+        poller.subscribe_all('vm', ['vm-%d' % i for i in range(200)], callback=samples.append)
+        time.sleep(1)
+        poller.stop()
+        self.assertTrue(tintri.calls > 1000)
+        self.assertEqual(poller.polls, tintri.calls)
+        self.assertEqual(poller.errors, tintri.failures)
+        self.assertEqual(poller.dropped, 0)
+
+if __name__ == '__main__':
+    unittest.main()
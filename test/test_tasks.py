@@ -0,0 +1,118 @@
+#
+# The BSD License (BSD)
+#
+# Copyright (c) 2016 Tintri, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without modification,
+# are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#     without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+__author__ = 'Tintri'
+__copyright__ = 'Copyright 2016 Tintri Inc'
+__license__ = 'BSD'
+__version__ = '1.0'
+
+"""
+Tests of `tintri.v310.tasks.TaskWaiter` against a stand-in of the task functions of a server::
+
+    python -m unittest discover -s test
+"""
+
+import logging
+import threading
+import time
+import unittest
+
+from tintri.v310.tasks import TaskWaiter, TintriTaskTimeoutError, TintriTaskWaitCancelledError
+
+class Uuid(object):
+    def __init__(self, uuid):
+        self.uuid = uuid
+
+class Task(object):
+    def __init__(self, task_id, state):
+        self.uuid = Uuid(task_id)
+        self.state = state
+
+class StandIn(object):
+    """Answers get_tasks with the tasks in done as SUCCESS and the others as RUNNING"""
+    host = 'standin'
+    logger = logging.getLogger('standin')
+
+    def __init__(self):
+        self.done = set()
+        self.polled = [] # task IDs of every get_tasks request
+        self.lock = threading.Lock()
+
+    def get_tasks(self, filters=None, response_mode=None):
+        task_ids = filters.id.split(',')
+        with self.lock:
+            self.polled.append(task_ids)
+        return [Task(task_id, 'SUCCESS' if task_id in self.done else 'RUNNING') for task_id in task_ids]
+
+class TaskWaiterTest(unittest.TestCase):
+    def waiter(self, tintri):
+        return TaskWaiter(tintri, min_interval=0.01, max_interval=0.02, jitter=0)
+
+    def test_wait_all(self):
+        tintri = StandIn()
+        tintri.done.update(['t1', 't2'])
+        waiter = self.waiter(tintri)
+        self.assertEqual([task.uuid.uuid for task in waiter.wait_all(['t1', 't2'])], ['t1', 't2'])
+        self.assertEqual(len(waiter), 0)
+
+    def test_wait_all_timeout_stops_polling(self):
+        tintri = StandIn()
+        tintri.done.add('t1')
+        waiter = self.waiter(tintri)
+        with self.assertRaises(TintriTaskTimeoutError):
+            waiter.wait_all(['t1', 't2', 't3'], timeout=0.2)
+        self.assertEqual(len(waiter), 0)
+        time.sleep(0.1)
+        polls = len(tintri.polled)
+        time.sleep(0.2)
+        self.assertEqual(len(tintri.polled), polls)
+
+    def test_cancel(self):
+        tintri = StandIn()
+        waiter = self.waiter(tintri)
+        cancelled, running = waiter.wait('t1'), waiter.wait('t2')
+        time.sleep(0.05)
+        self.assertTrue(waiter.cancel('t1'))
+        self.assertFalse(waiter.cancel('t1'))
+        self.assertTrue(cancelled.done())
+        self.assertRaises(TintriTaskWaitCancelledError, cancelled.result)
+        time.sleep(0.05)
+        polls = len(tintri.polled)
+        time.sleep(0.1)
+        self.assertTrue(len(tintri.polled) > polls)
+        self.assertEqual(set(task_id for task_ids in tintri.polled[polls:] for task_id in task_ids), set(['t2']))
+        tintri.done.add('t2')
+        self.assertEqual(running.result(1).state, 'SUCCESS')
+
+if __name__ == '__main__':
+    unittest.main()